@@ -0,0 +1,75 @@
+"""
+Benchmark: native file tools against their execute_bash equivalents.
+
+Builds a small source tree plus one large log file, then times each native
+tool and the shell command an agent would otherwise run through
+PersistentShell (same cwd, same result).
+
+    python benchmarks/file_tools.py [--runs 200] [--files 300]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tool_executor.file_tools import grep, list_dir, read_file
+from tool_executor.tool_executor import PersistentShell
+
+
+def build_tree(root: str, files: int):
+    for i in range(files):
+        package = os.path.join(root, f"pkg{i % 10}")
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, f"module{i}.py"), "w") as f:
+            f.write("".join(f"def function_{j}(x):\n    return x + {j}\n\n" for j in range(60)))
+    with open(os.path.join(root, "big.log"), "w") as f:
+        f.write("".join(f"{i:08d} INFO request handled in {i % 97} ms\n" for i in range(400_000)))
+
+
+def timed(fn, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--files", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        build_tree(root, args.files)
+        shell = PersistentShell(root)
+        try:
+            cases = [
+                ("read 40 lines", lambda: read_file(root, "pkg3/module3.py", 100, 139),
+                 lambda: shell.run("sed -n '100,139p' pkg3/module3.py")),
+                ("read lines of a 17 MB file", lambda: read_file(root, "big.log", 200_000, 200_019),
+                 lambda: shell.run("sed -n '200000,200019p;200020q' big.log")),
+                ("list a directory", lambda: list_dir(root, "pkg1"),
+                 lambda: shell.run("ls -la pkg1")),
+                ("grep the tree", lambda: grep(root, "function_42\\b", ".", include="*.py"),
+                 lambda: shell.run("grep -rn 'function_42\\b' --include='*.py' .")),
+            ]
+            print(f"{args.runs} runs each, p50 / p99")
+            for name, native, bash in cases:
+                native_samples, bash_samples = timed(native, args.runs), timed(bash, args.runs)
+                ms = lambda samples, q: f"{samples[min(len(samples) - 1, int(len(samples) * q))] * 1000:8.3f} ms"
+                print(f"  {name:<28} native {ms(native_samples, 0.5)} / {ms(native_samples, 0.99)}"
+                      f"   bash {ms(bash_samples, 0.5)} / {ms(bash_samples, 0.99)}"
+                      f"   x{statistics.median(bash_samples) / statistics.median(native_samples):.1f}")
+        finally:
+            shell.close()
+
+
+if __name__ == "__main__":
+    main()
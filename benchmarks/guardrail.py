@@ -0,0 +1,90 @@
+"""
+Benchmark: guardrail decisions on long heredoc-style commands.
+
+Times SafetyGuardrail.is_safe on commands like the one in test_parser.py (a
+file written through a heredoc, then more commands), uncached (parse and
+rule evaluation every time), cached (a repeated command) and cached with
+the policy read from a watched file (one stat per check), next to the old
+check, which only ran shlex.split and looked at the first word.
+
+    python benchmarks/guardrail.py [--runs 2000] [--lines 400]
+"""
+
+import argparse
+import os
+import shlex
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from safety_guardrail.safety_guardrail import SafetyGuardrail
+from safety_guardrail.shell_parser import parse_command
+
+
+def heredoc_command(lines: int) -> str:
+    body = "\n".join(
+        f'      <div class="bar" style="height: {i % 90 + 10}px" data-index="{i}">{i}</div>'
+        if i % 3 else f"      for (let j = 0; j < n - {i}; j++) {{ if (a[j] > a[j + 1]) swap(a, j); }}"
+        for i in range(lines)
+    )
+    return (f"mkdir -p site && cd site && cat > index.html << 'EOF'\n<html>\n  <body>\n{body}\n"
+            "  </body>\n</html>\nEOF\nls -la | grep index && wc -l index.html && echo done!")
+
+
+def pipeline_command(stages: int) -> str:
+    return " | ".join(f"grep -v 'pattern {i}' --color=never" for i in range(stages)) + " > out.txt"
+
+
+def legacy_is_safe(blocklist, command: str):
+    parts = shlex.split(command)
+    return bool(parts) and parts[0] not in blocklist
+
+
+def timed(fn, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=400)
+    args = parser.parse_args(argv)
+
+    guardrail = SafetyGuardrail()
+    policy = guardrail.policy
+    policy_file = os.path.join(os.path.dirname(__file__), '..', 'guardrail_policy.example.toml')
+    watched = SafetyGuardrail(policy_file=policy_file)
+
+    def uncached(command):
+        parse_command.cache_clear()
+        policy.check.cache_clear()
+        return guardrail.is_safe(command)
+
+    cases = [
+        (f"heredoc, {args.lines} lines", heredoc_command(args.lines)),
+        ("heredoc, 10 lines", heredoc_command(10)),
+        ("50-stage pipeline", pipeline_command(50)),
+    ]
+    print(f"{args.runs} runs each, p50 / p99")
+    for name, command in cases:
+        assert guardrail.is_safe(command)[0], guardrail.is_safe(command)
+        results = [
+            ("old shlex check", timed(lambda: legacy_is_safe(guardrail.blocklist, command), args.runs)),
+            ("uncached", timed(lambda: uncached(command), args.runs)),
+            ("cached", timed(lambda: guardrail.is_safe(command), args.runs)),
+            ("cached, watched", timed(lambda: watched.is_safe(command), args.runs)),
+        ]
+        print(f"  {name} ({len(command)} bytes, {len(parse_command(command).commands)} simple commands)")
+        for label, samples in results:
+            ms = lambda q: f"{samples[min(len(samples) - 1, int(len(samples) * q))] * 1000:8.4f} ms"
+            print(f"    {label:<16} {ms(0.5)} / {ms(0.99)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Microbenchmark: per-command round-trip overhead of PersistentShell.
+
+Runs a trivial command (default ``true``) many times through one persistent
+shell and reports latency percentiles, i.e. the fixed cost the shell adds to
+every tool call.
+
+    python benchmarks/shell_roundtrip.py [--command true] [--runs 500]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tool_executor.tool_executor import PersistentShell
+
+
+def bench(command: str, runs: int, warmup: int = 20) -> list:
+    with tempfile.TemporaryDirectory() as workdir:
+        shell = PersistentShell(workdir)
+        try:
+            for _ in range(warmup):
+                shell.run(command)
+            samples = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                shell.run(command)
+                samples.append(time.perf_counter() - started)
+        finally:
+            shell.close()
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--command", default="true")
+    parser.add_argument("--runs", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    samples = sorted(bench(args.command, args.runs))
+    ms = lambda seconds: f"{seconds * 1000:.3f} ms"
+    print(f"{args.runs} x {args.command!r}")
+    print(f"  mean {ms(statistics.fmean(samples))}")
+    print(f"  p50  {ms(samples[len(samples) // 2])}")
+    print(f"  p99  {ms(samples[int(len(samples) * 0.99) - 1])}")
+    print(f"  max  {ms(samples[-1])}")
+
+
+if __name__ == "__main__":
+    main()
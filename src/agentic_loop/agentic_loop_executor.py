@@ -1,22 +1,40 @@
 import json
-from typing import List, Dict, Any
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
 
-class AgenticLoopExecutor:
-    def __init__(self, llm_adapter, tool_executor):
-        self.llm_adapter = llm_adapter
-        self.tool_executor = tool_executor
-        self.system_prompt = """
-You are an AI assistant that can interact with the user and execute bash commands. 
-When you need to execute a command, respond with a JSON object in the format: 
-TOOL_CALL: {\"tool_name\": \"execute_bash\", \"args\": \"your command here\"}
+from tool_executor.tool_executor import (
+    NO_ARGUMENT_TOOLS, TOOL_NAMES, StreamingToolCallParser, is_batch_failure, is_failure, skipped_result,
+)
+
+
+SYSTEM_PROMPT = """
+You are an AI assistant that can interact with the user, work with files and execute bash commands. 
+When you need to use a tool, respond with a JSON object in the format: 
+TOOL_CALL: {\"tool_name\": \"<tool>\", \"args\": <arguments>}
 For example: TOOL_CALL: {\"tool_name\": \"execute_bash\", \"args\": \"ls -l\"}
+You may put several TOOL_CALL lines in one response; independent read-only calls
+(e.g. reading several files) are then run in parallel and all outputs are returned together, in order.
+Each result reports the command's `returncode`, its stdout as `output` and its `stderr`.
+If a command fails (non-zero returncode), the commands after it in the same response are skipped.
 
-Use the `execute_bash` tool to:
-1. Read files (e.g., `cat <filename>`, `head <filename>`)
-2. Search for content (e.g., `grep <pattern> <filename>`)
-3. Create or modify files (e.g., `echo \"content\" > <filename>`, `sed -i \"s/old/new/g\" <filename>`)
-4. Run scripts or programs (e.g., `python3 <script.py>`, `node <script.js>`)
-5. Navigate the file system (e.g., `cd <directory>`, `ls -F`)
+Tools (paths are relative to the shell's current directory):
+- `execute_bash`, args: a command string. Runs it in a persistent bash shell (e.g. `python3 <script.py>`, `cd <directory>`, `git status`).
+- `read_file`, args: {\"path\": ..., \"start_line\": N, \"end_line\": M}. Reads a file, or only lines N to M (both optional).
+- `write_file`, args: {\"path\": ..., \"content\": ..., \"append\": false}. Creates or overwrites a file in the workspace.
+- `list_dir`, args: {\"path\": ...}. Lists a directory: subdirectories end in `/`, files show their size.
+- `grep`, args: {\"pattern\": <regex>, \"path\": ..., \"include\": \"*.py\", \"ignore_case\": false}. Searches a file or directory tree and returns `file:line:text`.
+Prefer read_file, write_file, list_dir and grep over the equivalent shell commands: they are faster and their output is exact.
+For example: TOOL_CALL: {\"tool_name\": \"read_file\", \"args\": {\"path\": \"main.py\", \"start_line\": 1, \"end_line\": 40}}
+
+execute_bash commands are limited in CPU time, memory, output size and open files; a result with
+`limit_exceeded` was killed for using too much, so narrow the command (e.g. pipe its output through `head`).
+execute_bash commands time out after 30 seconds. Run builds, test suites and servers as background jobs instead:
+- `job_start`, args: a command string. Starts it in the background and returns its `job_id` at once.
+- `job_status`, args: {\"job_id\": N} or nothing for every job. Reports whether it is running and its exit status.
+- `job_output`, args: {\"job_id\": N, \"tail\": false}. Returns output written since your last job_output call (or the end of it with tail).
+- `job_wait`, args: {\"job_id\": N, \"timeout\": seconds}. Waits up to the timeout for the job to finish, then returns its status and new output.
+- `job_stop`, args: {\"job_id\": N}. Kills the job.
 
 **Safety Guardrails:**
 Be aware that certain dangerous commands are blocked for your safety and the integrity of the system. If you attempt to execute a blocked command, you will receive a 'Guardrail blocked command' message. In such cases, you should re-evaluate your approach and try a safer alternative.
@@ -25,7 +43,166 @@ After executing a command, the output will be provided to you.
 If you do not need to execute a command, respond with a regular message.
 """
 
-    def run_agentic_loop(self, messages: List[Dict[str, str]], model: str = None) -> str:
+
+def build_summary_prompt(previous_summary: str, messages: List[Dict[str, str]]) -> str:
+    """Prompt asking the LLM to fold *messages* into *previous_summary*."""
+    transcript = "\n\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    return (
+        "Update the running summary of a conversation between a user and an AI assistant "
+        "that can run bash commands. Keep facts, decisions, file names, commands and their "
+        "outcomes that later turns may rely on; drop chatter. Reply with the summary only.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\n"
+        f"New conversation turns:\n{transcript}"
+    )
+
+
+@dataclass
+class StepTiming:
+    """Where the time and bytes of one agent step went."""
+    step: int
+    llm_seconds: float = 0.0
+    first_token_seconds: Optional[float] = None  # set when the response was streamed
+    parse_seconds: float = 0.0
+    tool_seconds: float = 0.0
+    bytes_in: int = 0           # request payload sent to the LLM
+    bytes_out: int = 0          # LLM response
+    tool_output_bytes: int = 0  # serialized tool results fed back to the LLM
+    tool_name: Optional[str] = None
+    tool_calls: int = 0
+    early_tool_calls: int = 0   # calls started while the response was still streaming
+    failed_tool_calls: int = 0  # calls with a non-zero exit status
+    skipped_tool_calls: int = 0  # calls not run because an earlier one failed
+    input_tokens: int = 0       # prompt tokens, as reported by the provider
+    cache_read_tokens: int = 0  # ... of which served from the provider's prompt cache
+    cache_write_tokens: int = 0
+
+
+def record_usage(timing: StepTiming, llm_adapter):
+    """Copy the adapter's last_usage (if it reports one) into *timing*."""
+    usage = getattr(llm_adapter, "last_usage", None)
+    if isinstance(usage, dict):
+        timing.input_tokens = usage.get("input_tokens", 0)
+        timing.cache_read_tokens = usage.get("cache_read_tokens", 0)
+        timing.cache_write_tokens = usage.get("cache_write_tokens", 0)
+
+
+def check_tool_calls(tool_calls: list) -> str | None:
+    """Error message for the first call naming an unknown tool or lacking arguments, else None."""
+    for tool_call in tool_calls:
+        name = tool_call.get("tool_name")
+        if name not in TOOL_NAMES or (not tool_call.get("args") and name not in NO_ARGUMENT_TOOLS):
+            return f"Error: Unknown tool or missing arguments: {tool_call}"
+    return None
+
+
+def count_failures(timing: StepTiming, results: list):
+    """Record how many of a step's tool results failed or were skipped."""
+    timing.failed_tool_calls = sum(is_failure(result) for result in results)
+    timing.skipped_tool_calls = sum(bool(result.get("skipped")) for result in results)
+
+
+class AgenticLoopExecutor:
+    def __init__(self, llm_adapter, tool_executor, max_steps: int = 25, turn_timeout: float = 600.0):
+        """
+        Args:
+            llm_adapter:   adapter exposing generate_response(messages, model)
+            tool_executor: ToolExecutor used to parse and run tool calls
+            max_steps:     LLM calls allowed per turn before giving up
+            turn_timeout:  wall-clock seconds allowed per turn; checked between steps
+                           and between streamed chunks, and tool calls get at
+                           most the time that is left
+        """
+        self.llm_adapter = llm_adapter
+        self.tool_executor = tool_executor
+        self.max_steps = max_steps
+        self.turn_timeout = turn_timeout
+        # Per-step timings of the most recent run_agentic_loop call
+        self.last_timeline: List[StepTiming] = []
+        self.system_prompt = SYSTEM_PROMPT
+
+    def summarize(self, previous_summary: str, messages: List[Dict[str, str]], model: str = None) -> str | None:
+        """
+        Fold *messages* into *previous_summary* with the current LLM.
+
+        Returns:
+            The new summary, or None if the adapter reported an error.
+        """
+        kwargs = {"messages": [{"role": "user", "content": build_summary_prompt(previous_summary, messages)}]}
+        if model:
+            kwargs["model"] = model
+        summary = self.llm_adapter.generate_response(**kwargs)
+        if not summary or summary.startswith("Error"):
+            return None
+        return summary
+
+    def _generate(self, kwargs: dict, timing: StepTiming, on_token=None, early_calls: list = None,
+                  deadline: float = None) -> str | None:
+        """
+        Call the LLM, streaming deltas to *on_token* when the adapter supports it.
+
+        While streaming, tool calls are detected as soon as their JSON closes.
+        Read-only ones at the start of the response are started right away and
+        appended to *early_calls* as ``((tool_name, args), future)``, so they
+        run while the rest of the response is still being generated.
+
+        Returns None if the stream was abandoned because *deadline* (a
+        time.monotonic() value) passed.
+        """
+        started = time.perf_counter()
+        stream = getattr(self.llm_adapter, "stream_response", None) if on_token else None
+        if stream is None:
+            response = self.llm_adapter.generate_response(**kwargs)
+        else:
+            parser = StreamingToolCallParser()
+            dispatching = early_calls is not None
+            chunks = []
+            chunk_iter = stream(**kwargs)
+            for chunk in chunk_iter:
+                if deadline is not None and time.monotonic() > deadline:
+                    close = getattr(chunk_iter, "close", None)
+                    if close:
+                        close()  # ends the HTTP response instead of reading it to the end
+                    timing.llm_seconds = time.perf_counter() - started
+                    return None
+                if not chunks:
+                    timing.first_token_seconds = time.perf_counter() - started
+                chunks.append(chunk)
+                on_token(chunk)
+                for tool_call in parser.feed(chunk) if dispatching else ():
+                    call = (tool_call.get("tool_name"), tool_call.get("args"))
+                    # Only a read-only prefix may run early: anything after a
+                    # state-changing call has to wait for it
+                    dispatching = self.tool_executor.is_independent(*call)
+                    if dispatching:
+                        early_calls.append((call, self.tool_executor.submit_tool(*call)))
+            response = "".join(chunks)
+        timing.llm_seconds = time.perf_counter() - started
+        return response
+
+    def run_agentic_loop(self, messages: List[Dict[str, str]], model: str = None, on_message=None,
+                         max_steps: int = None, turn_timeout: float = None, on_token=None) -> str:
+        """
+        Drive the LLM until it answers without a tool call.
+
+        Runs iteratively, one LLM call per step, and stops after *max_steps*
+        steps or once *turn_timeout* seconds have elapsed. Per-step timings are
+        left in ``self.last_timeline``.
+
+        Args:
+            messages:     working conversation; tool calls and outputs are appended to it
+            model:        model name passed through to the adapter
+            on_message:   optional callback ``(role, content)`` invoked for every
+                          message the loop appends, so callers can persist them
+            max_steps:    overrides the executor's max_steps for this turn
+            turn_timeout: overrides the executor's turn_timeout for this turn
+            on_token:     optional callback receiving LLM text deltas as they
+                          stream in (requires an adapter with stream_response)
+        """
+        max_steps = max_steps or self.max_steps
+        turn_timeout = turn_timeout or self.turn_timeout
+        deadline = time.monotonic() + turn_timeout
+        self.last_timeline = timeline = []
+
         # Add the system prompt to the beginning of the messages if it's not already there
         if not messages or messages[0].get("role") != "system":
             messages.insert(0, {"role": "system", "content": self.system_prompt})
@@ -34,22 +211,79 @@ If you do not need to execute a command, respond with a regular message.
         kwargs = {"messages": messages}
         if model:
             kwargs["model"] = model
-        llm_response = self.llm_adapter.generate_response(**kwargs)
 
-        tool_call = self.tool_executor.parse_tool_call(llm_response)
+        for step in range(1, max_steps + 1):
+            if time.monotonic() > deadline:
+                return f"Error: Turn deadline of {turn_timeout:g}s exceeded after {step - 1} steps."
+
+            timing = StepTiming(step=step)
+            timeline.append(timing)
+            timing.bytes_in = sum(len(m["content"].encode("utf-8")) for m in messages)
+
+            early_calls = []
+            llm_response = self._generate(kwargs, timing, on_token, early_calls, deadline)
+            if llm_response is None:
+                return f"Error: Turn deadline of {turn_timeout:g}s exceeded during step {step}."
+            record_usage(timing, self.llm_adapter)
+            timing.bytes_out = len(llm_response.encode("utf-8"))
+
+            started = time.perf_counter()
+            tool_calls = self.tool_executor.parse_tool_calls(llm_response)
+            timing.parse_seconds = time.perf_counter() - started
 
-        if tool_call:
-            tool_name = tool_call.get("tool_name")
-            args = tool_call.get("args")
+            if not tool_calls:
+                return llm_response
 
-            if tool_name == "execute_bash" and args:
-                print(f"Executing bash command: {args}")
-                tool_output = self.tool_executor.execute_tool(tool_name, args)
-                messages.append({"role": "assistant", "content": llm_response}) # Store the tool call from LLM
-                messages.append({"role": "tool_output", "content": json.dumps(tool_output)})
-                # Recursively call the agentic loop with the tool output
-                return self.run_agentic_loop(messages, model=model)
+            error = check_tool_calls(tool_calls)
+            if error:
+                return error
+
+            calls = [(tool_call["tool_name"], tool_call.get("args")) for tool_call in tool_calls]
+            # Early results are only usable if the final parse agrees with them
+            early_results = []
+            for (call, future), final in zip(early_calls, calls):
+                if call != final:
+                    break
+                early_results.append(future)
+
+            if on_token:
+                print()  # end the streamed line before tool progress output
+            for name, args in calls:
+                if name == "execute_bash":
+                    print(f"Executing bash command: {args}")
+                else:
+                    print(f"Running {name}: {json.dumps(args)}")
+            timing.tool_name = calls[0][0]
+            timing.tool_calls = len(calls)
+            timing.early_tool_calls = len(early_results)
+            started = time.perf_counter()
+            results = [future.result() for future in early_results]
+            remaining = calls[len(results):]
+            # Tool calls may use what is left of the turn, not more
+            time_left = deadline - time.monotonic()
+            if any(is_batch_failure(*call, result) for call, result in zip(calls, results)):
+                results.extend(skipped_result() for _ in remaining)
+            elif remaining and time_left <= 0:
+                return f"Error: Turn deadline of {turn_timeout:g}s exceeded during step {step}."
+            elif len(remaining) == 1:
+                results.append(self.tool_executor.execute_tool(*remaining[0], timeout=time_left))
+            elif remaining:
+                results.extend(self.tool_executor.execute_tools(remaining, timeout=time_left))
+            count_failures(timing, results)
+            if len(calls) == 1:
+                tool_outputs = [json.dumps(results[0])]
             else:
-                return f"Error: Unknown tool or missing arguments: {tool_call}"
-        else:
-            return llm_response
+                # Label each result with its call so the LLM can tell them apart
+                tool_outputs = [json.dumps({"tool_name": name, "args": args, **result})
+                                for (name, args), result in zip(calls, results)]
+            timing.tool_seconds = time.perf_counter() - started
+            timing.tool_output_bytes = sum(len(output.encode("utf-8")) for output in tool_outputs)
+
+            outgoing = [("assistant", llm_response)] # Store the tool call from LLM
+            outgoing += [("tool_output", output) for output in tool_outputs]
+            for role, content in outgoing:
+                messages.append({"role": role, "content": content})
+                if on_message:
+                    on_message(role, content)
+
+        return f"Error: Step limit of {max_steps} reached without a final answer."
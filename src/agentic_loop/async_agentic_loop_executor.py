@@ -0,0 +1,176 @@
+"""
+Asyncio variant of AgenticLoopExecutor.
+
+Works with the async adapters (get_async_llm_adapter) and AsyncToolExecutor:
+every LLM request and shell command is awaited, so one event loop can drive
+many independent sessions at once, e.g.
+
+    await asyncio.gather(*(executor.run_agentic_loop(msgs) for executor, msgs in sessions))
+
+Use one executor (and one AsyncToolExecutor) per session; adapters can be shared.
+"""
+
+import asyncio
+import json
+import time
+from typing import List, Dict
+
+from tool_executor.tool_executor import StreamingToolCallParser, is_batch_failure, skipped_result
+from .agentic_loop_executor import (
+    SYSTEM_PROMPT, StepTiming, build_summary_prompt, check_tool_calls, count_failures, record_usage,
+)
+
+
+class AsyncAgenticLoopExecutor:
+    def __init__(self, llm_adapter, tool_executor, max_steps: int = 25, turn_timeout: float = 600.0):
+        """
+        Args:
+            llm_adapter:   async adapter exposing ``await generate_response(messages, model)``
+            tool_executor: AsyncToolExecutor used to parse and run tool calls
+            max_steps:     LLM calls allowed per turn before giving up
+            turn_timeout:  wall-clock seconds allowed per turn; enforced while
+                           waiting on the LLM or a command, not just between steps
+        """
+        self.llm_adapter = llm_adapter
+        self.tool_executor = tool_executor
+        self.max_steps = max_steps
+        self.turn_timeout = turn_timeout
+        # Per-step timings of the most recent run_agentic_loop call
+        self.last_timeline: List[StepTiming] = []
+        self.system_prompt = SYSTEM_PROMPT
+
+    async def summarize(self, previous_summary: str, messages: List[Dict[str, str]], model: str = None) -> str | None:
+        """Async counterpart of AgenticLoopExecutor.summarize()."""
+        kwargs = {"messages": [{"role": "user", "content": build_summary_prompt(previous_summary, messages)}]}
+        if model:
+            kwargs["model"] = model
+        summary = await self.llm_adapter.generate_response(**kwargs)
+        if not summary or summary.startswith("Error"):
+            return None
+        return summary
+
+    async def _generate(self, kwargs: dict, timing: StepTiming, on_token=None, early_calls: list = None) -> str:
+        """
+        Await the LLM, streaming deltas to *on_token* when the adapter supports it.
+
+        As in the sync executor, read-only tool calls at the start of a
+        streamed response are started as tasks before the response completes.
+        """
+        started = time.perf_counter()
+        stream = getattr(self.llm_adapter, "stream_response", None) if on_token else None
+        if stream is None:
+            response = await self.llm_adapter.generate_response(**kwargs)
+        else:
+            parser = StreamingToolCallParser()
+            dispatching = early_calls is not None
+            chunks = []
+            async for chunk in stream(**kwargs):
+                if not chunks:
+                    timing.first_token_seconds = time.perf_counter() - started
+                chunks.append(chunk)
+                on_token(chunk)
+                for tool_call in parser.feed(chunk) if dispatching else ():
+                    call = (tool_call.get("tool_name"), tool_call.get("args"))
+                    dispatching = self.tool_executor.is_independent(*call)
+                    if dispatching:
+                        early_calls.append((call, self.tool_executor.submit_tool(*call)))
+            response = "".join(chunks)
+        timing.llm_seconds = time.perf_counter() - started
+        return response
+
+    async def run_agentic_loop(self, messages: List[Dict[str, str]], model: str = None, on_message=None,
+                               max_steps: int = None, turn_timeout: float = None, on_token=None) -> str:
+        """
+        Drive the LLM until it answers without a tool call.
+
+        Same contract as AgenticLoopExecutor.run_agentic_loop(), except that
+        nothing is printed and the turn deadline cancels an LLM request or
+        command that is still in flight.
+        """
+        max_steps = max_steps or self.max_steps
+        turn_timeout = turn_timeout or self.turn_timeout
+        self.last_timeline = []
+        try:
+            return await asyncio.wait_for(
+                self._run(messages, model, on_message, max_steps, on_token), turn_timeout
+            )
+        except asyncio.TimeoutError:
+            completed = max(0, len(self.last_timeline) - 1)
+            return f"Error: Turn deadline of {turn_timeout:g}s exceeded after {completed} steps."
+
+    async def _run(self, messages, model, on_message, max_steps, on_token) -> str:
+        timeline = self.last_timeline
+
+        # Add the system prompt to the beginning of the messages if it's not already there
+        if not messages or messages[0].get("role") != "system":
+            messages.insert(0, {"role": "system", "content": self.system_prompt})
+
+        kwargs = {"messages": messages}
+        if model:
+            kwargs["model"] = model
+
+        for step in range(1, max_steps + 1):
+            timing = StepTiming(step=step)
+            timeline.append(timing)
+            timing.bytes_in = sum(len(m["content"].encode("utf-8")) for m in messages)
+
+            early_calls = []
+            try:
+                llm_response = await self._generate(kwargs, timing, on_token, early_calls)
+                record_usage(timing, self.llm_adapter)
+                timing.bytes_out = len(llm_response.encode("utf-8"))
+
+                started = time.perf_counter()
+                tool_calls = self.tool_executor.parse_tool_calls(llm_response)
+                timing.parse_seconds = time.perf_counter() - started
+
+                if not tool_calls:
+                    return llm_response
+
+                error = check_tool_calls(tool_calls)
+                if error:
+                    return error
+
+                calls = [(tool_call["tool_name"], tool_call.get("args")) for tool_call in tool_calls]
+                # Early results are only usable if the final parse agrees with them
+                early_results = []
+                for (call, task), final in zip(early_calls, calls):
+                    if call != final:
+                        break
+                    early_results.append(task)
+
+                timing.tool_name = calls[0][0]
+                timing.tool_calls = len(calls)
+                timing.early_tool_calls = len(early_results)
+                started = time.perf_counter()
+                results = list(await asyncio.gather(*early_results))
+                remaining = calls[len(results):]
+                if any(is_batch_failure(*call, result) for call, result in zip(calls, results)):
+                    results.extend(skipped_result() for _ in remaining)
+                elif len(remaining) == 1:
+                    results.append(await self.tool_executor.execute_tool(*remaining[0]))
+                elif remaining:
+                    results.extend(await self.tool_executor.execute_tools(remaining))
+                count_failures(timing, results)
+            finally:
+                # Early calls the final parse disagreed with, or a cancelled turn
+                for _, task in early_calls:
+                    if not task.done():
+                        task.cancel()
+
+            if len(calls) == 1:
+                tool_outputs = [json.dumps(results[0])]
+            else:
+                tool_outputs = [json.dumps({"tool_name": name, "args": args, **result})
+                                for (name, args), result in zip(calls, results)]
+            timing.tool_seconds = time.perf_counter() - started
+            timing.tool_output_bytes = sum(len(output.encode("utf-8")) for output in tool_outputs)
+
+            outgoing = [("assistant", llm_response)]
+            outgoing += [("tool_output", output) for output in tool_outputs]
+            for role, content in outgoing:
+                messages.append({"role": role, "content": content})
+                if on_message:
+                    on_message(role, content)
+
+        return f"Error: Step limit of {max_steps} reached without a final answer."
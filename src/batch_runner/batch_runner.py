@@ -0,0 +1,213 @@
+"""
+Headless batch mode: run a JSONL file of prompts through the agentic loop.
+
+Each input line is one job:
+
+    {"id": "job-1", "prompt": "Count the .py files", "provider": "deepseek",
+     "model": "deepseek-chat", "session": "nightly-1", "max_steps": 10, "timeout": 300}
+
+Only "prompt" is required. Jobs without "session" are one-shot; jobs naming a
+session continue (or create) that persisted session, and jobs sharing a
+session run one after another. Everything else runs concurrently on one event
+loop with the async engine, at most *concurrency* jobs at a time.
+
+Results are appended to the output JSONL as each job finishes (so completion
+order, not input order), one line per job:
+
+    {"id", "line", "provider", "model", "session", "response", "error",
+     "latency_seconds", "steps", "tool_calls", "input_tokens", "cache_read_tokens"}
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, Optional
+
+from llm_adapters.llm_factory import get_async_llm_adapter, get_default_model, response_cache
+from llm_adapters.response_cache import format_cache_stats
+from tool_executor.async_tool_executor import AsyncToolExecutor
+from agentic_loop.async_agentic_loop_executor import AsyncAgenticLoopExecutor
+from session_manager.session_manager import SessionManager
+from context_manager.context_manager import ContextManager
+from safety_guardrail.safety_guardrail import SafetyGuardrail
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        concurrency: int = 8,
+        provider: str = None,
+        model: str = None,
+        max_steps: int = None,
+        turn_timeout: float = None,
+        session_dir: str = "./sessions",
+        session_backend: str = None,
+        workdir: str = "./workspace",
+    ):
+        """
+        Args:
+            concurrency:     jobs in flight at once
+            provider:        default provider (DEFAULT_LLM_PROVIDER, then "openai")
+            model:           default model (DEFAULT_LLM_MODEL, then the provider default)
+            max_steps:       default step limit per job (AGENT_MAX_STEPS, then 25)
+            turn_timeout:    default seconds per job (AGENT_TURN_TIMEOUT, then 600)
+            session_dir:     where session jobs are persisted
+            session_backend: "file" or "sqlite" (SESSION_BACKEND, then "file")
+            workdir:         each job's shell starts in its own subdirectory of this
+        """
+        self.concurrency = max(1, concurrency)
+        self.provider = provider or os.getenv("DEFAULT_LLM_PROVIDER", "openai")
+        self.model = model or os.getenv("DEFAULT_LLM_MODEL")
+        self.max_steps = max_steps or int(os.getenv("AGENT_MAX_STEPS", "25"))
+        self.turn_timeout = turn_timeout or float(os.getenv("AGENT_TURN_TIMEOUT", "600"))
+        self.session_dir = session_dir
+        self.session_backend = session_backend or os.getenv("SESSION_BACKEND", "file")
+        self.workdir = workdir
+        self.safety_guardrail = SafetyGuardrail()
+        self._adapters: Dict[str, object] = {}
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+
+    def _get_adapter(self, provider: str):
+        # One client (and connection pool) per provider, shared by all jobs
+        if provider not in self._adapters:
+            self._adapters[provider] = get_async_llm_adapter(provider)
+        return self._adapters[provider]
+
+    async def run(self, input_path: str, output_path: str) -> dict:
+        """
+        Run every job in *input_path*, appending results to *output_path*.
+
+        Returns:
+            {"jobs", "failed", "seconds"} totals for the whole batch.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        totals = {"jobs": 0, "failed": 0}
+        started = time.monotonic()
+
+        with open(output_path, "a", encoding="utf-8") as out:
+            async def worker():
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    result = await self.run_job(*item)
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+                    totals["jobs"] += 1
+                    totals["failed"] += result["error"] is not None
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+            # Lines are read as workers free up, so the input can be arbitrarily large
+            with open(input_path, "r", encoding="utf-8") as f:
+                for line_number, line in enumerate(f, start=1):
+                    if line.strip():
+                        await queue.put((line_number, line))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+        totals["seconds"] = round(time.monotonic() - started, 3)
+        return totals
+
+    async def run_job(self, line_number: int, line: str) -> dict:
+        """Run one input line and return its result record (never raises)."""
+        result = {
+            "id": str(line_number), "line": line_number, "provider": None, "model": None,
+            "session": None, "response": None, "error": None, "latency_seconds": 0.0,
+            "steps": 0, "tool_calls": 0, "input_tokens": 0, "cache_read_tokens": 0,
+        }
+        started = time.monotonic()
+        try:
+            spec = json.loads(line)
+            if not isinstance(spec, dict) or not spec.get("prompt"):
+                raise ValueError("each line must be a JSON object with a \"prompt\"")
+            result["id"] = str(spec.get("id", line_number))
+            result["session"] = spec.get("session")
+            if result["session"]:
+                lock = self._session_locks.setdefault(result["session"], asyncio.Lock())
+                async with lock:
+                    await self._run_spec(spec, result)
+            else:
+                await self._run_spec(spec, result)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["latency_seconds"] = round(time.monotonic() - started, 3)
+        return result
+
+    async def _run_spec(self, spec: dict, result: dict):
+        provider = spec.get("provider") or self.provider
+        model = spec.get("model") or (self.model if provider == self.provider else None)
+        model = model or get_default_model(provider)
+        result["provider"], result["model"] = provider, model
+
+        session_id = result["session"]
+        session_manager: Optional[SessionManager] = None
+        if session_id:
+            session_manager = SessionManager(self.session_dir, backend=self.session_backend)
+            if not session_manager.store.exists(session_id):
+                session_manager.create_new_session(session_id)
+            else:
+                session_manager.load_session(session_id)
+            session_manager.add_message("user", spec["prompt"])
+
+        tool_executor = AsyncToolExecutor(
+            self.safety_guardrail,
+            workdir=os.path.join(self.workdir, _safe_name(session_id or result["id"])),
+        )
+        loop_executor = AsyncAgenticLoopExecutor(
+            self._get_adapter(provider),
+            tool_executor,
+            max_steps=spec.get("max_steps") or self.max_steps,
+            turn_timeout=spec.get("timeout") or self.turn_timeout,
+        )
+        try:
+            if session_manager is not None:
+                # Older turns that do not fit the budget are dropped, not summarized
+                messages = ContextManager(session_manager).build_context(
+                    session_manager.get_history(), model, system_prompt=loop_executor.system_prompt,
+                )
+                on_message = session_manager.add_message
+            else:
+                messages = [{"role": "user", "content": spec["prompt"]}]
+                on_message = None
+            response = await loop_executor.run_agentic_loop(messages, model=model, on_message=on_message)
+            if session_manager is not None:
+                session_manager.add_message("assistant", response)
+        finally:
+            await tool_executor.close()
+            if session_manager is not None:
+                session_manager.store.close()
+
+        result["response"] = response
+        result["steps"] = len(loop_executor.last_timeline)
+        result["tool_calls"] = sum(timing.tool_calls for timing in loop_executor.last_timeline)
+        result["input_tokens"] = sum(timing.input_tokens for timing in loop_executor.last_timeline)
+        result["cache_read_tokens"] = sum(timing.cache_read_tokens for timing in loop_executor.last_timeline)
+        if response.startswith("Error"):
+            result["error"] = response
+
+
+def _safe_name(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name) or "_"
+
+
+def run_batch(input_path: str, output_path: str = None, **kwargs) -> dict:
+    """
+    Synchronous entry point for ``main.py --batch``.
+
+    *output_path* defaults to ``<input>.results.jsonl``; *kwargs* go to BatchRunner.
+    """
+    if output_path is None:
+        output_path = os.path.splitext(input_path)[0] + ".results.jsonl"
+    totals = asyncio.run(BatchRunner(**kwargs).run(input_path, output_path))
+    print(
+        f"Batch finished: {totals['jobs']} jobs, {totals['failed']} failed, "
+        f"{totals['seconds']}s. Results in {output_path}",
+        file=sys.stderr,
+    )
+    llm_cache = response_cache()
+    if llm_cache is not None:
+        print(f"LLM response cache: {format_cache_stats(llm_cache.stats())}", file=sys.stderr)
+    return totals
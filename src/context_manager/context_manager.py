@@ -0,0 +1,211 @@
+"""
+Token-budgeted context construction.
+
+Sits between the session history and the LLM adapter. Each turn it builds a
+payload of at most the model's token budget:
+
+    [system prompt] + [rolling summary of older turns] + [recent turns verbatim]
+
+Older turns are folded into a rolling summary only when the verbatim part
+outgrows the budget. The summary is generated once per roll, stored alongside
+the session (see SessionManager.get_context_summary) and reused on later turns,
+so the per-turn payload stays bounded without re-summarizing every time.
+
+The history is walked backwards from the newest turn, so a LazyHistory only
+pages in what the budget (and one roll) can use. A roll summarizes at most
+max_roll_ratio budgets' worth of turns; anything older is dropped and
+replaced by an OMITTED_MARKER.
+"""
+
+import os
+from typing import Callable, Dict, List, Optional
+
+# Payload budgets in tokens by model-name prefix (longest prefix wins). These
+# sit well below each model's context window to leave room for the reply.
+MODEL_TOKEN_BUDGETS = {
+    "gpt-4o":     96_000,
+    "gpt-4.1":    96_000,
+    "gpt-5":      96_000,
+    "o3":         96_000,
+    "o4":         96_000,
+    "claude":     150_000,
+    "gemini":     200_000,
+    "deepseek":   48_000,
+    "mistral":    96_000,
+    "grok":       96_000,
+    "llama":      96_000,
+    "meta-llama": 96_000,
+    "qwen":       96_000,
+    "kimi":       96_000,
+    "glm":        96_000,
+}
+DEFAULT_TOKEN_BUDGET = 24_000
+
+SUMMARY_PREFIX = "[Summary of earlier conversation]:\n"
+# Stands in for turns that were dropped without being summarized
+OMITTED_MARKER = "[{count} earlier messages omitted]"
+
+# (previous_summary, messages) -> new summary text, or None on failure
+Summarizer = Callable[[Optional[str], List[Dict[str, str]]], Optional[str]]
+
+
+class ContextManager:
+    def __init__(
+        self,
+        session_manager=None,
+        token_budget: int = None,
+        min_recent_messages: int = 4,
+        retain_ratio: float = 0.5,
+        max_roll_ratio: float = 2.0,
+        chars_per_token: int = 4,
+    ):
+        """
+        Args:
+            session_manager:     where rolling summaries are cached (None = memory only)
+            token_budget:        fixed budget for every model; defaults to the
+                                 CONTEXT_TOKEN_BUDGET env-var, then MODEL_TOKEN_BUDGETS
+            min_recent_messages: messages always kept verbatim, whatever their size
+            retain_ratio:        share of the budget left to verbatim turns after a
+                                 roll, so summaries are regenerated only occasionally
+            max_roll_ratio:      budgets' worth of turns summarized by one roll; older
+                                 turns are dropped, bounding the summarizer calls
+            chars_per_token:     heuristic used to estimate tokens from characters
+        """
+        self.session_manager = session_manager
+        env_budget = os.getenv("CONTEXT_TOKEN_BUDGET")
+        self.token_budget = token_budget or (int(env_budget) if env_budget else None)
+        self.min_recent_messages = min_recent_messages
+        self.retain_ratio = retain_ratio
+        self.max_roll_ratio = max_roll_ratio
+        self.chars_per_token = chars_per_token
+        self._summary: Optional[dict] = None
+
+    def get_token_budget(self, model: str = None) -> int:
+        """Return the payload token budget for *model*."""
+        if self.token_budget:
+            return self.token_budget
+        name = (model or "").lower().rsplit("/", 1)[-1]
+        best = None
+        for prefix in MODEL_TOKEN_BUDGETS:
+            if name.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        return MODEL_TOKEN_BUDGETS[best] if best else DEFAULT_TOKEN_BUDGET
+
+    def estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Rough token count: characters / chars_per_token plus per-message overhead."""
+        return sum(len(m["content"]) // self.chars_per_token + 4 for m in messages)
+
+    def _load_summary(self) -> Optional[dict]:
+        if self.session_manager is not None:
+            return self.session_manager.get_context_summary()
+        return self._summary
+
+    def _store_summary(self, summary: dict):
+        if self.session_manager is not None:
+            self.session_manager.save_context_summary(summary)
+        else:
+            self._summary = summary
+
+    def build_context(
+        self,
+        history,
+        model: str = None,
+        summarize: Summarizer = None,
+        system_prompt: str = None,
+    ) -> List[Dict[str, str]]:
+        """
+        Build the message list to send for the next turn.
+
+        Args:
+            history:       full session history (list or LazyHistory), oldest first
+            model:         model name used to pick the token budget
+            summarize:     callable producing a rolling summary; without one,
+                           turns that do not fit are simply dropped
+            system_prompt: prepended verbatim when given
+
+        Returns:
+            A new list; *history* is not modified.
+        """
+        head = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        available = self.get_token_budget(model) - self.estimate_tokens(head)
+
+        summary = self._load_summary()
+        if summary and summary["upto"] > len(history):
+            summary = None  # stale: the history it covered is gone
+        start = summary["upto"] if summary else 0
+        total = len(history)
+
+        summary_text = summary["content"] if summary else None
+        if self._fit_from(history, start, total, available - self._summary_tokens(summary_text)) > start:
+            # Roll: keep a recent tail within retain_ratio of the budget and fold
+            # the turns between the old summary and that tail into the summary.
+            keep_from = self._fit_from(history, start, total, int(available * self.retain_ratio),
+                                       self.min_recent_messages)
+            fold_from = self._fit_from(history, start, keep_from, int(available * self.max_roll_ratio))
+            evicted = history[fold_from:keep_from]
+            if fold_from > start:
+                evicted.insert(0, {"role": "user", "content": OMITTED_MARKER.format(count=fold_from - start)})
+            start = keep_from
+            new_text = self._roll_summary(summary_text, evicted, summarize, available // 2)
+            if new_text is not None:
+                summary_text = new_text
+                self._store_summary({"upto": start, "content": summary_text})
+
+        messages = list(head)
+        if summary_text:
+            messages.append({"role": "user", "content": SUMMARY_PREFIX + summary_text})
+        elif start > 0:
+            # Without a summary the tail may open with an assistant turn;
+            # providers expect the conversation to start with the user.
+            messages.append({"role": "user", "content": OMITTED_MARKER.format(count=start)})
+        messages.extend(history[start:])
+        return messages
+
+    def _summary_tokens(self, summary_text: Optional[str]) -> int:
+        if not summary_text:
+            return 0
+        return self.estimate_tokens([{"content": SUMMARY_PREFIX + summary_text}])
+
+    def _fit_from(self, history, start: int, stop: int, budget: int, minimum: int = 0) -> int:
+        """
+        Lowest index >= *start* such that history[index:stop] fits in *budget*
+        (keeping at least *minimum* messages). Walks backwards from *stop*, so
+        only the messages it returns over are read.
+        """
+        used = 0
+        index = stop
+        while index > start:
+            used += self.estimate_tokens([history[index - 1]])
+            if used > budget and stop - index >= minimum:
+                break
+            index -= 1
+        return index
+
+    def _roll_summary(
+        self,
+        summary_text: Optional[str],
+        evicted: List[Dict[str, str]],
+        summarize: Optional[Summarizer],
+        chunk_tokens: int,
+    ) -> Optional[str]:
+        """Fold *evicted* into *summary_text*, in chunks of at most *chunk_tokens*."""
+        if not evicted or summarize is None:
+            return None
+        chunk: List[Dict[str, str]] = []
+        chunk_used = 0
+        for message in evicted:
+            size = self.estimate_tokens([message])
+            if chunk and chunk_used + size > chunk_tokens:
+                summary_text = summarize(summary_text, chunk)
+                if _failed(summary_text):
+                    return None
+                chunk, chunk_used = [], 0
+            chunk.append(message)
+            chunk_used += size
+        summary_text = summarize(summary_text, chunk)
+        return None if _failed(summary_text) else summary_text
+
+
+def _failed(summary_text: Optional[str]) -> bool:
+    """True for a missing summary or an adapter error passed through as text."""
+    return not summary_text or summary_text.startswith("Error")
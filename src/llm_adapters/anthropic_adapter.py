@@ -1,8 +1,8 @@
 import os
 import anthropic
-from dotenv import load_dotenv
+from .llm_factory import load_env
 
-load_dotenv()
+load_env()
 
 class AnthropicAdapter:
     def __init__(self, api_key=None):
@@ -14,20 +14,55 @@ Usage:
         base_url="https://agentrouter.org/",
         auth_token="sk-xxx",
     )
+
+    # Streaming
+    for delta in adapter.stream_response(messages, model="claude-sonnet-4-20250514"):
+        print(delta, end="", flush=True)
+
+    # Prompt caching: system prompt and history prefix marked with cache_control
+    adapter = AnthropicCompatibleAdapter(api_key="sk-xxx", prompt_caching=True)
+    adapter.generate_response(messages)
+    adapter.last_usage  # {"input_tokens": ..., "cache_read_tokens": ..., ...}
+
+    # Asyncio (one event loop, many concurrent sessions)
+    adapter = AsyncAnthropicCompatibleAdapter(api_key="sk-xxx")
+    text = await adapter.generate_response(messages, model="claude-sonnet-4-20250514")
 """
 
 import anthropic
-from typing import List, Dict
+from typing import AsyncIterator, Iterator, List, Dict, Optional
+
+CACHE_CONTROL = {"type": "ephemeral"}
+# Upper bound on the tokens of one completion
+MAX_TOKENS = 4096
+
+
+def _tokens(usage, name: str) -> int:
+    value = getattr(usage, name, None)
+    return value if isinstance(value, int) else 0
 
 
 class AnthropicCompatibleAdapter:
-    def __init__(self, api_key: str = None, base_url: str = None, auth_token: str = None):
+    def __init__(self, api_key: str = None, base_url: str = None, auth_token: str = None,
+                 prompt_caching: bool = False, http_client=None):
         """
         Args:
-            api_key:    API key (sent as x-api-key header)
-            base_url:   Custom API endpoint (e.g., "https://agentrouter.org/")
-            auth_token: Bearer token auth (alternative to api_key, used by some providers)
+            api_key:        API key (sent as x-api-key header)
+            base_url:       Custom API endpoint (e.g., "https://agentrouter.org/")
+            auth_token:     Bearer token auth (alternative to api_key, used by some providers)
+            prompt_caching: mark the system prompt and the stable history prefix
+                            with cache_control so repeated turns read them from
+                            the provider's prompt cache
+            http_client:    httpx client whose connection pool is shared with
+                            other adapters (see llm_factory)
         """
+        self.base_url = base_url
+        self.prompt_caching = prompt_caching
+        self.max_tokens = MAX_TOKENS
+        # Token usage of the most recent call, and running totals
+        self.last_usage: Optional[dict] = None
+        self.usage_totals = {"input_tokens": 0, "output_tokens": 0,
+                             "cache_read_tokens": 0, "cache_write_tokens": 0}
         kwargs = {}
         if api_key:
             kwargs["api_key"] = api_key
@@ -35,12 +70,17 @@ class AnthropicCompatibleAdapter:
             kwargs["base_url"] = base_url
         if auth_token:
             kwargs["auth_token"] = auth_token
+        if http_client is not None:
+            kwargs["http_client"] = http_client
         # Add default headers to avoid WAF (e.g., Alibaba Cloud) blocking requests
         kwargs["default_headers"] = {
             "User-Agent": "ClawLittle/1.0",
             "Accept": "application/json",
         }
-        self.client = anthropic.Anthropic(**kwargs)
+        self.client = self._create_client(**kwargs)
+
+    def _create_client(self, **kwargs):
+        return anthropic.Anthropic(**kwargs)
 
     def _normalize_messages(self, messages: List[Dict[str, str]]) -> tuple:
         """
@@ -82,45 +122,181 @@ class AnthropicCompatibleAdapter:
 
         return system_prompt, anthropic_messages
 
-    def generate_response(self, messages: List[Dict[str, str]], model: str = None) -> str:
-        try:
-            system_prompt, anthropic_messages = self._normalize_messages(messages)
+    def _build_request(self, messages: List[Dict[str, str]], model: str = None) -> dict | None:
+        """Return the messages.create() keyword arguments, or None if there is no user turn."""
+        system_prompt, anthropic_messages = self._normalize_messages(messages)
+        if not anthropic_messages:
+            return None
+        kwargs = {
+            "model": model,
+            "max_tokens": self.max_tokens,
+            "messages": anthropic_messages,
+        }
+        if system_prompt:
+            kwargs["system"] = system_prompt
+        if self.prompt_caching:
+            self._add_cache_breakpoints(kwargs)
+        return kwargs
 
-            if not anthropic_messages:
-                return "Error: No user messages found."
+    @staticmethod
+    def _add_cache_breakpoints(kwargs: dict):
+        """
+        Mark cache breakpoints (at most 4 are allowed; 3 are used):
+
+        - the system prompt, identical on every request;
+        - the newest message, so this request writes the whole prefix to the cache;
+        - the user message before it, where the previous request of an
+          agentic turn wrote its prefix, so this request reads it back.
 
-            kwargs = {
-                "model": model,
-                "max_tokens": 4096,
-                "messages": anthropic_messages,
+        Histories only grow at the end, so everything before a breakpoint is
+        byte-identical on the next request.
+        """
+        if kwargs.get("system"):
+            kwargs["system"] = [{"type": "text", "text": kwargs["system"], "cache_control": CACHE_CONTROL}]
+        messages = kwargs["messages"]
+        marked = [len(messages) - 1]
+        for index in range(len(messages) - 2, -1, -1):
+            if messages[index]["role"] == "user":
+                marked.append(index)
+                break
+        for index in marked:
+            message = messages[index]
+            messages[index] = {
+                "role": message["role"],
+                "content": [{"type": "text", "text": message["content"], "cache_control": CACHE_CONTROL}],
             }
-            if system_prompt:
-                kwargs["system"] = system_prompt
+
+    def _record_usage(self, usage):
+        """Store *usage* from a response as last_usage (cache hits = cache_read_tokens)."""
+        if usage is None:
+            return
+        cache_read = _tokens(usage, "cache_read_input_tokens")
+        cache_write = _tokens(usage, "cache_creation_input_tokens")
+        self.last_usage = {
+            # input_tokens excludes cached tokens in the Messages API; report the full prompt
+            "input_tokens": _tokens(usage, "input_tokens") + cache_read + cache_write,
+            "output_tokens": _tokens(usage, "output_tokens"),
+            "cache_read_tokens": cache_read,
+            "cache_write_tokens": cache_write,
+        }
+        for key, value in self.last_usage.items():
+            self.usage_totals[key] += value
+
+    @staticmethod
+    def _extract_text(response) -> str:
+        # Handle different response formats from various API proxies:
+        # 1. Plain string (some proxies like AgentRouter)
+        if isinstance(response, str):
+            return response
+        # 2. Dict-like response (some proxies return raw JSON)
+        if isinstance(response, dict):
+            content = response.get("content", [])
+            if isinstance(content, str):
+                return content
+            if isinstance(content, list) and len(content) > 0:
+                block = content[0]
+                if isinstance(block, str):
+                    return block
+                return block.get("text", str(block))
+            return str(response)
+        # 3. Standard Anthropic Message object
+        content_block = response.content[0]
+        if isinstance(content_block, str):
+            return content_block
+        elif hasattr(content_block, "text"):
+            return content_block.text
+        else:
+            return str(content_block)
+
+    def generate_response(self, messages: List[Dict[str, str]], model: str = None) -> str:
+        self.last_usage = None
+        try:
+            kwargs = self._build_request(messages, model)
+            if kwargs is None:
+                return "Error: No user messages found."
 
             response = self.client.messages.create(**kwargs)
+            self._record_usage(getattr(response, "usage", None))
+            return self._extract_text(response)
+        except Exception as e:
+            return f"Error communicating with Anthropic-compatible API: {e}"
 
-            # Handle different response formats from various API proxies:
-            # 1. Plain string (some proxies like AgentRouter)
-            if isinstance(response, str):
-                return response
-            # 2. Dict-like response (some proxies return raw JSON)
-            if isinstance(response, dict):
-                content = response.get("content", [])
-                if isinstance(content, str):
-                    return content
-                if isinstance(content, list) and len(content) > 0:
-                    block = content[0]
-                    if isinstance(block, str):
-                        return block
-                    return block.get("text", str(block))
-                return str(response)
-            # 3. Standard Anthropic Message object
-            content_block = response.content[0]
-            if isinstance(content_block, str):
-                return content_block
-            elif hasattr(content_block, "text"):
-                return content_block.text
-            else:
-                return str(content_block)
+    def stream_response(self, messages: List[Dict[str, str]], model: str = None) -> Iterator[str]:
+        """
+        Yield the completion as text deltas while it is generated.
+
+        Falls back to a single generate_response() chunk if the provider (or a
+        proxy in front of it) rejects streaming before sending anything.
+        """
+        self.last_usage = None
+        kwargs = self._build_request(messages, model)
+        if kwargs is None:
+            yield "Error: No user messages found."
+            return
+
+        started = False
+        try:
+            with self.client.messages.stream(**kwargs) as stream:
+                for delta in stream.text_stream:
+                    if delta:
+                        started = True
+                        yield delta
+                try:
+                    self._record_usage(stream.get_final_message().usage)
+                except Exception:
+                    pass  # usage is best-effort; some proxies do not send it
+        except Exception as e:
+            if started:
+                yield f"\n[Error: stream interrupted: {e}]"
+                return
+            yield self.generate_response(messages, model=model)
+
+
+class AsyncAnthropicCompatibleAdapter(AnthropicCompatibleAdapter):
+    """
+    AnthropicCompatibleAdapter on ``anthropic.AsyncAnthropic``.
+
+    generate_response() is a coroutine and stream_response() an async
+    generator, so many requests can be in flight on one event loop.
+    """
+
+    def _create_client(self, **kwargs):
+        return anthropic.AsyncAnthropic(**kwargs)
+
+    async def generate_response(self, messages: List[Dict[str, str]], model: str = None) -> str:
+        self.last_usage = None
+        try:
+            kwargs = self._build_request(messages, model)
+            if kwargs is None:
+                return "Error: No user messages found."
+
+            response = await self.client.messages.create(**kwargs)
+            self._record_usage(getattr(response, "usage", None))
+            return self._extract_text(response)
         except Exception as e:
             return f"Error communicating with Anthropic-compatible API: {e}"
+
+    async def stream_response(self, messages: List[Dict[str, str]], model: str = None) -> AsyncIterator[str]:
+        """Async counterpart of AnthropicCompatibleAdapter.stream_response()."""
+        self.last_usage = None
+        kwargs = self._build_request(messages, model)
+        if kwargs is None:
+            yield "Error: No user messages found."
+            return
+
+        started = False
+        try:
+            async with self.client.messages.stream(**kwargs) as stream:
+                async for delta in stream.text_stream:
+                    if delta:
+                        started = True
+                        yield delta
+                try:
+                    self._record_usage((await stream.get_final_message()).usage)
+                except Exception:
+                    pass  # usage is best-effort; some proxies do not send it
+        except Exception as e:
+            if started:
+                yield f"\n[Error: stream interrupted: {e}]"
+                return
+            yield await self.generate_response(messages, model=model)
@@ -6,14 +6,38 @@ OpenAI-compatible or Anthropic-compatible adapter, with a base_url override
 and default model.
 
 To add a new provider, simply add an entry to the PROVIDERS dict below.
+
+get_llm_adapter() keeps the adapters it creates, keyed by provider and
+credentials, so switching back to a provider with /llm reuses its client.
+All of them share one HTTP connection pool per SDK, which keeps idle
+connections alive long enough to survive a tool call between turns.
+
+The adapter modules and their SDKs are imported on first use, so only the
+SDK of the api_format actually used is loaded.
+
+With LLM_RESPONSE_CACHE set, adapters are wrapped in a cache of responses to
+identical requests (see response_cache.py).
 """
 
+import importlib
 import os
-from dotenv import load_dotenv
-from .openai_compatible_adapter import OpenAICompatibleAdapter
-from .anthropic_compatible_adapter import AnthropicCompatibleAdapter
+import threading
+
+from .response_cache import AsyncCachedAdapter, CachedAdapter, ResponseCache
+
+_env_loaded = False
+
 
-load_dotenv()
+def load_env():
+    """Load .env into os.environ; only the first call reads the file."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+load_env()
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Provider Registry
@@ -23,8 +47,20 @@ load_dotenv()
 # api_key_env     : env-var name for the API key
 # auth_token_env  : (optional) env-var name for bearer-token auth (Anthropic format)
 # default_model   : model used when none is explicitly specified
+# prompt_caching  : (optional, Anthropic format) mark the system prompt and
+#                   history prefix with cache_control. On by default only for
+#                   the first-party "anthropic" provider; compatible endpoints
+#                   opt in with True, since some reject the field. OpenAI-format
+#                   providers cache repeated prefixes automatically.
 # ──────────────────────────────────────────────────────────────────────────────
 
+# Shared HTTP connection pool. Idle keep-alive connections are closed after
+# HTTP_KEEPALIVE_EXPIRY seconds (the SDKs' default of 5 s drops them while a
+# command runs between two requests, so the next request redoes TLS).
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE = 20
+HTTP_KEEPALIVE_EXPIRY = 120.0
+
 PROVIDERS = {
     # ═══════════════════════════════════════════════════════════════════════
     #  OpenAI-compatible providers (Chat Completions API)
@@ -239,32 +275,168 @@ def list_providers() -> list[str]:
     return sorted(PROVIDERS.keys())
 
 
-def get_llm_adapter(provider: str, api_key: str = None):
+# api_format -> (adapter module, sync class, async class, SDK module)
+_ADAPTER_CLASSES = {
+    "openai":    ("openai_compatible_adapter", "OpenAICompatibleAdapter", "AsyncOpenAICompatibleAdapter", "openai"),
+    "anthropic": ("anthropic_compatible_adapter", "AnthropicCompatibleAdapter", "AsyncAnthropicCompatibleAdapter",
+                  "anthropic"),
+}
+
+
+def _adapter_class(api_format: str, asynchronous: bool = False):
+    """The adapter class for *api_format*, importing its module (and SDK) on first use."""
+    module_name, sync_name, async_name, _ = _ADAPTER_CLASSES[api_format]
+    module = importlib.import_module(f".{module_name}", __package__)
+    return getattr(module, async_name if asynchronous else sync_name)
+
+
+# Adapters made by get_llm_adapter() and the pools they share; see close_adapters()
+_adapters = {}
+_http_clients = {}
+_lock = threading.Lock()
+_UNSET = object()
+_response_cache = _UNSET
+
+
+def _adapter_settings(provider: str, api_key: str) -> dict:
+    config = get_provider_config(provider)
+    settings = {"api_key": api_key or os.getenv(config["api_key_env"]), "base_url": config.get("base_url")}
+    if config["api_format"] == "anthropic":
+        auth_token_env = config.get("auth_token_env")
+        settings["auth_token"] = os.getenv(auth_token_env) if auth_token_env else None
+        settings["prompt_caching"] = config.get("prompt_caching", provider == "anthropic")
+    elif config["api_format"] != "openai":
+        raise ValueError(f"Unknown api_format '{config['api_format']}' for provider '{provider}'")
+    return settings
+
+
+def _http_client(api_format: str):
+    """The connection pool shared by all adapters of *api_format* (caller holds _lock)."""
+    client = _http_clients.get(api_format)
+    if client is None:
+        sdk = importlib.import_module(_ADAPTER_CLASSES[api_format][3])
+        # Limits of the httpx the SDK is built on, so this module needn't import it
+        limits = type(sdk.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        client = _http_clients[api_format] = sdk.DefaultHttpxClient(limits=limits)
+    return client
+
+
+def response_cache():
+    """The process-wide ResponseCache configured by LLM_RESPONSE_CACHE, or None if it is off."""
+    global _response_cache
+    if _response_cache is _UNSET:
+        with _lock:
+            if _response_cache is _UNSET:
+                _response_cache = ResponseCache.from_env()
+    return _response_cache
+
+
+def get_llm_adapter(provider: str, api_key: str = None, lazy: bool = False):
     """
-    Factory: create the correct adapter for *provider*.
+    Factory: return the adapter for *provider*, creating it on first use.
+
+    Adapters are cached by provider, API key, base_url and the other
+    settings they are built with, and share one connection pool per SDK.
+    With LLM_RESPONSE_CACHE set they come wrapped in a CachedAdapter.
 
     Args:
         provider: registered provider name (case-insensitive)
         api_key:  optional override; falls back to the provider's env-var
+        lazy:     return a LazyAdapter that creates the adapter (and imports
+                  its SDK) only when it is first used
 
     Returns:
-        OpenAICompatibleAdapter | AnthropicCompatibleAdapter
+        OpenAICompatibleAdapter | AnthropicCompatibleAdapter | CachedAdapter | LazyAdapter
     """
-    config = get_provider_config(provider)
-    resolved_key = api_key or os.getenv(config["api_key_env"])
-    base_url = config.get("base_url")
+    if lazy:
+        return LazyAdapter(provider, api_key)
+    api_format = get_api_format(provider)
+    settings = _adapter_settings(provider, api_key)
+    key = (provider.lower(), *settings.items())
+    cache = response_cache()
+    with _lock:
+        adapter = _adapters.get(key)
+        if adapter is None:
+            adapter = _adapter_class(api_format)(**settings, http_client=_http_client(api_format))
+            if cache is not None:
+                adapter = CachedAdapter(adapter, provider.lower(), cache)
+            _adapters[key] = adapter
+    return adapter
 
-    if config["api_format"] == "openai":
-        return OpenAICompatibleAdapter(api_key=resolved_key, base_url=base_url)
 
-    elif config["api_format"] == "anthropic":
-        auth_token_env = config.get("auth_token_env")
-        auth_token = os.getenv(auth_token_env) if auth_token_env else None
-        return AnthropicCompatibleAdapter(
-            api_key=resolved_key,
-            base_url=base_url,
-            auth_token=auth_token,
-        )
+class LazyAdapter:
+    """
+    Stands in for get_llm_adapter(*provider*, *api_key*): the provider is
+    checked at once, but the adapter is created on first attribute access,
+    or ahead of time on a background thread by prefetch(). Only resolve()
+    and prefetch() are its own: every other attribute, last_usage included,
+    is the real adapter's.
+    """
 
-    else:
-        raise ValueError(f"Unknown api_format '{config['api_format']}' for provider '{provider}'")
+    def __init__(self, provider: str, api_key: str = None):
+        get_provider_config(provider)  # unknown providers fail here, not on first use
+        self._provider = provider
+        self._api_key = api_key
+        self._adapter = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        """The real adapter, created now if it has not been yet."""
+        if self._adapter is None:
+            with self._lock:
+                if self._adapter is None:
+                    self._adapter = get_llm_adapter(self._provider, self._api_key)
+        return self._adapter
+
+    def prefetch(self):
+        """Create the adapter on a daemon thread, e.g. while the user types the first prompt."""
+        def create():
+            try:
+                self.resolve()
+            except Exception:
+                pass  # raised again by the resolve() of the first real use
+
+        threading.Thread(target=create, name="adapter-prefetch", daemon=True).start()
+
+    def __getattr__(self, name):
+        if name.startswith("__") or name in ("_adapter", "_lock", "_provider", "_api_key"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+
+def close_adapters():
+    """
+    Forget the cached adapters and close their shared connection pools; the
+    response cache settings are read again on next use.
+    """
+    global _response_cache
+    with _lock:
+        clients = list(_http_clients.values())
+        _adapters.clear()
+        _http_clients.clear()
+        _response_cache = _UNSET
+    for client in clients:
+        client.close()
+
+
+def get_async_llm_adapter(provider: str, api_key: str = None):
+    """
+    Like get_llm_adapter(), but returns an asyncio adapter whose
+    generate_response() / stream_response() must be awaited / iterated with
+    ``async for``. Async adapters are not cached: their connection pool
+    belongs to the event loop they are first used in, so callers keep one
+    per loop (see BatchRunner).
+
+    Returns:
+        AsyncOpenAICompatibleAdapter | AsyncAnthropicCompatibleAdapter | AsyncCachedAdapter
+    """
+    adapter_class = _adapter_class(get_api_format(provider), asynchronous=True)
+    adapter = adapter_class(**_adapter_settings(provider, api_key))
+    cache = response_cache()
+    if cache is not None:
+        adapter = AsyncCachedAdapter(adapter, provider.lower(), cache)
+    return adapter
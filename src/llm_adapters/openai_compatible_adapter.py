@@ -13,20 +13,58 @@ Usage:
     
     # OpenRouter
     adapter = OpenAICompatibleAdapter(api_key="sk-xxx", base_url="https://openrouter.ai/api/v1")
+
+    # Streaming
+    for delta in adapter.stream_response(messages, model="gpt-4o-mini"):
+        print(delta, end="", flush=True)
+
+    # Token usage, including prompt-cache hits, of the last call
+    adapter.last_usage  # {"input_tokens": ..., "cache_read_tokens": ..., ...}
+
+    # Asyncio (one event loop, many concurrent sessions)
+    adapter = AsyncOpenAICompatibleAdapter(api_key="sk-xxx")
+    text = await adapter.generate_response(messages, model="gpt-4o-mini")
+    async for delta in adapter.stream_response(messages, model="gpt-4o-mini"):
+        print(delta, end="", flush=True)
 """
 
 import openai
-from typing import List, Dict
+from typing import AsyncIterator, Iterator, List, Dict, Optional
+
+
+def _tokens(usage, name: str) -> int:
+    value = getattr(usage, name, None)
+    return value if isinstance(value, int) else 0
 
 
 class OpenAICompatibleAdapter:
-    def __init__(self, api_key: str = None, base_url: str = None):
+    """
+    Prompt caching is automatic on the OpenAI side for repeated prefixes of
+    1024+ tokens; it only needs the messages before the newest turn to be
+    byte-identical between requests, which _normalize_messages() preserves.
+    Cache hits are reported in last_usage["cache_read_tokens"].
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, http_client=None):
+        self.base_url = base_url
+        # Token usage of the most recent call, and running totals
+        self.last_usage: Optional[dict] = None
+        self.usage_totals = {"input_tokens": 0, "output_tokens": 0,
+                             "cache_read_tokens": 0, "cache_write_tokens": 0}
+        # Cleared if the provider rejects stream_options={"include_usage": True}
+        self.stream_usage = True
         kwargs = {}
         if api_key:
             kwargs["api_key"] = api_key
         if base_url:
             kwargs["base_url"] = base_url
-        self.client = openai.OpenAI(**kwargs)
+        if http_client is not None:
+            # Connection pool shared with other adapters (see llm_factory)
+            kwargs["http_client"] = http_client
+        self.client = self._create_client(**kwargs)
+
+    def _create_client(self, **kwargs):
+        return openai.OpenAI(**kwargs)
 
     def _normalize_messages(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
         """
@@ -53,13 +91,129 @@ class OpenAICompatibleAdapter:
 
         return normalized
 
+    def _record_usage(self, usage):
+        """Store *usage* from a response as last_usage (cache hits = cache_read_tokens)."""
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        # DeepSeek reports hits as prompt_cache_hit_tokens instead of prompt_tokens_details
+        cache_read = _tokens(details, "cached_tokens") or _tokens(usage, "prompt_cache_hit_tokens")
+        self.last_usage = {
+            "input_tokens": _tokens(usage, "prompt_tokens"),
+            "output_tokens": _tokens(usage, "completion_tokens"),
+            "cache_read_tokens": cache_read,
+            "cache_write_tokens": 0,  # caching is automatic; writes are not billed or reported
+        }
+        for key, value in self.last_usage.items():
+            self.usage_totals[key] += value
+
+    def _stream_options(self) -> dict:
+        return {"stream_options": {"include_usage": True}} if self.stream_usage else {}
+
     def generate_response(self, messages: List[Dict[str, str]], model: str = None) -> str:
+        self.last_usage = None
         try:
             normalized = self._normalize_messages(messages)
             response = self.client.chat.completions.create(
                 model=model,
                 messages=normalized,
             )
+            self._record_usage(getattr(response, "usage", None))
             return response.choices[0].message.content
         except Exception as e:
             return f"Error communicating with OpenAI-compatible API: {e}"
+
+    def stream_response(self, messages: List[Dict[str, str]], model: str = None) -> Iterator[str]:
+        """
+        Yield the completion as text deltas while it is generated.
+
+        Falls back to a single generate_response() chunk if the provider
+        rejects streaming before sending anything.
+        """
+        self.last_usage = None
+        started = False
+        try:
+            normalized = self._normalize_messages(messages)
+            try:
+                stream = self.client.chat.completions.create(
+                    model=model,
+                    messages=normalized,
+                    stream=True,
+                    **self._stream_options(),
+                )
+            except openai.BadRequestError:
+                if not self.stream_usage:
+                    raise
+                self.stream_usage = False  # provider does not know stream_options
+                stream = self.client.chat.completions.create(model=model, messages=normalized, stream=True)
+            for chunk in stream:
+                # With include_usage the last chunk carries usage and no choices
+                self._record_usage(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    started = True
+                    yield delta
+        except Exception as e:
+            if started:
+                yield f"\n[Error: stream interrupted: {e}]"
+                return
+            yield self.generate_response(messages, model=model)
+
+
+class AsyncOpenAICompatibleAdapter(OpenAICompatibleAdapter):
+    """
+    OpenAICompatibleAdapter on ``openai.AsyncOpenAI``.
+
+    generate_response() is a coroutine and stream_response() an async
+    generator, so many requests can be in flight on one event loop.
+    """
+
+    def _create_client(self, **kwargs):
+        return openai.AsyncOpenAI(**kwargs)
+
+    async def generate_response(self, messages: List[Dict[str, str]], model: str = None) -> str:
+        self.last_usage = None
+        try:
+            normalized = self._normalize_messages(messages)
+            response = await self.client.chat.completions.create(
+                model=model,
+                messages=normalized,
+            )
+            self._record_usage(getattr(response, "usage", None))
+            return response.choices[0].message.content
+        except Exception as e:
+            return f"Error communicating with OpenAI-compatible API: {e}"
+
+    async def stream_response(self, messages: List[Dict[str, str]], model: str = None) -> AsyncIterator[str]:
+        """Async counterpart of OpenAICompatibleAdapter.stream_response()."""
+        self.last_usage = None
+        started = False
+        try:
+            normalized = self._normalize_messages(messages)
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=model,
+                    messages=normalized,
+                    stream=True,
+                    **self._stream_options(),
+                )
+            except openai.BadRequestError:
+                if not self.stream_usage:
+                    raise
+                self.stream_usage = False
+                stream = await self.client.chat.completions.create(model=model, messages=normalized, stream=True)
+            async for chunk in stream:
+                self._record_usage(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    started = True
+                    yield delta
+        except Exception as e:
+            if started:
+                yield f"\n[Error: stream interrupted: {e}]"
+                return
+            yield await self.generate_response(messages, model=model)
@@ -1,8 +1,8 @@
 import os
 import openai
-from dotenv import load_dotenv
+from .llm_factory import load_env
 
-load_dotenv()
+load_env()
 
 class OpenRouterAdapter:
     def __init__(self, api_key=None):
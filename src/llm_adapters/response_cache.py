@@ -0,0 +1,328 @@
+"""
+Cache of LLM responses for byte-identical requests.
+
+Re-running the same task (tests, batch reruns, demos) sends the same
+requests again. With LLM_RESPONSE_CACHE set, get_llm_adapter() and
+get_async_llm_adapter() wrap their adapters in CachedAdapter /
+AsyncCachedAdapter, which answer a request seen before from the cache:
+
+    key = sha256(provider, model, the adapter's normalized messages,
+                 parameters, the adapter's base_url / prompt_caching / max_tokens)
+
+Entries live in an in-memory LRU in front of a directory of JSON files
+(one per key). Both expire after a TTL; the directory is kept under a size
+limit by deleting the least recently used files (a hit refreshes the
+file's mtime). Error responses are never cached.
+
+Settings (environment):
+    LLM_RESPONSE_CACHE       directory of the disk store; unset = no cache
+    LLM_RESPONSE_CACHE_TTL   seconds an entry is valid (default 7 days, 0 = forever)
+    LLM_RESPONSE_CACHE_MB    size limit of the disk store (default 256)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+# Responses kept in memory (least recently used are dropped first)
+MAX_MEMORY_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 ** 2
+# Adapters report failures as text starting like this; those are not cached
+ERROR_PREFIXES = ("Error communicating with ", "Error: ")
+STREAM_ERROR_MARKER = "\n[Error: stream interrupted:"
+# Adapter settings that change the response to the same messages, so part of every key
+REQUEST_SETTINGS = ("base_url", "prompt_caching", "max_tokens")
+# ids of the CachedAdapters whose latest lookup in this thread / asyncio task was a hit
+_hits: ContextVar[frozenset] = ContextVar("response_cache_hits", default=frozenset())
+
+
+def _is_error(text) -> bool:
+    return not isinstance(text, str) or text.startswith(ERROR_PREFIXES) or STREAM_ERROR_MARKER in text
+
+
+class ResponseCache:
+    def __init__(self, directory: Optional[str] = None, ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+                 max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES, max_memory_entries: int = MAX_MEMORY_ENTRIES):
+        """
+        Args:
+            directory:          where entries are persisted; None keeps them in memory only
+            ttl_seconds:        age after which an entry is ignored and deleted; None = never
+            max_disk_bytes:     size the disk store is kept under
+            max_memory_entries: responses kept in the in-memory LRU
+        """
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds or None
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()  # key -> (created, response)
+        self._lock = threading.Lock()
+        self._disk_bytes = None       # size of the disk store, scanned on first write
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """The cache configured by LLM_RESPONSE_CACHE*, or None if it is not enabled."""
+        directory = os.getenv("LLM_RESPONSE_CACHE")
+        if not directory:
+            return None
+        ttl = os.getenv("LLM_RESPONSE_CACHE_TTL")
+        size = os.getenv("LLM_RESPONSE_CACHE_MB")
+        return cls(directory,
+                   ttl_seconds=float(ttl) if ttl else DEFAULT_TTL_SECONDS,
+                   max_disk_bytes=int(size) * 1024 ** 2 if size else DEFAULT_MAX_DISK_BYTES)
+
+    @staticmethod
+    def key(provider: str, model: Optional[str], messages, params: Optional[dict] = None) -> str:
+        """Hash of everything that determines the response."""
+        request = {"provider": provider, "model": model, "messages": messages, "params": params or {}}
+        encoded = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """The cached response for *key*, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._memory[key]
+        entry = self._read(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry[1]
+
+    def _read(self, key: str) -> Optional[tuple]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            created, response = float(record["created"]), record["response"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if self._expired(created):
+            self._delete(path)
+            return None
+        try:
+            os.utime(path)  # most recently used: evicted last
+        except OSError:
+            pass
+        return created, response
+
+    def put(self, key: str, response: str, **metadata):
+        """Store *response* (error responses are ignored); *metadata* is saved alongside on disk."""
+        if _is_error(response):
+            return
+        created = time.time()
+        with self._lock:
+            self._remember(key, (created, response))
+        if self.directory:
+            self._write(key, {"created": created, "response": response, **metadata})
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _write(self, key: str, record: dict):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        # Written under a temporary name, so readers never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            self._delete(tmp_path)
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._disk_bytes += len(data) - old_size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _scan(self) -> list:
+        """(mtime, size, path) of every entry on disk."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        """Delete least recently used files until the store is under its size limit (caller holds _lock)."""
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            self._delete(path)
+            total -= size
+            self.evictions += 1
+        self._disk_bytes = total
+
+    @staticmethod
+    def _delete(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Drop every entry, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+            if self.directory:
+                for _, _, path in self._scan():
+                    self._delete(path)
+            self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "disk_bytes": self._disk_bytes,
+                "evictions": self.evictions,
+            }
+
+
+def format_cache_stats(stats: dict) -> str:
+    """One-line summary of ResponseCache.stats() for the REPL and batch mode."""
+    disk = f", {stats['disk_bytes'] / 1024 ** 2:.1f} MiB on disk" if stats["disk_bytes"] is not None else ""
+    return (f"{stats['hits']} hits ({stats['memory_hits']} memory, {stats['disk_hits']} disk), "
+            f"{stats['misses']} misses ({stats['hit_rate']:.0%}){disk}, {stats['evictions']} evicted")
+
+
+class CachedAdapter:
+    """
+    Wraps an adapter so that requests seen before are answered from a
+    ResponseCache. Only adapter (the wrapped one), cache and last_usage are
+    the wrapper's own; every other attribute (usage totals, client,
+    base_url, ...) is the wrapped adapter's. last_usage is None after a
+    cache hit. Whether the latest request was a hit is tracked per thread
+    and asyncio task, so sessions sharing the adapter each see their own.
+    """
+
+    def __init__(self, adapter, provider: str, cache: ResponseCache):
+        self.adapter = adapter
+        self.cache = cache
+        self._provider = provider  # namespace of this adapter's keys
+
+    def _key(self, messages: List[Dict[str, str]], model: Optional[str], params: dict) -> str:
+        normalize = getattr(self.adapter, "_normalize_messages", None)
+        try:
+            normalized = normalize(messages) if normalize else messages
+        except Exception:
+            normalized = messages
+        settings = {name: getattr(self.adapter, name, None) for name in REQUEST_SETTINGS}
+        return self.cache.key(self._provider, model, normalized, {**settings, **params})
+
+    def _lookup(self, messages, model, params) -> tuple:
+        key = self._key(messages, model, params)
+        response = self.cache.get(key)
+        hits = _hits.get()
+        _hits.set(hits | {id(self)} if response is not None else hits - {id(self)})
+        return key, response
+
+    @property
+    def last_usage(self) -> Optional[dict]:
+        return None if id(self) in _hits.get() else getattr(self.adapter, "last_usage", None)
+
+    def generate_response(self, messages: List[Dict[str, str]], model: str = None, **params) -> str:
+        key, response = self._lookup(messages, model, params)
+        if response is None:
+            response = self.adapter.generate_response(messages, model=model, **params)
+            self.cache.put(key, response, provider=self._provider, model=model)
+        return response
+
+    def stream_response(self, messages: List[Dict[str, str]], model: str = None, **params) -> Iterator[str]:
+        """Yields a cached response as one chunk; otherwise streams and caches the complete text."""
+        key, response = self._lookup(messages, model, params)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        for chunk in self.adapter.stream_response(messages, model=model, **params):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(key, "".join(chunks), provider=self._provider, model=model)
+
+    def __getattr__(self, name):
+        if name.startswith("__") or name == "adapter":
+            raise AttributeError(name)
+        return getattr(self.adapter, name)
+
+
+class AsyncCachedAdapter(CachedAdapter):
+    """
+    CachedAdapter for the asyncio adapters. Cache lookups are synchronous:
+    a disk hit is one small file read.
+    """
+
+    async def generate_response(self, messages: List[Dict[str, str]], model: str = None, **params) -> str:
+        key, response = self._lookup(messages, model, params)
+        if response is None:
+            response = await self.adapter.generate_response(messages, model=model, **params)
+            self.cache.put(key, response, provider=self._provider, model=model)
+        return response
+
+    async def stream_response(self, messages: List[Dict[str, str]], model: str = None,
+                              **params) -> AsyncIterator[str]:
+        """Async counterpart of CachedAdapter.stream_response()."""
+        key, response = self._lookup(messages, model, params)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        async for chunk in self.adapter.stream_response(messages, model=model, **params):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(key, "".join(chunks), provider=self._provider, model=model)
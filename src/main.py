@@ -1,5 +1,60 @@
-from orchestrator.orchestrator import Orchestrator
+import argparse
+import importlib
+import time
 
-if __name__ == "__main__":
+# Imported in this order by --profile-startup, so each line shows what that
+# package adds on top of the ones before it
+STARTUP_MODULES = (
+    "llm_adapters.llm_factory",
+    "safety_guardrail.safety_guardrail",
+    "tool_executor.tool_executor",
+    "session_manager.session_manager",
+    "context_manager.context_manager",
+    "agentic_loop.agentic_loop_executor",
+    "orchestrator.orchestrator",
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ClawLittle terminal agent")
+    parser.add_argument("--batch", metavar="REQUESTS_JSONL",
+                        help="run the prompts in this JSONL file headlessly instead of the REPL")
+    parser.add_argument("--output", metavar="RESULTS_JSONL",
+                        help="where batch results are appended (default: <batch>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="batch jobs run at once (default: 8)")
+    parser.add_argument("--provider", help="default provider for batch jobs")
+    parser.add_argument("--model", help="default model for batch jobs")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each import and initialization step took before the first prompt")
+    return parser.parse_args(argv)
+
+
+def start_orchestrator(profile: bool = False):
+    """Import and build the Orchestrator, printing a timing breakdown if *profile*."""
+    timings = []
+    for module in STARTUP_MODULES if profile else ():
+        started = time.perf_counter()
+        importlib.import_module(module)
+        timings.append((f"import {module}", time.perf_counter() - started))
+    from orchestrator.orchestrator import Orchestrator
     orchestrator = Orchestrator()
-    orchestrator.run()
+    if profile:
+        timings += [(f"init {name}", seconds) for name, seconds in orchestrator.startup_timings]
+        print("Startup profile:")
+        for name, seconds in timings:
+            print(f"  {name:<45} {seconds * 1000:8.1f} ms")
+        print(f"  {'total':<45} {sum(seconds for _, seconds in timings) * 1000:8.1f} ms")
+        print("  (the LLM SDK is imported in the background and bash starts with the first command)")
+    return orchestrator
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.batch:
+        from batch_runner.batch_runner import run_batch
+        run_batch(args.batch, args.output, concurrency=args.concurrency,
+                  provider=args.provider, model=args.model)
+    else:
+        orchestrator = start_orchestrator(profile=args.profile_startup)
+        orchestrator.run()
@@ -1,41 +1,73 @@
 import os
 import json
+import time
+from contextlib import contextmanager
 from typing import List, Dict, Any
 
 from llm_adapters.llm_factory import (
     get_llm_adapter,
+    close_adapters,
     get_default_model,
     get_api_format,
     list_providers,
+    response_cache,
 )
+from llm_adapters.response_cache import format_cache_stats
 from tool_executor.tool_executor import ToolExecutor
 from agentic_loop.agentic_loop_executor import AgenticLoopExecutor
 from session_manager.session_manager import SessionManager
+from context_manager.context_manager import ContextManager
 from safety_guardrail.safety_guardrail import SafetyGuardrail
 
+
+@contextmanager
+def _phase(timings: list, name: str):
+    """Append (*name*, seconds spent in the block) to *timings*."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append((name, time.perf_counter() - started))
+
+
 class Orchestrator:
     def __init__(self):
-        self.session_manager = SessionManager()
-        self.safety_guardrail = SafetyGuardrail()
-        self.tool_executor = ToolExecutor(self.safety_guardrail) # Pass guardrail to tool executor
-        
+        # (phase, seconds) of this constructor, shown by main.py --profile-startup
+        self.startup_timings = []
+        with _phase(self.startup_timings, "session store"):
+            self.session_manager = SessionManager(backend=os.getenv("SESSION_BACKEND", "file"))
+        with _phase(self.startup_timings, "safety guardrail"):
+            self.safety_guardrail = SafetyGuardrail()
+        with _phase(self.startup_timings, "tool executor"):
+            # bash is spawned by the first command, not here
+            self.tool_executor = ToolExecutor(self.safety_guardrail) # Pass guardrail to tool executor
+
         # Initial LLM setup
         self.current_llm_provider = os.getenv("DEFAULT_LLM_PROVIDER", "openai")
         self.current_llm_model = os.getenv(
             "DEFAULT_LLM_MODEL",
             get_default_model(self.current_llm_provider),
         )
-        self.llm_adapter = get_llm_adapter(self.current_llm_provider)
-        self.agentic_loop_executor = AgenticLoopExecutor(self.llm_adapter, self.tool_executor)
+        with _phase(self.startup_timings, "LLM adapter"):
+            # The SDK is imported when the adapter is first used (prefetched by run())
+            self.llm_adapter = get_llm_adapter(self.current_llm_provider, lazy=True)
+            self.agentic_loop_executor = AgenticLoopExecutor(
+                self.llm_adapter,
+                self.tool_executor,
+                max_steps=int(os.getenv("AGENT_MAX_STEPS", "25")),
+                turn_timeout=float(os.getenv("AGENT_TURN_TIMEOUT", "600")),
+            )
+        self.context_manager = ContextManager(self.session_manager)
 
-        self._initialize_session()
+        with _phase(self.startup_timings, "open session"):
+            self._initialize_session()
 
     def _initialize_session(self):
         if os.path.exists(self.session_manager.session_dir):
-            sessions = self.session_manager.list_sessions()
-            if sessions:
+            most_recent = self.session_manager.get_most_recent_session()
+            if most_recent:
                 print("Existing sessions found. Loading the most recent one.")
-                self.session_manager.load_session(sessions[-1])
+                self.session_manager.load_session(most_recent)
             else:
                 print("No existing sessions. Creating a new one.")
                 self.session_manager.create_new_session()
@@ -53,6 +85,7 @@ class Orchestrator:
         print("  /session load <id>      - Load an existing session")
         print("  /session list           - List all available sessions")
         print("  /session current        - Show current session ID")
+        print("  /timeline               - Show per-step timings of the last turn")
         print("  /exit                   - Exit the application")
         print("  /help                   - Show this help message")
         print("\nType your message to the LLM or a command.")
@@ -73,7 +106,41 @@ class Orchestrator:
             print(f"  {name:<15} {fmt:<12} {model:<30} {url}{marker}")
         print("  " + "-" * 72)
 
+    def _print_timeline(self):
+        """Print the per-step timings recorded for the last agent turn."""
+        timeline = self.agentic_loop_executor.last_timeline
+        if not timeline:
+            print("No agent turn recorded yet.")
+            return
+        print(f"\n  {'Step':<5} {'LLM s':>8} {'Parse s':>8} {'Tool s':>8} {'In B':>10} {'Out B':>8} {'Tool B':>8} "
+              f"{'In tok':>8} {'Cached':>8}  Tool")
+        for t in timeline:
+            print(f"  {t.step:<5} {t.llm_seconds:>8.3f} {t.parse_seconds:>8.4f} {t.tool_seconds:>8.3f} "
+                  f"{t.bytes_in:>10} {t.bytes_out:>8} {t.tool_output_bytes:>8} "
+                  f"{t.input_tokens:>8} {t.cache_read_tokens:>8}  {t.tool_name or '-'}")
+        total = sum(t.llm_seconds + t.parse_seconds + t.tool_seconds for t in timeline)
+        input_tokens = sum(t.input_tokens for t in timeline)
+        cached = sum(t.cache_read_tokens for t in timeline)
+        hit_rate = f", {cached / input_tokens:.0%} of prompt tokens from cache" if input_tokens else ""
+        print(f"  {len(timeline)} steps, {total:.3f}s total{hit_rate}")
+        pool = self.tool_executor.pool.stats()
+        print(f"  Shell pool: {pool['shells']}/{pool['size']} shells, {pool['utilization']:.1%} utilized, "
+              f"{pool['queued']} queued ({pool['max_queue_wait_seconds'] * 1000:.1f} ms max wait)")
+        cache = self.tool_executor.result_cache.stats()
+        print(f"  Result cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%}), "
+              f"{cache['entries']} entries")
+        usage = self.tool_executor.usage()
+        print(f"  Session resources: {usage['calls']} tool calls, {usage['cpu_seconds']:.2f}s CPU, "
+              f"peak RSS {usage['peak_rss_bytes'] / 1024 ** 2:.1f} MiB, "
+              f"{usage['read_bytes'] / 1024 ** 2:.1f} MiB read, {usage['write_bytes'] / 1024 ** 2:.1f} MiB written, "
+              f"{usage['limit_kills']} killed by limits")
+        llm_cache = response_cache()
+        if llm_cache is not None:
+            print(f"  LLM response cache: {format_cache_stats(llm_cache.stats())}")
+
     def run(self):
+        # Import the SDK and build the client while the user types
+        self.llm_adapter.prefetch()
         print("Welcome to ClawLittle! Type /help for commands.")
         print(f"Current LLM: {self.current_llm_provider} ({self.current_llm_model})")
         print(f"Active session: {self.session_manager.get_current_session_id()}")
@@ -91,19 +158,23 @@ class Orchestrator:
 
                     if command == "exit":
                         self.session_manager.save_session()
-                        self.tool_executor.shell.close()
+                        self.tool_executor.close()
+                        close_adapters()
                         print("Goodbye!")
                         break
                     elif command == "help":
                         self.print_help()
                     elif command == "providers":
                         self._print_providers()
+                    elif command == "timeline":
+                        self._print_timeline()
                     elif command == "llm":
                         if len(args) >= 1:
                             new_provider = args[0].lower()
                             new_model = args[1] if len(args) >= 2 else None
                             try:
-                                self.llm_adapter = get_llm_adapter(new_provider)
+                                self.llm_adapter = get_llm_adapter(new_provider, lazy=True)
+                                self.llm_adapter.prefetch()
                                 self.current_llm_provider = new_provider
                                 # Use specified model, or fall back to the provider's default
                                 self.current_llm_model = new_model or get_default_model(new_provider)
@@ -142,6 +213,9 @@ class Orchestrator:
                                     print("No sessions found.")
                             elif subcommand == "current":
                                 print(f"Current session: {self.session_manager.get_current_session_id()}")
+                                info = self.session_manager.get_session_info()
+                                if info:
+                                    print(f"  Messages: {info['message_count']}, size: {info['byte_size']} bytes")
                             else:
                                 print("Unknown session subcommand. Usage: /session [new|load|list|current]")
                         else:
@@ -150,20 +224,46 @@ class Orchestrator:
                         print(f"Unknown command: {user_input}")
                 else:
                     self.session_manager.add_message("user", user_input)
-                    messages = self.session_manager.get_history()
+                    # Send a token-bounded view of the history: system prompt,
+                    # rolling summary of older turns, recent turns verbatim.
+                    # Tool exchanges are journaled as they happen via on_message.
+                    messages = self.context_manager.build_context(
+                        self.session_manager.get_history(),
+                        model=self.current_llm_model,
+                        summarize=lambda previous, turns: self.agentic_loop_executor.summarize(
+                            previous, turns, model=self.current_llm_model
+                        ),
+                        system_prompt=self.agentic_loop_executor.system_prompt,
+                    )
+
+                    header = f"\n[{self.session_manager.get_current_session_id()}/{self.current_llm_provider}] LLM: "
+                    streamed = []
 
-                    # Adapters now handle tool_output role conversion internally,
-                    # so we just pass the full history directly.
+                    def print_token(chunk):
+                        if not streamed:
+                            print(header, end="")
+                        streamed.append(chunk)
+                        print(chunk, end="", flush=True)
+
+                    # Adapters handle tool_output role conversion internally.
                     response = self.agentic_loop_executor.run_agentic_loop(
-                        messages, model=self.current_llm_model
+                        messages,
+                        model=self.current_llm_model,
+                        on_message=self.session_manager.add_message,
+                        on_token=print_token,
                     )
 
-                    print(f"\n[{self.session_manager.get_current_session_id()}/{self.current_llm_provider}] LLM: {response}")
+                    if streamed and "".join(streamed).endswith(response):
+                        print()
+                    else:
+                        # Not streamed (e.g. a step-limit error raised by the loop itself)
+                        print(f"{header}{response}")
                     self.session_manager.add_message("assistant", response)
 
             except KeyboardInterrupt:
                 self.session_manager.save_session()
-                self.tool_executor.shell.close()
+                self.tool_executor.close()
+                close_adapters()
                 print("\nExiting ClawLittle. Goodbye!")
                 break
             except Exception as e:
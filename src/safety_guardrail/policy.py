@@ -0,0 +1,251 @@
+'''
+This module compiles the guardrail's allow/deny rules and evaluates commands against them.
+
+A Policy is a blocklist of executables plus an ordered list of rules. Each
+rule allows or denies one executable (or every one, with "*"), optionally
+only when its arguments match a regular expression. Rules are checked in
+order and the first match decides; an executable no rule matched is denied
+if it is on the blocklist. Every simple command of a command line (see
+shell_parser) must pass. Verdicts are memoized per command string.
+
+Policies can also be read from a TOML or JSON file. PolicyFile stats it on
+every check and swaps in the new policy when it changes, so running agents
+pick up edits without a restart. Compiled policies are cached by content,
+so an unchanged or reverted file reuses its compiled rules and verdicts.
+'''
+import json
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+from .shell_parser import ParsedCommand, parse_command
+
+# Verdicts kept per policy (least recently used are dropped first)
+MAX_VERDICT_CACHE = 1024
+
+# Compiled policies kept for policy files (keyed by blocklist and rules)
+MAX_COMPILED_POLICIES = 16
+
+# Executables blocked by default
+DEFAULT_BLOCKLIST = frozenset({
+    "rm",
+    "sudo",
+    "mv",
+    "chmod",
+    "chown",
+    "dd",
+    "mkfs",
+    "shutdown",
+    "reboot",
+    "halt",
+    "poweroff",
+    "passwd",
+    "userdel",
+    "groupdel",
+    "usermod",
+    "groupmod",
+    "visudo",
+    "crontab",
+    "iptables",
+    "ufw",
+    "kill",
+    "pkill",
+    "killall",
+    "wget",  # Can be used to download malicious scripts
+    "curl",  # Can be used to download malicious scripts or exfiltrate data
+})
+
+
+@dataclass(frozen=True)
+class Rule:
+    action: str                    # "allow" or "deny"
+    command: str                   # executable name, or "*" for any
+    args: Optional[str] = None     # regex searched in the space-joined arguments; None matches any
+    message: Optional[str] = None  # reason given when the rule denies
+
+    def __post_init__(self):
+        if self.action not in ("allow", "deny"):
+            raise ValueError(f"Rule action must be 'allow' or 'deny', got {self.action!r}")
+
+
+DEFAULT_RULES = (
+    Rule("deny", "rm", r"(^|\s)-rf(\s|$)", "Command 'rm -rf' is explicitly blocked for safety."),
+)
+
+
+class Policy:
+    def __init__(self, blocklist=DEFAULT_BLOCKLIST, rules=DEFAULT_RULES, cache_size: int = MAX_VERDICT_CACHE):
+        '''
+        Compiles *rules* into per-executable lists of (allow, regex, message).
+
+        Args:
+            blocklist:  executables denied unless a rule allows them
+            rules:      Rule objects, checked in order
+            cache_size: number of command verdicts memoized
+        '''
+        self.blocklist = frozenset(blocklist)
+        self.rules = tuple(rules)
+        compiled = [(rule.command, rule.action == "allow", re.compile(rule.args) if rule.args else None,
+                     rule.message) for rule in self.rules]
+        # Rules naming an executable keep their order relative to "*" rules
+        self._wildcard = tuple(entry[1:] for entry in compiled if entry[0] == "*")
+        self._by_command = {
+            name: tuple(entry[1:] for entry in compiled if entry[0] in (name, "*"))
+            for name in {entry[0] for entry in compiled} - {"*"}
+        }
+        self.check = lru_cache(maxsize=cache_size)(self._check)
+
+    def evaluate(self, parsed: ParsedCommand) -> tuple[bool, str]:
+        '''
+        Checks every simple command of a parsed command line.
+
+        Returns:
+            A tuple of whether all of them are allowed and a message naming the first one that is not.
+        '''
+        for command in parsed.commands:
+            name = command.name
+            if not name:
+                continue
+            arguments = None
+            for allow, pattern, message in self._by_command.get(name, self._wildcard):
+                if pattern is not None:
+                    if arguments is None:
+                        arguments = " ".join(command.words[1:])
+                    if not pattern.search(arguments):
+                        continue
+                if allow:
+                    break
+                return False, message or f"Command '{name}' is not allowed by the guardrail policy."
+            else:
+                if name in self.blocklist:
+                    return False, f"Command '{name}' is in the blocklist and is not allowed."
+        return True, "Command is safe."
+
+    def _check(self, command: str) -> tuple[bool, str]:
+        try:
+            parsed = parse_command(command)
+        except ValueError as e:
+            return False, f"Error parsing command: {e}"
+        if not parsed.commands:
+            return True, "Command is empty."
+        return self.evaluate(parsed)
+
+    def cache_info(self):
+        return self.check.cache_info()
+
+
+@lru_cache(maxsize=MAX_COMPILED_POLICIES)
+def compile_policy(blocklist: frozenset, rules: tuple) -> Policy:
+    '''The Policy for *blocklist* and *rules*, compiled once per distinct pair.'''
+    return Policy(blocklist, rules)
+
+
+def policy_from_dict(data: dict) -> Policy:
+    '''
+    Builds a Policy from parsed policy file contents: an optional "blocklist"
+    list of executables and an optional "rules" list of tables with the Rule
+    fields. Whichever is missing keeps its default.
+
+    Raises:
+        ValueError: if the contents are not a valid policy.
+    '''
+    if not isinstance(data, dict):
+        raise ValueError("policy must be a table of 'blocklist' and 'rules'")
+    unknown = set(data) - {"blocklist", "rules"}
+    if unknown:
+        raise ValueError(f"unknown policy keys: {', '.join(sorted(unknown))}")
+    blocklist = data.get("blocklist", DEFAULT_BLOCKLIST)
+    if not isinstance(blocklist, (list, frozenset)) or not all(isinstance(name, str) for name in blocklist):
+        raise ValueError("'blocklist' must be a list of executable names")
+    rules = DEFAULT_RULES
+    if "rules" in data:
+        if not isinstance(data["rules"], list):
+            raise ValueError("'rules' must be a list of tables")
+        rules = []
+        for index, rule in enumerate(data["rules"]):
+            try:
+                rules.append(Rule(**rule))
+                if rule.get("args") is not None:
+                    re.compile(rule["args"])
+            except (TypeError, ValueError, re.error) as e:
+                raise ValueError(f"rule {index + 1}: {e}") from None
+    return compile_policy(frozenset(blocklist), tuple(rules))
+
+
+def load_policy(path: str) -> Policy:
+    '''
+    Reads a policy file; JSON if *path* ends in .json, TOML otherwise.
+
+    Raises:
+        OSError: if the file cannot be read.
+        ValueError: if it is not a valid policy.
+    '''
+    with open(path, "rb") as f:
+        content = f.read()
+    try:
+        if path.endswith(".json"):
+            data = json.loads(content)
+        elif tomllib is None:
+            raise ValueError("TOML policy files need Python 3.11 or later; use JSON")
+        else:
+            data = tomllib.loads(content.decode("utf-8"))
+    except ValueError as e:  # JSONDecodeError, TOMLDecodeError, UnicodeDecodeError
+        raise ValueError(str(e)) from None
+    return policy_from_dict(data)
+
+
+class PolicyFile:
+    def __init__(self, path: str):
+        '''
+        A policy file watched for changes by its modification time, size and
+        inode, checked with one stat per current() call.
+
+        Raises:
+            OSError, ValueError: if the file cannot be loaded at startup.
+        '''
+        self.path = path
+        self.error = None  # why the last reload failed, if it did
+        self._lock = threading.Lock()
+        self._signature = self._stat()
+        self.policy = load_policy(path)
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def current(self) -> Policy:
+        '''
+        The policy in force. Reloads the file first if it changed; a file
+        that fails to load (or is gone) leaves the previous policy in force.
+        '''
+        signature = self._stat()
+        # While another thread reloads, the others keep using the current policy
+        if signature != self._signature and self._lock.acquire(blocking=False):
+            try:
+                self._reload(signature)
+            finally:
+                self._lock.release()
+        return self.policy
+
+    def _reload(self, signature):
+        self._signature = signature
+        try:
+            policy = load_policy(self.path)
+        except (OSError, ValueError) as e:
+            self.error = f"{self.path}: {e}"
+            print(f"Guardrail policy not reloaded, keeping the previous one: {self.error}", file=sys.stderr)
+            return
+        self.error = None
+        self.policy = policy  # a single reference swap; checks in flight finish on the old policy
@@ -1,66 +1,134 @@
 '''
 This module provides a SafetyGuardrail class to prevent the execution of dangerous shell commands.
 '''
+import os
 import shlex
 
+from .policy import Policy, PolicyFile
+from .shell_parser import parse_command
+
+# Commands that only read state when run without output redirection. Tools that
+# can write or spawn other commands through their arguments (find -exec, sed -i,
+# sort -o, awk system(), env, xargs, ...) are deliberately left out.
+READ_ONLY_COMMANDS = {
+    "cat", "head", "tail", "ls", "grep", "egrep", "fgrep", "rg", "wc", "stat",
+    "file", "du", "df", "pwd", "echo", "which", "type", "tree", "diff", "cmp",
+    "cut", "nl", "md5sum", "sha1sum", "sha256sum", "basename", "dirname",
+    "realpath", "readlink", "date", "whoami", "uname", "true",
+}
+# Options that make one of the above write, change the system or never return:
+# tree -o FILE writes the listing, date -s sets the clock, tail -f follows forever
+UNSAFE_READ_ONLY_OPTIONS = {
+    "tree": ("-o",),
+    "date": ("-s", "--set"),
+    "tail": ("-f", "-F", "--follow", "--retry"),
+}
+
+
+def _has_option(args: list, options: tuple) -> bool:
+    '''True if *args* use any of *options*, also inside short-option clusters (-fn5).'''
+    short = {option[1] for option in options if len(option) == 2}
+    for arg in args:
+        if arg == "--":
+            break
+        if arg.startswith("--"):
+            if arg.split("=", 1)[0] in options:
+                return True
+        elif arg.startswith("-") and len(arg) > 1:
+            for letter in arg[1:]:
+                if letter in short:
+                    return True
+                if not letter.isalpha():
+                    break  # the rest is an option value, e.g. -n5
+    return False
+
+
 class SafetyGuardrail:
-    def __init__(self):
-        # A list of dangerous commands that should be blocked.
-        self.blocklist = {
-            "rm",
-            "sudo",
-            "mv",
-            "chmod",
-            "chown",
-            "dd",
-            "mkfs",
-            "shutdown",
-            "reboot",
-            "halt",
-            "poweroff",
-            "passwd",
-            "userdel",
-            "groupdel",
-            "usermod",
-            "groupmod",
-            "visudo",
-            "crontab",
-            "iptables",
-            "ufw",
-            "kill",
-            "pkill",
-            "killall",
-            "wget", # Can be used to download malicious scripts
-            "curl", # Can be used to download malicious scripts or exfiltrate data
-        }
+    def __init__(self, policy: Policy = None, policy_file: str = None):
+        '''
+        Args:
+            policy:      blocklist and allow/deny rules, compiled once; see policy.py
+            policy_file: TOML or JSON policy file, reloaded whenever it changes
+                         (default: $GUARDRAIL_POLICY unless *policy* is given)
+        '''
+        if policy_file is None and policy is None:
+            policy_file = os.getenv("GUARDRAIL_POLICY") or None
+        self.policy_file = PolicyFile(policy_file) if policy_file else None
+        self._policy = policy or Policy()
+
+    @property
+    def policy(self) -> Policy:
+        '''The policy in force, reloaded from the policy file if that changed.'''
+        if self.policy_file is not None:
+            return self.policy_file.current()
+        return self._policy
+
+    @property
+    def blocklist(self) -> frozenset:
+        '''Executables that are blocked unless a policy rule allows them.'''
+        return self.policy.blocklist
 
     def is_safe(self, command: str) -> tuple[bool, str]:
         '''
         Checks if a command is safe to execute.
 
+        Every simple command in it is checked: the parts of pipelines and
+        lists, subshells, command substitutions, and commands run through
+        `bash -c`, `eval`, `find -exec` or wrappers like `env` and `xargs`.
+        Verdicts are cached per command string.
+
         Args:
             command: The command to check.
 
         Returns:
             A tuple containing a boolean indicating if the command is safe and a message.
         '''
-        try:
-            # Use shlex to safely parse the command into a list of tokens.
-            parts = shlex.split(command)
-            if not parts:
-                return True, "Command is empty."
+        return self.policy.check(command)
 
-            # The first part is the command itself.
-            executable = parts[0]
+    def check_file_access(self, command: str, arguments: list) -> tuple[bool, str]:
+        '''
+        Checks a native file tool call (read_file, grep, ...) as if it were the
+        shell command *command* run with *arguments*, so the blocklist and the
+        policy rules guard files the same way for the tool and for bash.
+
+        Args:
+            command:   the equivalent executable, e.g. "cat" for read_file
+            arguments: its arguments, e.g. the path as given and resolved
+
+        Returns:
+            A tuple containing a boolean indicating if the access is allowed and a message.
+        '''
+        return self.policy.check(shlex.join([command, *arguments]))
 
-            # Check if the command is in the blocklist.
-            if executable in self.blocklist:
-                return False, f"Command \'{executable}\' is in the blocklist and is not allowed."
+    def is_read_only(self, command: str) -> bool:
+        '''
+        Checks if a command only reads state, so it can safely run concurrently
+        with other read-only commands or outside the persistent shell.
 
-            # Check for dangerous combinations, like `rm -rf`
-            if executable == "rm" and "-rf" in parts:
-                return False, "Command 'rm -rf' is explicitly blocked for safety."
+        Args:
+            command: The command to check.
 
-            return True, "Command is safe."
-        except Exception as e:
-            return False, f"Error parsing command: {e}"
+        Returns:
+            True if every command in the pipeline/list is a known read-only
+            command without an option that writes or blocks (see
+            UNSAFE_READ_ONLY_OPTIONS), nothing is written to a file (other
+            than /dev/null) and nothing is substituted, run in a subshell or
+            in the background.
+        '''
+        try:
+            parsed = parse_command(command)
+        except ValueError:
+            return False
+        if not parsed.commands or parsed.substitutions or parsed.subshells or parsed.background:
+            return False
+        for simple in parsed.commands:
+            if simple.name not in READ_ONLY_COMMANDS or simple.assignments:
+                return False
+            options = UNSAFE_READ_ONLY_OPTIONS.get(simple.name)
+            if options and _has_option(simple.words[1:], options):
+                return False
+            for operator, target in simple.redirects:
+                if ">" in operator and not (operator.endswith("&") and (target.isdigit() or target == "-")) \
+                        and target != "/dev/null":
+                    return False
+        return True
@@ -0,0 +1,379 @@
+'''
+This module parses a shell command line into every simple command it would run.
+
+Lists and pipelines (;, &&, ||, |, &, newlines), subshells and brace groups,
+command and process substitutions, and the scripts handed to `bash -c`,
+`eval`, `find -exec` or wrappers such as `env`, `xargs` and `timeout` are all
+split into their simple commands. Heredoc bodies are skipped with a single
+search rather than tokenized, so long file-writing commands stay cheap.
+'''
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Commands whose parse is memoized (agents repeat commands)
+MAX_PARSE_CACHE = 1024
+
+# Words that may precede a command without being one
+RESERVED_PREFIXES = {"!", "{", "}", "if", "then", "else", "elif", "fi", "do", "done", "while", "until",
+                     "esac", "time", "coproc"}
+# Compound commands whose own words are not a command (`for x in a b`)
+RESERVED_HEADERS = {"for", "select", "case"}
+# Shells whose `-c` argument is a script
+SHELLS = {"sh", "bash", "dash", "zsh", "ksh"}
+# Commands that run the command given in their arguments; per wrapper, the options taking a value
+WRAPPERS = {
+    "env": {"-u", "--unset", "-C", "--chdir"},
+    "nohup": set(),
+    "nice": {"-n", "--adjustment"},
+    "ionice": {"-c", "-n", "-p"},
+    "timeout": {"-s", "--signal", "-k", "--kill-after"},
+    "xargs": {"-I", "-n", "-P", "-L", "-s", "-d", "-E", "-a", "--max-args", "--max-procs", "--delimiter"},
+    "exec": {"-a"},
+    "command": set(),
+    "builtin": set(),
+    "stdbuf": {"-i", "-o", "-e"},
+    "setsid": set(),
+    "time": {"-f", "-o"},
+    "sudo": {"-u", "-g", "-C", "-D", "-h", "-p", "-r", "-t", "-U"},
+    "doas": {"-u", "-C"},
+    "watch": {"-n", "-d"},
+    "strace": {"-e", "-o", "-p", "-s"},
+    "flock": {"-w", "-E"},
+}
+# find actions whose arguments, up to ';' or '+', are a command
+FIND_EXEC = {"-exec", "-execdir", "-ok", "-okdir"}
+
+_SPACE = re.compile(r"(?:[ \t\r\f\v]+|\\\n)+")
+# One token after optional blanks: the group that matched says which kind. Words
+# holding substitutions, ANSI-C quotes or an unterminated quote do not match
+# "word"; "other" then stops before them and they go to _word()
+_TOKEN = re.compile(r"""
+    (?:[ \t\r\f\v]+|\\\n)*
+    (?:
+      (?P<word>(?!\d+[<>])(?:[^ \t\r\n\f\v'"\\$`;&|()<>\#][^ \t\r\n\f\v'"\\$`;&|()<>]*|'[^']*'|"(?:[^"\\$`]|\\.|\$(?!\())*"|\\.|\$\{[^}]*\}|\$(?![('"]))
+                 (?:[^ \t\r\n\f\v'"\\$`;&|()<>]+|'[^']*'|"(?:[^"\\$`]|\\.|\$(?!\())*"|\\.|\$\{[^}]*\}|\$(?![('"]))*)
+    | (?P<newline>\n)
+    | (?P<comment>\#[^\n]*)
+    | (?P<redirect>\d*(?:<<<|<<-|<<|<>|<&|>&|>>|>\||<|>)(?!\()|&>>|&>)
+    | (?P<operator>&&|\|\||;;&|;;|;&|\|&|[;&|()])
+    | (?P<other>)
+    )
+""", re.X | re.S)
+_WORD_END = " \t\r\n\f\v;&|()<>"
+# Word pieces without substitutions: plain text, quoted strings, escapes, ${...}
+_SEGMENT = re.compile(r"""
+    [^ \t\r\n\f\v'"\\$`;&|()<>]+
+  | '[^']*'
+  | \$'(?:[^'\\]|\\.)*'
+  | "(?:[^"\\$`]|\\.|\$(?!\())*"
+  | \\.
+  | \$\{[^}]*\}
+  | \$(?![('"])
+""", re.X | re.S)
+_DOUBLE_QUOTED_TEXT = re.compile(r"(?:[^\"\\$`]|\\.|\$(?!\())*", re.S)
+_ASSIGNMENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\[[^\]]*\])?\+?=")
+_NUMERIC = re.compile(r"\d+(?:\.\d+)?[smhd]?")
+
+
+@dataclass(frozen=True)
+class SimpleCommand:
+    words: tuple                 # argv, quotes removed, leading assignments and reserved words dropped
+    assignments: tuple = ()      # leading NAME=value words
+    redirects: tuple = ()        # (operator, target) pairs, e.g. (">", "out.txt") or ("2>&", "1")
+
+    @property
+    def name(self) -> str:
+        '''The executable's name without its directory, or "" for a bare assignment or redirection.'''
+        return os.path.basename(self.words[0]) if self.words else ""
+
+
+@dataclass(frozen=True)
+class ParsedCommand:
+    commands: tuple              # every SimpleCommand, nested ones included
+    substitutions: bool = False  # $(...), `...`, <(...) or >(...)
+    subshells: bool = False      # ( ... )
+    background: bool = False     # a command is sent to the background with &
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.commands = []
+        self.substitutions = False
+        self.subshells = False
+        self.background = False
+        self._heredocs = []  # (delimiter, strip_tabs) of heredocs whose body starts after the next newline
+
+    def parse(self, pos: int = 0, closing: bool = False) -> int:
+        '''
+        Parse commands from *pos* to the end of the text, or with *closing*
+        up to the ')' ending a substitution.
+
+        Returns:
+            The position after the text parsed.
+        '''
+        text, end = self.text, len(self.text)
+        words, redirects = [], []
+        depth = 0
+        while pos < end:
+            match = _TOKEN.match(text, pos)
+            kind = match.lastgroup
+            if kind == "word":
+                word = match.group(kind)
+                after = match.end()
+                if ("'" in word or '"' in word or "\\" in word
+                        or (after < end and text[after] not in _WORD_END)):
+                    word, after = self._word(match.start(kind))  # quotes to remove, or a substitution follows
+                words.append(word)
+                pos = after
+                continue
+            if kind == "comment":
+                pos = match.end()
+                continue
+            if kind == "newline":
+                self._add(words, redirects)
+                words, redirects = [], []
+                pos = self._skip_heredocs(pos + 1)
+                continue
+            if kind == "redirect":
+                operator = match.group(kind)
+                space = _SPACE.match(text, match.end())
+                target, pos = self._word(space.end() if space else match.end())
+                if operator.endswith(("<<", "<<-")):
+                    self._heredocs.append((target, operator.endswith("-")))
+                redirects.append((operator, target))
+                continue
+            if kind == "operator":
+                operator = match.group(kind)
+                pos = match.end()
+                if operator == "(":
+                    rest = _SPACE.match(text, pos)
+                    after = rest.end() if rest else pos
+                    if words and text.startswith(")", after):
+                        words = []  # `name() { ...; }` defines a function
+                        pos = after + 1
+                        continue
+                    self.subshells = True
+                    depth += 1
+                elif operator == ")":
+                    if depth:
+                        depth -= 1
+                    elif closing:
+                        self._add(words, redirects)
+                        return pos
+                elif operator == "&":
+                    self.background = True
+                self._add(words, redirects)
+                words, redirects = [], []
+                continue
+            pos = match.end()
+            if pos == end:
+                break
+            word, after = self._word(pos)  # a substitution, or a word starting with one
+            if after == pos:
+                raise ValueError(f"Unexpected {text[pos]!r}")
+            words.append(word)
+            pos = after
+        if closing:
+            raise ValueError("No closing parenthesis")
+        self._add(words, redirects)
+        return pos
+
+    def _word(self, pos: int) -> tuple:
+        '''One word starting at *pos*, with quotes removed; substitutions in it are parsed too.'''
+        text, end = self.text, len(self.text)
+        parts = []
+        while pos < end:
+            match = _SEGMENT.match(text, pos)
+            if match:
+                segment = match.group()
+                if segment[0] == "'":
+                    parts.append(segment[1:-1])
+                elif segment[0] == '"':
+                    parts.append(segment[1:-1])
+                elif segment[0] == "\\":
+                    parts.append("" if segment[1] == "\n" else segment[1])
+                elif segment.startswith("$'"):
+                    parts.append(segment[2:-1])
+                else:
+                    parts.append(segment)
+                pos = match.end()
+                continue
+            if text.startswith("$((", pos):
+                close = text.find("))", pos + 3)
+                if close == -1:
+                    raise ValueError("No closing parenthesis")
+                parts.append(text[pos:close + 2])
+                pos = close + 2
+                continue
+            if text.startswith(("$(", "<(", ">("), pos):
+                self.substitutions = True
+                after = self.parse(pos + 2, closing=True)
+                parts.append(text[pos:after])
+                pos = after
+                continue
+            char = text[pos]
+            if char == "`":
+                pos = self._backquoted(pos, parts)
+            elif char == '"':
+                pos = self._double_quoted(pos, parts)
+            elif char == "'":
+                raise ValueError("No closing quotation")
+            elif char == "\\":  # a backslash at the very end
+                pos += 1
+            elif char == "$":  # $" or an unterminated $'
+                parts.append(char)
+                pos += 1
+            else:
+                break  # whitespace or an operator ends the word
+        if not parts and pos < end and text[pos] in "<>":
+            raise ValueError(f"Unexpected {text[pos]!r}")
+        return "".join(parts), pos
+
+    def _backquoted(self, pos: int, parts: list) -> int:
+        close = pos + 1
+        while True:
+            close = self.text.find("`", close)
+            if close == -1:
+                raise ValueError("No closing backquote")
+            if self.text[close - 1] != "\\":
+                break
+            close += 1
+        self.substitutions = True
+        self._nested(self.text[pos + 1:close].replace("\\`", "`"))
+        parts.append(self.text[pos:close + 1])
+        return close + 1
+
+    def _double_quoted(self, pos: int, parts: list) -> int:
+        '''A double-quoted string holding substitutions; the plain ones are matched by _SEGMENT.'''
+        text = self.text
+        pos += 1
+        while True:
+            match = _DOUBLE_QUOTED_TEXT.match(text, pos)
+            parts.append(match.group())
+            pos = match.end()
+            if pos >= len(text):
+                raise ValueError("No closing quotation")
+            if text[pos] == '"':
+                return pos + 1
+            if text[pos] == "`":
+                pos = self._backquoted(pos, parts)
+            elif text[pos] == "\\":  # a backslash at the very end
+                raise ValueError("No closing quotation")
+            elif text.startswith("$((", pos):
+                close = text.find("))", pos + 3)
+                if close == -1:
+                    raise ValueError("No closing parenthesis")
+                parts.append(text[pos:close + 2])
+                pos = close + 2
+            else:  # $(
+                self.substitutions = True
+                after = self.parse(pos + 2, closing=True)
+                parts.append(text[pos:after])
+                pos = after
+
+    def _skip_heredocs(self, pos: int) -> int:
+        '''Skip the bodies of the heredocs opened on the line just ended.'''
+        text, end = self.text, len(self.text)
+        for delimiter, strip_tabs in self._heredocs:
+            # Find the delimiter with str.find, then check that it fills its line
+            found = text.find(delimiter, pos)
+            while found != -1:
+                line_start = text.rfind("\n", 0, found) + 1
+                line_end = found + len(delimiter)
+                indent = text[max(line_start, pos):found]
+                if (line_start >= pos and (indent == "" or (strip_tabs and indent.strip("\t") == ""))
+                        and (line_end == end or text[line_end] == "\n")):
+                    break
+                found = text.find(delimiter, found + 1)
+            pos = end if found == -1 else min(found + len(delimiter) + 1, end)
+        self._heredocs = []
+        return pos
+
+    def _nested(self, script: str):
+        nested = _Parser(script)
+        nested.parse()
+        self.commands.extend(nested.commands)
+        self.substitutions |= nested.substitutions
+        self.subshells |= nested.subshells
+        self.background |= nested.background
+
+    def _add(self, words: list, redirects: list):
+        assignments = []
+        index = 0
+        while index < len(words):
+            if words[index] == "function":
+                index += 2  # `function name { ...`
+            elif words[index] in RESERVED_PREFIXES:
+                index += 1
+            elif _ASSIGNMENT.match(words[index]):
+                assignments.append(words[index])
+                index += 1
+            else:
+                break
+        words = words[index:]
+        if words and words[0] in RESERVED_HEADERS:
+            return
+        if words or assignments or redirects:
+            self._add_command(SimpleCommand(tuple(words), tuple(assignments), tuple(redirects)))
+
+    def _add_command(self, command: SimpleCommand):
+        self.commands.append(command)
+        words, name = command.words, command.name
+        if name in SHELLS:
+            for index, word in enumerate(words[1:-1], 1):
+                if word.startswith("-") and not word.startswith("--") and "c" in word:
+                    self._nested(words[index + 1])  # `bash -c script`, `bash -lc script`
+                    break
+        elif name == "eval" and len(words) > 1:
+            self._nested(" ".join(words[1:]))
+        elif name == "find":
+            for index, word in enumerate(words):
+                if word in FIND_EXEC:
+                    inner = []
+                    for argument in words[index + 1:]:
+                        if argument in (";", "+"):
+                            break
+                        inner.append(argument)
+                    if inner:
+                        self._add_command(SimpleCommand(tuple(inner)))
+        elif name in WRAPPERS:
+            inner = _unwrap(name, words[1:])
+            if inner:
+                self._add_command(SimpleCommand(inner))
+
+
+def _unwrap(wrapper: str, arguments: tuple) -> tuple:
+    '''The command a wrapper runs: its arguments after the wrapper's own options and values.'''
+    if wrapper == "command" and any(argument in ("-v", "-V") for argument in arguments):
+        return ()  # only looks the command up
+    takes_value = WRAPPERS[wrapper]
+    index = 0
+    while index < len(arguments):
+        argument = arguments[index]
+        if argument in takes_value:
+            index += 2
+        elif (argument.startswith("-") or (wrapper == "env" and "=" in argument)
+              or (wrapper in ("timeout", "nice") and _NUMERIC.fullmatch(argument))):
+            index += 1
+        else:
+            break
+    return tuple(arguments[index:])
+
+
+@lru_cache(maxsize=MAX_PARSE_CACHE)
+def parse_command(command: str) -> ParsedCommand:
+    '''
+    Parses a command line into every simple command it runs.
+
+    Args:
+        command: The command line, possibly several lines long.
+
+    Returns:
+        A ParsedCommand; raises ValueError for unterminated quotes or substitutions.
+    '''
+    parser = _Parser(command)
+    parser.parse()
+    return ParsedCommand(tuple(parser.commands), parser.substitutions, parser.subshells, parser.background)
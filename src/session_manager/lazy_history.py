@@ -0,0 +1,109 @@
+"""
+Lazily loaded, paginated view over a session history.
+
+Only the most recent messages are read when a session is opened; older ones
+are fetched from the store on demand, one page at a time, through the store's
+offset index. The object behaves like a list of message dicts (len, indexing,
+slicing, iteration, append) so callers do not need to know which parts are
+resident.
+"""
+
+from collections.abc import Sequence
+from typing import Callable, Dict, List, Optional
+
+
+class LazyHistory(Sequence):
+    def __init__(
+        self,
+        fetch: Callable[[int, int], List[Dict[str, str]]],
+        total: int,
+        tail_messages: int = 50,
+        tail_tokens: Optional[int] = None,
+        page_size: int = 200,
+        chars_per_token: int = 4,
+    ):
+        """
+        Args:
+            fetch:           ``fetch(start, stop)`` returns messages [start, stop) from the store
+            total:           number of persisted messages
+            tail_messages:   messages loaded eagerly from the end of the history
+            tail_tokens:     if set, load pages from the end until roughly this many
+                             tokens are resident (overrides *tail_messages*)
+            page_size:       messages fetched per on-demand page
+            chars_per_token: heuristic used to estimate tokens from characters
+        """
+        self._fetch = fetch
+        self._page_size = max(1, page_size)
+        # Messages [self._start, len(self)) are resident in self._items
+        self._start = total
+        self._items: List[Dict[str, str]] = []
+
+        if tail_tokens is not None:
+            budget = tail_tokens * chars_per_token
+            resident = 0
+            while self._start > 0 and resident < budget:
+                loaded = self._load_before(self._start - self._page_size)
+                resident += sum(len(m["content"]) for m in loaded)
+        else:
+            self._load_before(total - tail_messages)
+
+    @property
+    def resident_count(self) -> int:
+        """Number of messages currently held in memory."""
+        return len(self._items)
+
+    def _load_before(self, index: int) -> List[Dict[str, str]]:
+        """Make messages from *index* (clamped to 0) onwards resident."""
+        index = max(0, index)
+        if index >= self._start:
+            return []
+        loaded = self._fetch(index, self._start)
+        self._items[0:0] = loaded
+        self._start = index
+        return loaded
+
+    def _ensure_resident(self, index: int):
+        if index < self._start:
+            # Round down to a page boundary so neighbouring reads hit memory
+            self._load_before(min(index, self._start - self._page_size))
+
+    def __len__(self) -> int:
+        return self._start + len(self._items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indices = range(*index.indices(len(self)))
+            if not indices:
+                return []
+            self._ensure_resident(min(indices[0], indices[-1]))
+            return [self._items[i - self._start] for i in indices]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        self._ensure_resident(index)
+        return self._items[index - self._start]
+
+    def __iter__(self):
+        # Stream the non-resident prefix page by page without keeping it
+        start = self._start
+        for page_start in range(0, start, self._page_size):
+            yield from self._fetch(page_start, min(page_start + self._page_size, start))
+        yield from list(self._items)
+
+    def append(self, message: Dict[str, str]):
+        self._items.append(message)
+
+    def tail(self, count: int) -> List[Dict[str, str]]:
+        """Return the last *count* messages, loading older pages only if needed."""
+        if count <= 0:
+            return []
+        return self[-count:]
+
+    def __eq__(self, other):
+        if isinstance(other, (list, LazyHistory)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"LazyHistory(len={len(self)}, resident={len(self._items)})"
@@ -1,38 +1,53 @@
-import json
 import os
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+from .lazy_history import LazyHistory
+from .session_store import SessionStore, get_session_store
 
 class SessionManager:
-    def __init__(self, session_dir="./sessions"):
+    """
+    Owns the in-memory history of the active session and persists it through
+    a pluggable SessionStore (see session_store.py), either passed in as
+    *store* or built from *backend* ("file" or "sqlite").
+
+    Loaded sessions are exposed as a LazyHistory: only the last
+    *tail_messages* messages (or roughly *tail_tokens* tokens' worth) are read
+    up front and older pages are fetched from the store when accessed.
+    """
+
+    def __init__(self, session_dir="./sessions", store: Optional[SessionStore] = None, backend: str = "file",
+                 tail_messages: int = 50, tail_tokens: Optional[int] = None):
         self.session_dir = session_dir
+        self.tail_messages = tail_messages
+        self.tail_tokens = tail_tokens
         os.makedirs(self.session_dir, exist_ok=True)
+        self.store = store or get_session_store(backend, session_dir)
         self.current_session_id = None
         self.history: List[Dict[str, str]] = []
 
     def _get_session_file_path(self, session_id: str) -> str:
-        return os.path.join(self.session_dir, f"{session_id}.json")
+        return self.store.get_session_path(session_id)
 
     def create_new_session(self, session_id: str = None) -> str:
         if session_id is None:
             session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        file_path = self._get_session_file_path(session_id)
-        if os.path.exists(file_path):
-            raise ValueError(f"Session with ID \'{session_id}\' already exists.")
 
+        self.store.create(session_id)
         self.current_session_id = session_id
         self.history = []
-        self.save_session()
         return session_id
 
     def load_session(self, session_id: str) -> bool:
-        file_path = self._get_session_file_path(session_id)
-        if os.path.exists(file_path):
-            with open(file_path, "r") as f:
-                session_data = json.load(f)
+        total = self.store.count(session_id)
+        if total is not None:
             self.current_session_id = session_id
-            self.history = session_data.get("history", [])
+            self.history = LazyHistory(
+                lambda start, stop: self.store.load_range(session_id, start, stop),
+                total,
+                tail_messages=self.tail_messages,
+                tail_tokens=self.tail_tokens,
+            )
             print(f"Session \'{session_id}\' loaded successfully.")
             return True
         else:
@@ -41,31 +56,44 @@ class SessionManager:
 
     def save_session(self):
         if self.current_session_id:
-            file_path = self._get_session_file_path(self.current_session_id)
-            session_data = {
-                "session_id": self.current_session_id,
-                "history": self.history,
-                "last_saved": datetime.now().isoformat()
-            }
-            with open(file_path, "w") as f:
-                json.dump(session_data, f, indent=4)
+            self.store.save(self.current_session_id, self.history)
             # print(f"Session \'{self.current_session_id}\' saved.")
         else:
             print("No active session to save.")
 
     def add_message(self, role: str, content: str):
-        self.history.append({"role": role, "content": content})
-        self.save_session()
+        message = {"role": role, "content": content}
+        self.history.append(message)
+        if not self.current_session_id:
+            return
+        self.store.append(self.current_session_id, len(self.history) - 1, message)
+        if self.store.needs_compaction(self.current_session_id):
+            self.save_session()
 
     def get_history(self) -> List[Dict[str, str]]:
         return self.history
 
+    def get_context_summary(self) -> Optional[dict]:
+        """Return the cached rolling summary {"upto", "content"} of the active session."""
+        if not self.current_session_id:
+            return None
+        return self.store.load_summary(self.current_session_id)
+
+    def save_context_summary(self, summary: dict):
+        """Cache a rolling summary covering the first summary["upto"] messages."""
+        if self.current_session_id:
+            self.store.save_summary(self.current_session_id, summary)
+
     def list_sessions(self) -> List[str]:
-        sessions = []
-        for filename in os.listdir(self.session_dir):
-            if filename.endswith(".json"):
-                sessions.append(filename.replace(".json", ""))
-        return sorted(sessions)
+        return self.store.list_sessions()
+
+    def get_most_recent_session(self) -> Optional[str]:
+        """Return the most recently updated session ID, or None if there are none."""
+        return self.store.most_recent()
+
+    def get_session_info(self, session_id: str = None) -> Optional[dict]:
+        """Return catalog metadata for *session_id* (default: the active session)."""
+        return self.store.get_info(session_id or self.current_session_id)
 
     def get_current_session_id(self):
         return self.current_session_id
@@ -0,0 +1,405 @@
+"""
+Storage backends for SessionManager.
+
+A store persists the message list of each session plus a small catalog
+(created/updated timestamps, message count, byte size). SessionManager owns
+the in-memory history and talks to the store through the SessionStore
+interface, so backends can be swapped without touching callers.
+
+Backends:
+    "file"   - FileSessionStore: JSON snapshot + JSONL journal per session
+    "sqlite" - SQLiteSessionStore: single database with indexed catalog
+"""
+
+import json
+import os
+import re
+from array import array
+from datetime import datetime
+from typing import List, Dict, Optional
+
+
+class SessionStore:
+    """Interface implemented by every session storage backend."""
+
+    def exists(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def create(self, session_id: str):
+        """Create an empty session, or raise ValueError if it already exists."""
+        raise NotImplementedError
+
+    def load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """Return the full history of *session_id*, or None if it does not exist."""
+        raise NotImplementedError
+
+    def count(self, session_id: str) -> Optional[int]:
+        """Return the number of stored messages, or None if the session does not exist."""
+        history = self.load(session_id)
+        return None if history is None else len(history)
+
+    def load_range(self, session_id: str, start: int, stop: int) -> List[Dict[str, str]]:
+        """Return messages [start, stop) of *session_id*."""
+        return (self.load(session_id) or [])[start:stop]
+
+    def append(self, session_id: str, seq: int, message: Dict[str, str]):
+        """Persist *message* as position *seq* of the session history."""
+        raise NotImplementedError
+
+    def save(self, session_id: str, history: List[Dict[str, str]]):
+        """Persist the complete *history*, compacting any incremental state."""
+        raise NotImplementedError
+
+    def needs_compaction(self, session_id: str) -> bool:
+        """True when the caller should follow up an append() with save()."""
+        return False
+
+    def load_summary(self, session_id: str) -> Optional[dict]:
+        """Return the cached context summary {"upto", "content"} of *session_id*, if any."""
+        return None
+
+    def save_summary(self, session_id: str, summary: dict):
+        """Store the context summary of *session_id*, replacing any previous one."""
+        pass
+
+    def list_sessions(self) -> List[str]:
+        """Return all session IDs, sorted by ID."""
+        raise NotImplementedError
+
+    def most_recent(self) -> Optional[str]:
+        """Return the most recently updated session ID, or None."""
+        raise NotImplementedError
+
+    def get_info(self, session_id: str) -> Optional[dict]:
+        """
+        Return catalog metadata for *session_id*, or None if it does not exist:
+        {"session_id", "created_at", "updated_at", "message_count", "byte_size"}
+        (timestamps are POSIX seconds).
+        """
+        raise NotImplementedError
+
+    def get_session_path(self, session_id: str) -> str:
+        """Return the on-disk location holding *session_id*."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class _FileIndex:
+    """Byte offsets of every message of one session in its snapshot and journal."""
+
+    def __init__(self):
+        self.snapshot = array("Q")         # offsets of message lines in <id>.json
+        self.journal = array("Q")          # offsets of live records in <id>.jsonl
+        self.legacy: Optional[list] = None  # fully parsed history of a pre-index snapshot
+        self.snapshot_bytes = 0
+        self.journal_bytes = 0
+
+    @property
+    def snapshot_count(self) -> int:
+        return len(self.legacy) if self.legacy is not None else len(self.snapshot)
+
+    @property
+    def count(self) -> int:
+        return self.snapshot_count + len(self.journal)
+
+
+class FileSessionStore(SessionStore):
+    """
+    Persists each session as a snapshot plus an append-only journal.
+
+    Layout per session (inside *session_dir*):
+        <id>.json   - snapshot: {"session_id", "last_saved", "history"}, written
+                      with one message per line so messages are addressable
+        <id>.idx    - byte offset of each snapshot message line (array of u64,
+                      preceded by the snapshot size it was built for)
+        <id>.jsonl  - journal: one {"seq", "role", "content"} record per line
+        <id>.summary - cached context summary {"upto", "content"}
+
+    append() writes a single journal line instead of rewriting the whole
+    history. Once the journal grows past the snapshot size it should be
+    compacted into a fresh snapshot, which keeps total write volume linear in
+    the size of the history. Snapshots written by older versions (indented,
+    no journal, no index) still load, just not lazily.
+    """
+
+    # Journals smaller than this are never compacted, however small the snapshot.
+    COMPACT_MIN_BYTES = 256 * 1024
+
+    _HISTORY_OPEN = b'"history": [\n'
+    _SEQ_PREFIX = re.compile(rb'^\{"seq": (\d+),')
+
+    def __init__(self, session_dir: str = "./sessions"):
+        self.session_dir = session_dir
+        os.makedirs(self.session_dir, exist_ok=True)
+        self._index: Dict[str, _FileIndex] = {}
+
+    def _get_session_file_path(self, session_id: str) -> str:
+        return os.path.join(self.session_dir, f"{session_id}.json")
+
+    def _get_journal_file_path(self, session_id: str) -> str:
+        return os.path.join(self.session_dir, f"{session_id}.jsonl")
+
+    def _get_index_file_path(self, session_id: str) -> str:
+        return os.path.join(self.session_dir, f"{session_id}.idx")
+
+    def _get_summary_file_path(self, session_id: str) -> str:
+        return os.path.join(self.session_dir, f"{session_id}.summary")
+
+    def get_session_path(self, session_id: str) -> str:
+        return self._get_session_file_path(session_id)
+
+    def exists(self, session_id: str) -> bool:
+        return os.path.exists(self._get_session_file_path(session_id))
+
+    def create(self, session_id: str):
+        if self.exists(session_id):
+            raise ValueError(f"Session with ID \'{session_id}\' already exists.")
+        self.save(session_id, [])
+
+    # ── Index construction ────────────────────────────────────────────
+
+    def _open_index(self, session_id: str) -> Optional[_FileIndex]:
+        """Build the offset index of *session_id* from disk (None if missing)."""
+        file_path = self._get_session_file_path(session_id)
+        if not os.path.exists(file_path):
+            return None
+        index = _FileIndex()
+        index.snapshot_bytes = os.path.getsize(file_path)
+        if not self._read_index_file(session_id, index):
+            self._scan_snapshot(file_path, index)
+        self._scan_journal(session_id, index)
+        self._index[session_id] = index
+        return index
+
+    def _get_index(self, session_id: str) -> Optional[_FileIndex]:
+        return self._index.get(session_id) or self._open_index(session_id)
+
+    def _read_index_file(self, session_id: str, index: _FileIndex) -> bool:
+        """Load the sidecar offsets if they were built for the current snapshot."""
+        try:
+            with open(self._get_index_file_path(session_id), "rb") as f:
+                data = array("Q")
+                data.frombytes(f.read())
+        except (FileNotFoundError, ValueError):
+            return False
+        if not data or data[0] != index.snapshot_bytes:
+            return False
+        index.snapshot = data[1:]
+        return True
+
+    def _scan_snapshot(self, file_path: str, index: _FileIndex):
+        """Recover offsets by scanning lines; parse legacy snapshots in full."""
+        with open(file_path, "rb") as f:
+            header = f.readline()
+            if header.endswith(self._HISTORY_OPEN):
+                offset = f.tell()
+                for line in f:
+                    if line.startswith(b"]"):
+                        return
+                    index.snapshot.append(offset)
+                    offset += len(line)
+                return
+        with open(file_path, "r") as f:
+            index.legacy = json.load(f).get("history", [])
+
+    def _scan_journal(self, session_id: str, index: _FileIndex):
+        """
+        Record offsets of journal records newer than the snapshot.
+
+        Records carry their absolute position (``seq``), so entries already
+        folded into the snapshot — e.g. after a crash between writing the
+        snapshot and truncating the journal — are skipped. A torn final line
+        from an interrupted write is ignored.
+        """
+        journal_path = self._get_journal_file_path(session_id)
+        if not os.path.exists(journal_path):
+            return
+        with open(journal_path, "rb") as f:
+            offset = 0
+            for line in f:
+                match = self._SEQ_PREFIX.match(line)
+                if not match or not line.endswith(b"\n"):
+                    break
+                if int(match.group(1)) >= index.count:
+                    index.journal.append(offset)
+                offset += len(line)
+        index.journal_bytes = os.path.getsize(journal_path)
+
+    # ── Reads ─────────────────────────────────────────────────────────
+
+    def count(self, session_id: str) -> Optional[int]:
+        index = self._open_index(session_id)
+        return index.count if index else None
+
+    def load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        total = self.count(session_id)
+        if total is None:
+            return None
+        return self.load_range(session_id, 0, total)
+
+    def load_range(self, session_id: str, start: int, stop: int) -> List[Dict[str, str]]:
+        index = self._get_index(session_id)
+        stop = min(stop, index.count)
+        messages = []
+        split = index.snapshot_count
+        if start < split:
+            if index.legacy is not None:
+                messages.extend(index.legacy[start:min(stop, split)])
+            else:
+                messages.extend(self._read_lines(
+                    self._get_session_file_path(session_id), index.snapshot[start:min(stop, split)]))
+        if stop > split:
+            for record in self._read_lines(
+                    self._get_journal_file_path(session_id),
+                    index.journal[max(start, split) - split:stop - split]):
+                messages.append({"role": record["role"], "content": record["content"]})
+        return messages
+
+    @staticmethod
+    def _read_lines(path: str, offsets) -> List[dict]:
+        records = []
+        with open(path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                records.append(json.loads(f.readline().rstrip(b",\n")))
+        return records
+
+    # ── Writes ────────────────────────────────────────────────────────
+
+    def append(self, session_id: str, seq: int, message: Dict[str, str]):
+        index = self._get_index(session_id)
+        record = {"seq": seq, "role": message["role"], "content": message["content"]}
+        line = json.dumps(record) + "\n"
+        with open(self._get_journal_file_path(session_id), "a") as f:
+            index.journal.append(f.tell())
+            f.write(line)
+        index.journal_bytes += len(line)
+
+    def needs_compaction(self, session_id: str) -> bool:
+        index = self._index.get(session_id)
+        if index is None:
+            return False
+        return index.journal_bytes > max(self.COMPACT_MIN_BYTES, index.snapshot_bytes)
+
+    def save(self, session_id: str, history: List[Dict[str, str]]):
+        """Compact the session: write a full snapshot and reset the journal."""
+        index = self._index.get(session_id)
+        if (index is not None and not index.journal and index.legacy is None
+                and index.count == len(history)):
+            return  # already compact and up to date
+
+        file_path = self._get_session_file_path(session_id)
+        header = json.dumps({
+            "session_id": session_id,
+            "last_saved": datetime.now().isoformat(),
+        })[:-1] + ", " + self._HISTORY_OPEN.decode()
+        offsets = array("Q")
+        # Write to a temp file and rename so a crash never leaves a torn snapshot.
+        # *history* may stream from the current snapshot, so it stays in place
+        # until the rename.
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header.encode())
+            pending = None
+            for message in history:
+                if pending is not None:
+                    f.write(pending + b",\n")
+                offsets.append(f.tell())
+                pending = json.dumps({"role": message["role"], "content": message["content"]}).encode()
+            if pending is not None:
+                f.write(pending + b"\n")
+            f.write(b"]}\n")
+        os.replace(tmp_path, file_path)
+
+        index = _FileIndex()
+        index.snapshot = offsets
+        index.snapshot_bytes = os.path.getsize(file_path)
+        with open(self._get_index_file_path(session_id), "wb") as f:
+            (array("Q", [index.snapshot_bytes]) + offsets).tofile(f)
+
+        journal_path = self._get_journal_file_path(session_id)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
+        self._index[session_id] = index
+
+    def load_summary(self, session_id: str) -> Optional[dict]:
+        try:
+            with open(self._get_summary_file_path(session_id), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save_summary(self, session_id: str, summary: dict):
+        file_path = self._get_summary_file_path(session_id)
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(summary, f)
+        os.replace(tmp_path, file_path)
+
+    # ── Catalog ───────────────────────────────────────────────────────
+
+    def list_sessions(self) -> List[str]:
+        sessions = []
+        for filename in os.listdir(self.session_dir):
+            if filename.endswith(".json"):
+                sessions.append(filename.replace(".json", ""))
+        return sorted(sessions)
+
+    def _stat(self, session_id: str) -> Optional[tuple]:
+        """Return (created, updated, byte_size) from the session's files."""
+        stats = []
+        for path in (self._get_session_file_path(session_id),
+                     self._get_journal_file_path(session_id)):
+            try:
+                stats.append(os.stat(path))
+            except FileNotFoundError:
+                pass
+        if not stats:
+            return None
+        return (
+            min(s.st_mtime for s in stats),
+            max(s.st_mtime for s in stats),
+            sum(s.st_size for s in stats),
+        )
+
+    def most_recent(self) -> Optional[str]:
+        best_id, best_mtime = None, None
+        for session_id in self.list_sessions():
+            stat = self._stat(session_id)
+            if stat and (best_mtime is None or stat[1] >= best_mtime):
+                best_id, best_mtime = session_id, stat[1]
+        return best_id
+
+    def get_info(self, session_id: str) -> Optional[dict]:
+        stat = self._stat(session_id)
+        index = self._get_index(session_id) if stat else None
+        if index is None:
+            return None
+        created, updated, byte_size = stat
+        return {
+            "session_id": session_id,
+            "created_at": created,
+            "updated_at": updated,
+            "message_count": index.count,
+            "byte_size": byte_size,
+        }
+
+
+def get_session_store(backend: str = "file", session_dir: str = "./sessions") -> SessionStore:
+    """
+    Factory: create the session store named *backend* rooted at *session_dir*.
+
+    Args:
+        backend:     "file" or "sqlite" (case-insensitive)
+        session_dir: directory holding the session files / database
+    """
+    backend = (backend or "file").lower()
+    if backend == "file":
+        return FileSessionStore(session_dir)
+    elif backend == "sqlite":
+        from .sqlite_session_store import SQLiteSessionStore
+        return SQLiteSessionStore(os.path.join(session_dir, "sessions.db"))
+    else:
+        raise ValueError(f"Unknown session backend: '{backend}'. Available: file, sqlite")
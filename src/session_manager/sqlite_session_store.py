@@ -0,0 +1,195 @@
+"""
+SQLite session store.
+
+All sessions live in one database with a catalog table, so listing sessions,
+resolving the most recently used one and loading a history are indexed
+queries rather than directory scans plus full JSON parses.
+
+Schema:
+    sessions(session_id PK, created_at, updated_at, message_count, byte_size)
+    messages(session_id, seq, role, content)  -- PK (session_id, seq)
+    summaries(session_id PK, upto, content, updated_at)
+"""
+
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional
+
+from .session_store import SessionStore
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id    TEXT PRIMARY KEY,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    byte_size     INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq        INTEGER NOT NULL,
+    role       TEXT NOT NULL,
+    content    TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS summaries (
+    session_id TEXT PRIMARY KEY,
+    upto       INTEGER NOT NULL,
+    content    TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, db_path: str = "./sessions/sessions.db"):
+        self.db_path = db_path
+        # One connection shared across threads, serialized by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get_session_path(self, session_id: str) -> str:
+        return self.db_path
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row is not None
+
+    def create(self, session_id: str):
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO sessions (session_id, created_at, updated_at) VALUES (?, ?, ?)",
+                    (session_id, now, now),
+                )
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Session with ID \'{session_id}\' already exists.")
+
+    def load(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        if not self.exists(session_id):
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def count(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT message_count FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load_range(self, session_id: str, start: int, stop: int) -> List[Dict[str, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND seq >= ? AND seq < ? "
+                "ORDER BY seq",
+                (session_id, start, stop),
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def append(self, session_id: str, seq: int, message: Dict[str, str]):
+        size = len(message["content"].encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            # A row replaced at *seq* no longer counts towards byte_size
+            replaced = self._conn.execute(
+                "SELECT LENGTH(CAST(content AS BLOB)) FROM messages WHERE session_id = ? AND seq = ?",
+                (session_id, seq),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                (session_id, seq, message["role"], message["content"]),
+            )
+            self._conn.execute(
+                "UPDATE sessions SET updated_at = ?, message_count = MAX(message_count, ?), "
+                "byte_size = byte_size + ? WHERE session_id = ?",
+                (time.time(), seq + 1, size - (replaced[0] if replaced else 0), session_id),
+            )
+
+    def save(self, session_id: str, history: List[Dict[str, str]]):
+        """
+        Bring the stored rows in line with *history*.
+
+        Histories are append-only, so only positions the database has not
+        seen yet are written; rows past the end of *history* are dropped.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, created_at, updated_at) VALUES (?, ?, ?)",
+                (session_id, now, now),
+            )
+            (stored,) = self._conn.execute(
+                "SELECT message_count FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                [(session_id, seq, m["role"], m["content"])
+                 for seq, m in enumerate(history[stored:], start=stored)],
+            )
+            self._conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND seq >= ?", (session_id, len(history))
+            )
+            self._conn.execute(
+                "UPDATE sessions SET updated_at = ?, message_count = ?, byte_size = "
+                "(SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM messages WHERE session_id = ?) "
+                "WHERE session_id = ?",
+                (now, len(history), session_id, session_id),
+            )
+
+    def load_summary(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT upto, content FROM summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return {"upto": row[0], "content": row[1]} if row else None
+
+    def save_summary(self, session_id: str, summary: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (session_id, upto, content, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, summary["upto"], summary["content"], time.time()),
+            )
+
+    def list_sessions(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT session_id FROM sessions ORDER BY session_id").fetchall()
+        return [row[0] for row in rows]
+
+    def most_recent(self) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT 1"
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_info(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, created_at, updated_at, message_count, byte_size "
+                "FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("session_id", "created_at", "updated_at", "message_count", "byte_size")
+        return dict(zip(keys, row))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,451 @@
+"""
+Asyncio counterparts of PersistentShell and ToolExecutor.
+
+Each AsyncPersistentShell is a bash subprocess driven through asyncio pipes,
+so waiting for a command's output suspends only the calling task. One event
+loop can therefore run many sessions' shells side by side without a thread
+per session.
+"""
+
+import asyncio
+import os
+import signal
+import time
+
+from safety_guardrail.safety_guardrail import SafetyGuardrail
+from .background_jobs import JOB_TOOLS, JobManager, job_tool_arguments
+from .file_tools import FILE_TOOLS, READ_ONLY_FILE_TOOLS, run_file_tool
+from .resource_limits import ResourceLimits, UsageMeter, limit_cpu
+from .result_cache import ToolResultCache
+from .tool_executor import (
+    OUTPUT_HEAD_BYTES, OUTPUT_TAIL_BYTES, CommandResult, OutputCapture, ShellState, build_result,
+    READ_ONLY_TOOLS, is_batch_failure, kill_foreground_job, parse_tool_calls, parse_tool_call, record_command_stats,
+    session_usage, skipped_result,
+)
+
+
+class AsyncPersistentShell:
+    READ_SIZE = 65536
+    KILL_GRACE = 2.0
+
+    def __init__(self, workdir="./workspace", head_bytes: int = OUTPUT_HEAD_BYTES,
+                 tail_bytes: int = OUTPUT_TAIL_BYTES, limits: ResourceLimits = None):
+        self.workdir = workdir
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.limits = limits or ResourceLimits.unlimited()
+        os.makedirs(self.workdir, exist_ok=True)
+        self.process = None  # started on first use, inside the running loop
+        self.delimiter = "---END_OF_COMMAND---"
+        self._lock = asyncio.Lock()
+        self.state = ShellState()
+        self.restarts = 0
+
+    async def start(self):
+        """Start the shell, or restart it with the last cwd and exported variables."""
+        if self.process is None or self.process.returncode is not None:
+            if self.process is not None:
+                self.restarts += 1
+            self.process = await asyncio.create_subprocess_exec(
+                "/bin/bash",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=self.workdir,
+            )
+            # Job control: a timed-out command can be killed without the shell
+            self.process.stdin.write(
+                f"set -m\n{self.limits.ulimit_command()}\n{self.state.replay_script()}".encode()
+            )
+
+    def _new_capture(self) -> OutputCapture:
+        return OutputCapture(os.path.join(self.workdir, ".tool_output"), self.head_bytes, self.tail_bytes)
+
+    def _output_watch(self, stdout: OutputCapture, stderr: OutputCapture) -> tuple:
+        """
+        An Event set once *stdout* and *stderr* together hold more than the
+        output limit, and the callback the readers call after each write.
+        """
+        over_limit = asyncio.Event()
+        max_output = self.limits.output_bytes
+
+        def check():
+            if max_output is not None and stdout.total + stderr.total > max_output:
+                over_limit.set()
+
+        return over_limit, check
+
+    @staticmethod
+    async def _supervise(task: asyncio.Future, deadline: float, meter: UsageMeter,
+                         over_limit: asyncio.Event) -> str | None:
+        """
+        Wait for *task* until *deadline* (a time.monotonic() value), sampling
+        peak RSS with *meter* while it runs.
+
+        Returns:
+            None once *task* is done, "output" as soon as *over_limit* is set,
+            or "timeout" if the deadline passed first.
+        """
+        limit_reached = asyncio.ensure_future(over_limit.wait())
+        try:
+            while not task.done():
+                if over_limit.is_set():
+                    return "output"
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return "timeout"
+                await asyncio.wait({task, limit_reached}, timeout=meter.timeout(remaining),
+                                   return_when=asyncio.FIRST_COMPLETED)
+                meter.tick()
+            return None
+        finally:
+            limit_reached.cancel()
+
+    def _limit_note(self, stopped: str, timeout: float) -> str:
+        if stopped == "output":
+            return f"\n[Error: Command printed more than {self.limits.output_bytes} bytes and was killed]"
+        return f"\n[Error: Command timed out after {timeout}s]"
+
+    async def _kill(self, process, pgids=()):
+        """SIGKILL the process groups *pgids* and *process*, and wait (up to KILL_GRACE) for it to exit."""
+        for pgid in pgids:
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except OSError:
+                pass
+        if process.returncode is None:
+            process.kill()
+        try:
+            await asyncio.wait_for(process.wait(), self.KILL_GRACE)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _read_until_delimiter(self, stream: asyncio.StreamReader, capture: OutputCapture,
+                                    on_write=None) -> bytes | None:
+        """
+        Write *stream* data to *capture* until the delimiter line, calling
+        *on_write* after each write.
+
+        Returns:
+            The rest of the delimiter line, or None at EOF.
+        """
+        marker = self.delimiter.encode()
+        pending = b""
+        while True:
+            data = await stream.read(self.READ_SIZE)
+            if not data:
+                capture.write(pending)
+                return None
+            pending += data
+            index = pending.find(marker)
+            if index != -1:
+                capture.write(pending[:index])
+                pending = pending[index + len(marker):]
+                while b"\n" not in pending:
+                    data = await stream.read(self.READ_SIZE)
+                    if not data:
+                        return pending
+                    pending += data
+                return pending[:pending.index(b"\n")]
+            # Hold back a possible partial delimiter for the next read
+            keep = len(marker) - 1
+            capture.write(pending[:-keep])
+            pending = pending[-keep:]
+            if on_write is not None:
+                on_write()
+
+    async def execute(self, command: str, timeout: float = 30.0) -> str:
+        return (await self.run(command, timeout)).text
+
+    async def run(self, command: str, timeout: float = 30.0) -> CommandResult:
+        """
+        Run *command* in the persistent shell; same result as PersistentShell.run(),
+        including the CPU and output limits, CPU and I/O accounting and
+        sampled peak RSS.
+
+        On timeout, or once the command prints more than the output limit,
+        only its process group is killed; if the shell itself is stuck it is
+        killed and restarted on the next command. If the caller is cancelled
+        (e.g. by a turn deadline) the command and the shell are killed, so the
+        next command never reads this one's output or exit status.
+        """
+        async with self._lock:  # one command at a time per shell
+            await self.start()
+            started = time.perf_counter()
+            limit_cpu(self.process.pid, self.limits.cpu_seconds)
+            background = self.state.background_pgids()
+            meter = UsageMeter(self.process.pid, background)
+            # The delimiter goes on its own line so heredocs in *command* still terminate;
+            # on stdout it carries the command's exit status
+            full_command = (f"{command}\n__rc=$?; {self.state.dump_command()}\n"
+                            f"echo '{self.delimiter}'\"$__rc\"; echo '{self.delimiter}' >&2\n")
+            self.process.stdin.write(full_command.encode())
+            await self.process.stdin.drain()
+
+            stdout, stderr = self._new_capture(), self._new_capture()
+            over_limit, check_output = self._output_watch(stdout, stderr)
+            reader = asyncio.ensure_future(asyncio.gather(
+                self._read_until_delimiter(self.process.stdout, stdout, check_output),
+                self._read_until_delimiter(self.process.stderr, stderr, check_output),
+            ))
+            note, stopped = "", None
+            try:
+                stopped = await self._supervise(reader, time.monotonic() + timeout, meter, over_limit)
+                if stopped:
+                    note = self._limit_note(stopped, timeout)
+                    if kill_foreground_job(self.process.pid, background):
+                        try:
+                            await asyncio.wait_for(asyncio.shield(reader), self.KILL_GRACE)
+                        except asyncio.TimeoutError:
+                            pass
+            except asyncio.CancelledError:
+                kill_foreground_job(self.process.pid, background)
+                await asyncio.shield(self._kill(self.process))  # restarted with its state on next use
+                raise
+            finally:
+                if not reader.done():
+                    reader.cancel()
+            meter.stop()
+
+            trailer = reader.result()[0] if reader.done() and not reader.cancelled() else None
+            if trailer is None:
+                # Stuck after being killed, or the shell exited (e.g. `exit`): restart on next use
+                if self.process.returncode is None and stopped:
+                    self.process.kill()
+                returncode = await self.process.wait()
+                if returncode < 0:
+                    returncode = 128 - returncode
+                note += "\n[Shell restarted with its working directory and environment restored]"
+            else:
+                returncode = int(trailer or 0)
+            limit_exceeded = "output" if stopped == "output" else None
+            if not stopped and returncode == 128 + signal.SIGXCPU and self.limits.cpu_seconds:
+                limit_exceeded = "cpu"
+                note = f"\n[Error: Command used more than {self.limits.cpu_seconds}s of CPU time and was killed]" + note
+            result = meter.apply(build_result(stdout, stderr, returncode, time.perf_counter() - started, None,
+                                              note, stopped == "timeout"))
+            result.limit_exceeded = limit_exceeded
+            return result
+
+    def get_cwd(self) -> str:
+        """Current directory of the shell (follows `cd`; Linux /proc, else workdir)."""
+        if self.process is None:
+            return self.workdir
+        try:
+            return os.readlink(f"/proc/{self.process.pid}/cwd")
+        except OSError:
+            return self.workdir
+
+    async def run_isolated(self, command: str, timeout: float = 30.0) -> CommandResult:
+        """
+        Run *command* in a one-off bash in the shell's current directory, with
+        the same limits and accounting as run().
+
+        The asyncio child watcher reaps the bash, so its rusage is not
+        available: once the command is done the bash closes its output and
+        waits for a line on stdin, and its CPU and I/O counters (which cover
+        its reaped children) are read from /proc before it is let go.
+        """
+        stdout, stderr = self._new_capture(), self._new_capture()
+        started = time.perf_counter()
+        limits = self.limits.ulimit_command(cpu=True)
+        script = (f"{limits}\n{{\n{command}\n}} </dev/null\n"
+                  "__rc=$?; exec >&- 2>&-; read -r _; exit $__rc")
+        process = await asyncio.create_subprocess_exec(
+            "/bin/bash", "-c", script,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.get_cwd(),
+            start_new_session=True,  # a limit kills the whole command, not just the bash
+        )
+        meter = UsageMeter(process.pid)
+        over_limit, check_output = self._output_watch(stdout, stderr)
+
+        async def pump(stream, capture):
+            while data := await stream.read(self.READ_SIZE):
+                capture.write(data)
+                check_output()
+
+        pumps = asyncio.ensure_future(asyncio.gather(pump(process.stdout, stdout), pump(process.stderr, stderr)))
+        try:
+            stopped = await self._supervise(pumps, time.monotonic() + timeout, meter, over_limit)
+            meter.stop()
+            try:
+                if stopped:
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.stdin.write(b"\n")
+                process.stdin.close()
+            except OSError:  # already exited, e.g. after `exit`
+                pass
+            if stopped:
+                # Read the pipes to EOF: the process is only reported done once they are closed
+                try:
+                    await asyncio.wait_for(asyncio.shield(pumps), self.KILL_GRACE)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            # Otherwise the bash would wait for its line on stdin forever
+            process.stdin.close()
+            await asyncio.shield(self._kill(process, (process.pid,)))
+            raise
+        finally:
+            if not pumps.done():
+                pumps.cancel()
+        returncode = await process.wait()
+        if returncode < 0:  # killed by a signal
+            returncode = 128 - returncode
+        note, limit_exceeded = "", None
+        if stopped:
+            note = self._limit_note(stopped, timeout)
+            limit_exceeded = "output" if stopped == "output" else None
+        elif returncode == 128 + signal.SIGXCPU and self.limits.cpu_seconds:
+            limit_exceeded = "cpu"
+            note = f"\n[Error: Command used more than {self.limits.cpu_seconds}s of CPU time and was killed]"
+        result = meter.apply(build_result(stdout, stderr, returncode, time.perf_counter() - started, None,
+                                          note, stopped == "timeout"))
+        result.limit_exceeded = limit_exceeded
+        return result
+
+    async def close(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+            await self.process.wait()
+        self.state.remove()
+
+
+class AsyncToolExecutor:
+    """
+    ToolExecutor whose execute methods are coroutines.
+
+    Create one per session: the shell it owns carries that session's cwd and
+    environment.
+    """
+
+    def __init__(self, safety_guardrail: SafetyGuardrail, workdir="./workspace", limits: ResourceLimits = None):
+        self.limits = limits or ResourceLimits.from_env()
+        self.shell = AsyncPersistentShell(workdir, limits=self.limits)
+        self.safety_guardrail = safety_guardrail
+        # Per-program totals of calls, failures, wall/CPU time, output and I/O bytes, peak RSS
+        self.command_stats = {}
+        self.result_cache = ToolResultCache(workdir)
+        self.jobs = JobManager(workdir, max_output_bytes=self.limits.output_bytes)
+
+    async def execute_tool(self, tool_name: str, args: str, isolated: bool = False) -> dict:
+        if tool_name == "execute_bash":
+            is_safe, message = self.safety_guardrail.is_safe(args)
+            if not is_safe:
+                return {"output": f"Guardrail blocked command: {message}", "returncode": 1}
+            read_only = isolated or self.safety_guardrail.is_read_only(args)
+            key = self.result_cache.key(args, self.shell.get_cwd()) if read_only else None
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return cached
+            if isolated:
+                result = (await self.shell.run_isolated(args)).as_tool_result()
+            else:
+                result = (await self.shell.run(args)).as_tool_result()
+            record_command_stats(self.command_stats, args, result)
+            if read_only:
+                self.result_cache.put(key, result)
+            else:
+                self.result_cache.invalidate()
+            return result
+        elif tool_name in FILE_TOOLS:
+            # File I/O is blocking: keep it off the event loop
+            result = await asyncio.to_thread(run_file_tool, tool_name, args, self.shell.get_cwd(),
+                                             self.shell.workdir, self.safety_guardrail)
+            record_command_stats(self.command_stats, tool_name, result)
+            if tool_name not in READ_ONLY_FILE_TOOLS:
+                self.result_cache.invalidate()
+            return result
+        elif tool_name in JOB_TOOLS:
+            return await self._execute_job_tool(tool_name, args)
+        else:
+            return {"output": f"Unknown tool: {tool_name}", "returncode": 1}
+
+    async def _execute_job_tool(self, tool_name: str, args) -> dict:
+        """Same as ToolExecutor._execute_job_tool(); job_wait blocks in a worker thread."""
+        kwargs = job_tool_arguments(tool_name, args)
+        if kwargs is None:
+            return {"output": f"Error: {tool_name} expects a JSON object of arguments, got {args!r}", "returncode": 1}
+        if tool_name == "job_start":
+            command = kwargs.get("command")
+            if not command:
+                return {"output": "Error: job_start needs a command", "returncode": 1}
+            is_safe, message = self.safety_guardrail.is_safe(command)
+            if not is_safe:
+                return {"output": f"Guardrail blocked command: {message}", "returncode": 1}
+            self.result_cache.invalidate()
+            prelude = self.shell.state.replay_script() + self.limits.ulimit_command(cpu=True) + "\n"
+            return self.jobs.start(command, self.shell.get_cwd(), prelude)
+        try:
+            return await asyncio.to_thread(getattr(self.jobs, JOB_TOOLS[tool_name][0]), **kwargs)
+        except (TypeError, ValueError) as e:
+            return {"output": f"Error: bad arguments for {tool_name}: {e}", "returncode": 1}
+
+    def is_independent(self, tool_name: str, args) -> bool:
+        """True if the call only reads state and may run alongside other such calls."""
+        if tool_name in READ_ONLY_TOOLS:
+            return True
+        return (tool_name == "execute_bash" and isinstance(args, str)
+                and self.safety_guardrail.is_read_only(args))
+
+    def submit_tool(self, tool_name: str, args) -> asyncio.Task:
+        """Start an independent (read-only) call as a task on the running loop."""
+        if not self.is_independent(tool_name, args):
+            raise ValueError(f"Only read-only calls can be submitted early: {args!r}")
+        return asyncio.create_task(self.execute_tool(tool_name, args, isolated=True))
+
+    async def execute_tools(self, tool_calls: list) -> list:
+        """
+        Execute several ``(tool_name, args)`` calls and return their results in order.
+
+        Same scheduling as ToolExecutor.execute_tools(): consecutive read-only
+        calls are gathered concurrently, everything else runs in order in the
+        persistent shell, and the calls after a failed one are skipped.
+        """
+        results = [None] * len(tool_calls)
+        batch = []
+
+        async def flush() -> bool:
+            if len(batch) == 1:
+                index = batch[0]
+                results[index] = await self.execute_tool(*tool_calls[index])
+            elif batch:
+                outputs = await asyncio.gather(
+                    *(self.execute_tool(*tool_calls[index], isolated=True) for index in batch)
+                )
+                for index, output in zip(batch, outputs):
+                    results[index] = output
+            failed = any(is_batch_failure(*tool_calls[index], results[index]) for index in batch)
+            batch.clear()
+            return failed
+
+        for index, (tool_name, args) in enumerate(tool_calls):
+            if self.is_independent(tool_name, args):
+                batch.append(index)
+                continue
+            if await flush():
+                break
+            results[index] = await self.execute_tool(tool_name, args)
+            if is_batch_failure(tool_name, args, results[index]):
+                break
+        else:
+            await flush()
+        return [result or skipped_result() for result in results]
+
+    def usage(self) -> dict:
+        """Resource totals of every tool call so far in this session."""
+        return session_usage(self.command_stats)
+
+    def parse_tool_calls(self, llm_response: str) -> list:
+        return parse_tool_calls(llm_response)
+
+    def parse_tool_call(self, llm_response: str) -> dict | None:
+        return parse_tool_call(llm_response)
+
+    async def close(self):
+        self.jobs.close()
+        await self.shell.close()
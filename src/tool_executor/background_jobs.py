@@ -0,0 +1,227 @@
+"""
+Background jobs for long-running commands (builds, test suites, servers).
+
+job_start launches a command and returns a job id at once; the job writes
+stdout and stderr to a log file under <workdir>/.tool_jobs, so nothing has
+to pump its output while the agent carries on. job_output reads the log
+incrementally, job_wait blocks up to a deadline, job_stop kills the job's
+process group. With an output limit, a thread checks the logs of running
+jobs and kills a job whose log grows past it.
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Output returned per job_output / job_wait call
+JOB_OUTPUT_BYTES = 16 * 1024
+# Longest a single job_wait may block
+MAX_JOB_WAIT_SECONDS = 300.0
+# How often the logs of running jobs are checked against the output limit
+LOG_CHECK_INTERVAL = 0.2
+
+
+@dataclass
+class BackgroundJob:
+    id: int
+    command: str
+    process: subprocess.Popen
+    log_path: str
+    started: float = field(default_factory=time.monotonic)
+    ended: Optional[float] = None
+    read_offset: int = 0  # how far job_output has read the log
+    limit_exceeded: Optional[str] = None  # "output" if the job was killed for its log size
+
+    @property
+    def returncode(self) -> Optional[int]:
+        returncode = self.process.poll()
+        if returncode is not None and self.ended is None:
+            self.ended = time.monotonic()
+        if returncode is not None and returncode < 0:  # killed by a signal
+            return 128 - returncode
+        return returncode
+
+    def describe(self) -> dict:
+        returncode = self.returncode
+        info = {
+            "job_id": self.id,
+            "command": self.command,
+            "state": "running" if returncode is None else "exited",
+            "job_returncode": returncode,
+            "seconds": round((self.ended or time.monotonic()) - self.started, 3),
+            "output_bytes": os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0,
+        }
+        if self.limit_exceeded:
+            info["limit_exceeded"] = self.limit_exceeded
+        return info
+
+
+def _error(message: str) -> dict:
+    return {"output": f"Error: {message}", "returncode": 1}
+
+
+class JobManager:
+    def __init__(self, workdir: str = "./workspace", max_output_bytes: Optional[int] = None):
+        """
+        Args:
+            workdir:          job logs are written to <workdir>/.tool_jobs
+            max_output_bytes: a job whose log grows past this is killed; None = no limit
+        """
+        self.log_dir = os.path.join(workdir, ".tool_jobs")
+        self.max_output_bytes = max_output_bytes
+        self.jobs = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._watcher = None  # thread enforcing max_output_bytes while jobs run
+
+    def start(self, command: str, cwd: str, prelude: str = "") -> dict:
+        """
+        Start *command* in a new bash in *cwd*, after *prelude* (e.g. the
+        persistent shell's exported variables), in its own process group.
+        """
+        os.makedirs(self.log_dir, exist_ok=True)
+        with self._lock:
+            job_id, self._next_id = self._next_id, self._next_id + 1
+        log_path = os.path.abspath(os.path.join(self.log_dir, f"job-{job_id}.log"))
+        with open(log_path, "wb") as log:
+            process = subprocess.Popen(
+                ["/bin/bash", "-c", f"{prelude}{command}"],
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                cwd=cwd,
+                start_new_session=True,
+            )
+        job = BackgroundJob(job_id, command, process, log_path)
+        with self._lock:
+            self.jobs[job_id] = job
+            if self.max_output_bytes is not None and self._watcher is None:
+                self._watcher = threading.Thread(target=self._check_logs, name="job-log-limit", daemon=True)
+                self._watcher.start()
+        return {"output": f"Started job {job_id} (pid {process.pid}); output is logged to {log_path}",
+                "returncode": 0, "job_id": job_id, "log_path": log_path}
+
+    def _check_logs(self):
+        """Kill the jobs whose log is over max_output_bytes, until no job is running."""
+        while True:
+            with self._lock:
+                running = [job for job in self.jobs.values() if job.returncode is None]
+                if not running:
+                    self._watcher = None
+                    return
+            for job in running:
+                try:
+                    size = os.path.getsize(job.log_path)
+                except OSError:
+                    continue
+                if size > self.max_output_bytes:
+                    job.limit_exceeded = "output"
+                    self._kill(job)
+            time.sleep(LOG_CHECK_INTERVAL)
+
+    def _job(self, job_id) -> BackgroundJob | None:
+        try:
+            return self.jobs.get(int(job_id))
+        except (TypeError, ValueError):
+            return None
+
+    def status(self, job_id=None) -> dict:
+        """One job's state, or every job's when *job_id* is None."""
+        if job_id is None:
+            jobs = [job.describe() for job in self.jobs.values()]
+            lines = [f"[{j['job_id']}] {j['state']:<7} {j['job_returncode'] if j['job_returncode'] is not None else '-':>4} "
+                     f"{j['seconds']:>9.1f}s  {j['command']}" for j in jobs]
+            return {"output": "\n".join(lines) or "No background jobs.", "returncode": 0, "jobs": jobs}
+        job = self._job(job_id)
+        if job is None:
+            return _error(f"no such job: {job_id}")
+        info = job.describe()
+        return {"output": f"Job {job.id} {info['state']}", "returncode": 0, **info}
+
+    def output(self, job_id, offset: int = None, max_bytes: int = JOB_OUTPUT_BYTES, tail: bool = False) -> dict:
+        """
+        Log output of a job: by default what was written since the previous
+        call, from *offset* if given, or the last *max_bytes* with *tail*.
+        """
+        job = self._job(job_id)
+        if job is None:
+            return _error(f"no such job: {job_id}")
+        info = job.describe()  # before reading, so an exited job's output is complete
+        size = info["output_bytes"]
+        # Under the lock, so concurrent incremental reads get consecutive ranges
+        with self._lock:
+            if tail:
+                start = max(0, size - max_bytes)
+            else:
+                start = job.read_offset if offset is None else max(0, int(offset))
+            with open(job.log_path, "rb") as log:
+                log.seek(start)
+                data = log.read(max_bytes)
+            end = start + len(data)
+            if offset is None and not tail:
+                job.read_offset = end
+        text = data.decode(errors="replace")
+        if end < size:
+            text += f"\n[... {size - end} more bytes; call job_output again to continue]"
+        elif job.limit_exceeded:
+            text += f"\n[Error: Job printed more than {self.max_output_bytes} bytes and was killed]"
+        return {"output": text, "returncode": 0, **info, "offset": start, "next_offset": end}
+
+    def wait(self, job_id, timeout: float = 30.0) -> dict:
+        """Wait up to *timeout* seconds for a job to exit, then report it with its new output."""
+        job = self._job(job_id)
+        if job is None:
+            return _error(f"no such job: {job_id}")
+        try:
+            job.process.wait(timeout=min(float(timeout), MAX_JOB_WAIT_SECONDS))
+        except subprocess.TimeoutExpired:
+            pass
+        return self.output(job.id)
+
+    def stop(self, job_id) -> dict:
+        """Kill the job's whole process group."""
+        job = self._job(job_id)
+        if job is None:
+            return _error(f"no such job: {job_id}")
+        self._kill(job)
+        return self.status(job.id)
+
+    @staticmethod
+    def _kill(job: BackgroundJob):
+        if job.returncode is None:
+            try:
+                os.killpg(job.process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            job.process.wait()
+
+    def close(self):
+        for job in list(self.jobs.values()):
+            if job.returncode is None:
+                self.stop(job.id)
+
+
+# Tool name -> (JobManager method, name of the argument a plain-string args value stands for)
+JOB_TOOLS = {
+    "job_start": ("start", "command"),
+    "job_status": ("status", "job_id"),
+    "job_output": ("output", "job_id"),
+    "job_wait": ("wait", "job_id"),
+    "job_stop": ("stop", "job_id"),
+}
+# Job tools that do not change any state. job_output advances the job's read
+# offset and job_wait blocks, so both run in order like state-changing calls.
+READ_ONLY_JOB_TOOLS = {"job_status"}
+
+
+def job_tool_arguments(tool_name: str, args) -> dict | None:
+    """Keyword arguments for a job tool call, or None if *args* has the wrong shape."""
+    if args is None or args == "":
+        return {}
+    if isinstance(args, (str, int)):
+        return {JOB_TOOLS[tool_name][1]: args}
+    return args if isinstance(args, dict) else None
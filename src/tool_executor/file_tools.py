@@ -0,0 +1,295 @@
+"""
+Native file tools: read_file, write_file, list_dir and grep.
+
+They run in the agent's own process (no bash, no pipe round trip) and return
+the same result dicts as execute_bash. Relative paths are resolved against
+the persistent shell's current directory, so they follow the agent's `cd`.
+With a guardrail, each call is checked as its shell equivalent (read_file as
+`cat PATH`, see POLICY_COMMANDS), so policy rules on paths cover both.
+Files larger than MMAP_THRESHOLD are memory-mapped, so a line range or a
+search only touches the pages it needs.
+"""
+
+import fnmatch
+import mmap
+import os
+import re
+import time
+
+# Files at least this large are mmap()ed instead of read
+MMAP_THRESHOLD = 1024 * 1024
+# Bytes scanned at a time when seeking to a line
+LINE_SCAN_BLOCK = 1024 * 1024
+# Output returned per call (as much as execute_bash keeps); longer results are cut with a note
+MAX_OUTPUT_BYTES = 32 * 1024
+MAX_GREP_MATCHES = 200
+# Directories grep does not descend into
+SKIP_DIRS = {".git", ".tool_output", "__pycache__", "node_modules", ".venv"}
+
+
+def _error(message: str) -> dict:
+    return {"output": f"Error: {message}", "returncode": 1}
+
+
+def _result(output: str, started: float, returncode: int = 0) -> dict:
+    return {
+        "output": output,
+        "returncode": returncode,
+        "output_bytes": len(output.encode()),
+        "wall_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _truncate(data: bytes, hint: str) -> str:
+    if len(data) <= MAX_OUTPUT_BYTES:
+        return data.decode(errors="replace")
+    return data[:MAX_OUTPUT_BYTES].decode(errors="ignore") + f"\n[... output truncated at {MAX_OUTPUT_BYTES} bytes; {hint}]"
+
+
+class _FileView:
+    """Bytes of a file: an mmap for large files, the contents for small ones."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = self._file.read()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _line_offset(data, line: int, start: int = 0, current: int = 1) -> int:
+    """Byte offset where 1-based *line* starts (len(data) if past the end)."""
+    # Skip whole blocks by counting their newlines in C, then walk the last stretch
+    while line - current > 64:
+        block = data[start:start + LINE_SCAN_BLOCK]
+        newlines = block.count(b"\n")
+        if not block or current + newlines >= line:
+            break
+        start, current = start + len(block), current + newlines
+    while current < line:
+        newline = data.find(b"\n", start)
+        if newline == -1:
+            return len(data)
+        start, current = newline + 1, current + 1
+    return start
+
+
+def read_file(cwd: str, path: str, start_line: int = None, end_line: int = None) -> dict:
+    """
+    Lines *start_line* to *end_line* (1-based, inclusive) of *path*, or the
+    whole file. Only the requested range is copied out of large files.
+    """
+    started = time.perf_counter()
+    full_path = os.path.join(cwd, path)
+    try:
+        with _FileView(full_path) as view:
+            first = max(1, int(start_line or 1))
+            begin = _line_offset(view.data, first)
+            if end_line is None:
+                end = len(view.data)
+            else:
+                end = _line_offset(view.data, int(end_line) + 1, begin, first)
+            # Copy no more than _truncate() keeps, plus a byte to show there is more
+            end = min(end, begin + MAX_OUTPUT_BYTES + 1)
+            text = _truncate(view.data[begin:end], "read a smaller range with start_line/end_line")
+    except (OSError, ValueError) as e:
+        return _error(f"cannot read {path}: {e}")
+    return _result(text, started)
+
+
+def write_file(cwd: str, path: str, content: str, append: bool = False, workspace: str = None) -> dict:
+    """Write (or append) *content* to *path*, creating parent directories."""
+    started = time.perf_counter()
+    full_path = os.path.realpath(os.path.join(cwd, path))
+    if workspace is not None:
+        root = os.path.realpath(workspace)
+        if full_path != root and not full_path.startswith(root + os.sep):
+            return _error(f"write_file is limited to the workspace ({root}): {path}")
+    try:
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "a" if append else "w") as f:
+            f.write(content)
+    except OSError as e:
+        return _error(f"cannot write {path}: {e}")
+    return _result(f"Wrote {len(content.encode())} bytes to {path}", started)
+
+
+def list_dir(cwd: str, path: str = ".") -> dict:
+    """Entries of *path*, one per line: directories end in '/', files show their size."""
+    started = time.perf_counter()
+    lines = []
+    try:
+        with os.scandir(os.path.join(cwd, path)) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.is_dir():
+                    lines.append(f"{entry.name}/")
+                else:
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        size = "?"
+                    lines.append(f"{entry.name}\t{size}")
+    except OSError as e:
+        return _error(f"cannot list {path}: {e}")
+    return _result(_truncate("\n".join(lines).encode(), "list a subdirectory"), started)
+
+
+def _iter_files(root: str, include: str = None):
+    if os.path.isfile(root):
+        yield root
+        return
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(files):
+            if include is None or fnmatch.fnmatch(name, include):
+                yield os.path.join(directory, name)
+
+
+def _required_literal(pattern: str) -> bytes | None:
+    """
+    A literal every match of *pattern* must start with (its plain-character
+    prefix), or None when there is no usable one.
+    """
+    if "|" in pattern:
+        return None
+    literal = []
+    for char in pattern:
+        if char in ".^$*+?{}[]\\()":
+            # A quantifier applies to the previous character, which is then optional
+            if char in "*?{" and literal:
+                literal.pop()
+            break
+        literal.append(char)
+    return "".join(literal).encode() if len(literal) >= 3 else None
+
+
+def _find_matches(regex, data, literal: bytes | None):
+    """
+    regex.finditer(data), but with a required literal prefix the regex is
+    only tried where bytes.find() located that literal, which is far faster
+    than letting the regex engine scan every position.
+    """
+    if literal is None:
+        yield from regex.finditer(data)
+        return
+    position = data.find(literal)
+    while position != -1:
+        match = regex.match(data, position)
+        if match:
+            yield match
+            position = max(match.end(), position + 1)
+        else:
+            position += 1
+        position = data.find(literal, position)
+
+
+def grep(cwd: str, pattern: str, path: str = ".", include: str = None, ignore_case: bool = False,
+         max_matches: int = MAX_GREP_MATCHES) -> dict:
+    """
+    Lines matching the regular expression *pattern* in *path* (a file, or a
+    directory searched recursively), as ``file:line:text``.
+
+    Returns:
+        returncode 1 when nothing matched, like grep.
+    """
+    started = time.perf_counter()
+    try:
+        regex = re.compile(pattern.encode(), re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+    except re.error as e:
+        return _error(f"invalid pattern {pattern!r}: {e}")
+    root = os.path.join(cwd, path)
+    if not os.path.exists(root):
+        return _error(f"no such file or directory: {path}")
+    literal = None if ignore_case else _required_literal(pattern)
+    matches = []
+    for file_path in _iter_files(root, include):
+        try:
+            view = _FileView(file_path)
+        except OSError:
+            continue
+        with view:
+            data = view.data
+            if b"\0" in data[:8192]:
+                continue  # binary
+            display = None
+            line, counted = 1, 0
+            for match in _find_matches(regex, data, literal):
+                begin = data.rfind(b"\n", 0, match.start()) + 1
+                if begin < counted:
+                    continue  # another match on a line already reported
+                line += data[counted:begin].count(b"\n")
+                end = data.find(b"\n", match.start())
+                end = len(data) if end == -1 else end
+                display = display or os.path.relpath(file_path, cwd)
+                matches.append(f"{display}:{line}:{data[begin:end].decode(errors='replace')}")
+                counted = end + 1 if end < len(data) else end
+                line += 1 if end < len(data) else 0
+                if len(matches) >= max_matches:
+                    break
+        if len(matches) >= max_matches:
+            matches.append(f"[... stopped after {max_matches} matches; narrow the pattern or path]")
+            break
+    output = _truncate("\n".join(matches).encode(), "narrow the pattern or path")
+    return _result(output, started, returncode=0 if matches else 1)
+
+
+FILE_TOOLS = {
+    "read_file": read_file,
+    "write_file": write_file,
+    "list_dir": list_dir,
+    "grep": grep,
+}
+# Tools that only read and may run concurrently with other reads
+READ_ONLY_FILE_TOOLS = {"read_file", "list_dir", "grep"}
+# Argument a plain-string args value stands for
+DEFAULT_ARGUMENT = {"read_file": "path", "list_dir": "path", "grep": "pattern"}
+# Shell command each tool is checked as by the guardrail
+POLICY_COMMANDS = {"read_file": "cat", "write_file": "tee", "list_dir": "ls", "grep": "grep"}
+
+
+def _policy_arguments(tool_name: str, args: dict, cwd: str) -> list:
+    """Arguments of the equivalent shell command: the path as given and resolved."""
+    path = str(args.get("path", "."))
+    arguments = [str(args.get("pattern", ""))] if tool_name == "grep" else []
+    arguments.append(path)
+    resolved = os.path.realpath(os.path.join(cwd, path))
+    if resolved != path:
+        arguments.append(resolved)
+    return arguments
+
+
+def run_file_tool(tool_name: str, args, cwd: str, workspace: str = None, guardrail=None) -> dict:
+    """
+    Call file tool *tool_name* with the tool call's *args*: a JSON object of
+    keyword arguments, or for single-argument use a plain string. With a
+    *guardrail* (SafetyGuardrail), calls its policy denies are not run.
+    """
+    if isinstance(args, str) and tool_name in DEFAULT_ARGUMENT:
+        args = {DEFAULT_ARGUMENT[tool_name]: args}
+    if args is None and tool_name == "list_dir":
+        args = {}
+    if not isinstance(args, dict):
+        return _error(f"{tool_name} expects a JSON object of arguments, got {args!r}")
+    if guardrail is not None:
+        allowed, message = guardrail.check_file_access(POLICY_COMMANDS[tool_name],
+                                                       _policy_arguments(tool_name, args, cwd))
+        if not allowed:
+            return {"output": f"Guardrail blocked {tool_name}: {message}", "returncode": 1}
+    if tool_name == "write_file":
+        args = {**args, "workspace": workspace}
+    try:
+        return FILE_TOOLS[tool_name](cwd, **args)
+    except TypeError as e:
+        return _error(f"bad arguments for {tool_name}: {e}")
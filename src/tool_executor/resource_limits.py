@@ -0,0 +1,234 @@
+"""
+Per-command resource limits and usage accounting for agent-issued commands.
+
+Address space and open files are soft rlimits (what ``ulimit -S`` sets) on
+the shell, inherited by everything it starts. CPU seconds are granted per
+command: before each one the shell's RLIMIT_CPU is raised to the CPU time it
+has used so far plus the allowance, so every process the command forks gets
+the allowance afresh. One-off shells and background jobs set it with
+``ulimit -t`` instead, which likewise applies to each of their processes.
+Output bytes are enforced by the reader, which kills
+the command's job once it has printed more than the limit.
+
+Usage is measured from /proc: CPU time and bytes read/written as differences
+of the shell's counters (which include its reaped children), and peak RSS
+by sampling the command's processes while it runs.
+"""
+
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+# Peak RSS sampling: first sample after this long, then at doubling intervals up to the maximum
+RSS_SAMPLE_FIRST = 0.01
+RSS_SAMPLE_MAX = 0.25
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+@dataclass
+class ResourceLimits:
+    """Limits per command; None means unlimited."""
+    cpu_seconds: Optional[int] = 300
+    address_space_bytes: Optional[int] = 8 * 1024 ** 3
+    output_bytes: Optional[int] = 64 * 1024 ** 2
+    open_files: Optional[int] = 1024
+
+    @classmethod
+    def from_env(cls) -> "ResourceLimits":
+        """
+        Defaults overridden by TOOL_CPU_SECONDS, TOOL_MEMORY_MB, TOOL_OUTPUT_MB
+        and TOOL_OPEN_FILES; 0 turns a limit off.
+        """
+        limits = cls()
+        for name, attribute, scale in (("TOOL_CPU_SECONDS", "cpu_seconds", 1),
+                                       ("TOOL_MEMORY_MB", "address_space_bytes", 1024 ** 2),
+                                       ("TOOL_OUTPUT_MB", "output_bytes", 1024 ** 2),
+                                       ("TOOL_OPEN_FILES", "open_files", 1)):
+            value = os.getenv(name)
+            if value:
+                setattr(limits, attribute, int(value) * scale or None)
+        return limits
+
+    def ulimit_command(self, cpu: bool = False) -> str:
+        """
+        ``ulimit`` line applying the address space and open files limits (and
+        with *cpu* the CPU limit, for one-off shells) to a bash and its
+        children; "" if there is nothing to set.
+        """
+        options = []
+        if self.address_space_bytes:
+            options.append(f"-v {_below_hard_limit('RLIMIT_AS', self.address_space_bytes) // 1024}")
+        if self.open_files:
+            options.append(f"-n {_below_hard_limit('RLIMIT_NOFILE', self.open_files)}")
+        if cpu and self.cpu_seconds:
+            options.append(f"-t {_below_hard_limit('RLIMIT_CPU', self.cpu_seconds)}")
+        return f"ulimit -S {' '.join(options)} 2>/dev/null" if options else ""
+
+    @classmethod
+    def unlimited(cls) -> "ResourceLimits":
+        return cls(cpu_seconds=None, address_space_bytes=None, output_bytes=None, open_files=None)
+
+
+def _below_hard_limit(name: str, value: int) -> int:
+    """*value*, lowered to our own hard limit (an unprivileged shell cannot exceed it)."""
+    if resource is None:
+        return value
+    hard = resource.getrlimit(getattr(resource, name))[1]
+    return value if hard == resource.RLIM_INFINITY else min(value, hard)
+
+
+def _stat_fields(pid: int) -> Optional[list]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Fields after "pid (comm) " (comm may contain spaces or parentheses): state is [0]
+    return stat[stat.rindex(")") + 2:].split()
+
+
+def process_times(pid: int) -> Optional[tuple]:
+    """
+    (user, system) CPU seconds used by *pid* and its reaped children, from
+    /proc/<pid>/stat; None where /proc is unavailable.
+    """
+    fields = _stat_fields(pid)
+    if fields is None:
+        return None
+    utime, stime, cutime, cstime = (int(field) for field in fields[11:15])
+    return (utime + cutime) / _CLOCK_TICKS, (stime + cstime) / _CLOCK_TICKS
+
+
+def io_bytes(pid: int) -> Optional[tuple]:
+    """
+    (read_bytes, write_bytes) of storage I/O by *pid* and its reaped
+    children, from /proc/<pid>/io; None where that is unavailable.
+    """
+    counters = {}
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                counters[name] = int(value)
+    except (OSError, ValueError):
+        return None
+    return counters.get("read_bytes", 0), counters.get("write_bytes", 0)
+
+
+def limit_cpu(pid: int, seconds: Optional[int]):
+    """
+    Let shell *pid*, and each process it forks from now on, use *seconds*
+    more CPU time (soft RLIMIT_CPU; exceeding it sends SIGXCPU). The shell's
+    own time so far counts towards the limit it passes on, which is why the
+    allowance is rounded up.
+    """
+    if not seconds or resource is None or not hasattr(resource, "prlimit"):
+        return
+    fields = _stat_fields(pid)
+    if fields is None:
+        return
+    used = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    try:
+        hard = resource.prlimit(pid, resource.RLIMIT_CPU)[1]
+        soft = math.ceil(used) + seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.prlimit(pid, resource.RLIMIT_CPU, (soft, hard))
+    except OSError:
+        pass
+
+
+def _descendants(pid: int, skip_pgids=()) -> list:
+    """PIDs below *pid*, leaving out children in *skip_pgids* (background jobs) and their subtrees."""
+    pids, pending = [], [pid]
+    while pending:
+        parent = pending.pop()
+        try:
+            with open(f"/proc/{parent}/task/{parent}/children") as f:
+                children = [int(child) for child in f.read().split()]
+        except OSError:
+            continue
+        for child in children:
+            if parent == pid and skip_pgids:
+                try:
+                    if os.getpgid(child) in skip_pgids:
+                        continue
+                except OSError:
+                    continue
+            pids.append(child)
+            pending.append(child)
+    return pids
+
+
+def tree_peak_rss(pid: int, skip_pgids=()) -> Optional[int]:
+    """Sum of the peak RSS (VmHWM) of the processes below *pid*, in bytes; None if there are none."""
+    total, found = 0, False
+    for child in _descendants(pid, skip_pgids):
+        try:
+            with open(f"/proc/{child}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total += int(line.split()[1]) * 1024
+                        found = True
+                        break
+        except (OSError, ValueError, IndexError):
+            continue
+    return total if found else None
+
+
+class UsageMeter:
+    """
+    Resources used by one command run in a persistent shell: the change in
+    the shell's CPU and I/O counters, and the peak RSS of its child
+    processes as sampled by tick() while the command runs.
+    """
+
+    def __init__(self, shell_pid: int, skip_pgids=()):
+        self.shell_pid = shell_pid
+        self.skip_pgids = skip_pgids
+        self.peak_rss_bytes = None
+        self._times = process_times(shell_pid)
+        self._io = io_bytes(shell_pid)
+        self._end = None
+        self._interval = RSS_SAMPLE_FIRST
+        self._next_sample = time.monotonic() + self._interval
+
+    def timeout(self, remaining: float) -> float:
+        """How long a select() may block before the next sample is due."""
+        return max(0.0, min(remaining, self._next_sample - time.monotonic()))
+
+    def tick(self):
+        """Sample peak RSS if a sample is due."""
+        now = time.monotonic()
+        if now < self._next_sample:
+            return
+        rss = tree_peak_rss(self.shell_pid, self.skip_pgids)
+        if rss is not None:
+            self.peak_rss_bytes = max(self.peak_rss_bytes or 0, rss)
+        self._interval = min(self._interval * 2, RSS_SAMPLE_MAX)
+        self._next_sample = now + self._interval
+
+    def stop(self):
+        """Read the shell's counters now, e.g. before reaping a shell that exited."""
+        if self._end is None:
+            self._end = process_times(self.shell_pid), io_bytes(self.shell_pid)
+
+    def apply(self, result):
+        """Fill in the CPU, I/O and peak RSS fields of CommandResult *result*."""
+        self.stop()
+        times, io = self._end
+        if times is not None and self._times is not None:
+            result.cpu_seconds = sum(times) - sum(self._times)
+        if io is not None and self._io is not None:
+            result.read_bytes = io[0] - self._io[0]
+            result.write_bytes = io[1] - self._io[1]
+        result.peak_rss_bytes = self.peak_rss_bytes
+        return result
@@ -0,0 +1,169 @@
+"""
+Cache for the results of read-only tool calls.
+
+Agents re-run `cat`, `ls`, `grep` and friends on files that have not changed.
+A cached result is reused while the command, the shell's cwd and a
+fingerprint of every path the command refers to (mtime and size, recursively
+for directories) are unchanged. Any state-changing command drops the whole
+cache, since it may have changed files or the environment in ways the
+fingerprint cannot see.
+"""
+
+import glob
+import os
+import shlex
+import threading
+from collections import OrderedDict
+
+# Read-only commands whose output changes without any file changing
+UNCACHEABLE_COMMANDS = {"date", "df"}
+# Entries kept (least recently used are dropped first)
+MAX_CACHE_ENTRIES = 256
+# Paths stat()ed per fingerprint; commands touching more are not cached
+MAX_FINGERPRINT_PATHS = 2000
+
+
+class _TooManyPaths(Exception):
+    pass
+
+
+class ToolResultCache:
+    def __init__(self, workspace: str, max_entries: int = MAX_CACHE_ENTRIES):
+        """
+        Args:
+            workspace:   root directory; commands referring to paths outside it
+                         are never cached
+            max_entries: number of results kept
+        """
+        self.workspace = os.path.realpath(workspace)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (cwd, command) -> (fingerprint, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _operands(self, command: str, cwd: str) -> list | None:
+        """
+        Paths *command* may read, or None if it must not be cached.
+
+        Every word that is not the command name or an option is treated as a
+        possible path (grep patterns included: a pattern that names no file
+        only adds a "missing" entry to the fingerprint). Globs are expanded
+        the way the shell would. Without any existing operand the command is
+        assumed to read the cwd (``ls``, ``grep -r foo``).
+        """
+        paths = []
+        expect_command = True
+        for line in command.splitlines():
+            lexer = shlex.shlex(line, posix=True, punctuation_chars=True)
+            lexer.whitespace_split = True
+            for token in lexer:
+                if token in ("|", "||", "&&", ";"):
+                    expect_command = True
+                elif expect_command:
+                    if token in UNCACHEABLE_COMMANDS:
+                        return None
+                    expect_command = False
+                elif not token.startswith("-"):
+                    path = os.path.join(cwd, os.path.expanduser(token))
+                    paths.extend(glob.glob(path) if glob.has_magic(token) else [path])
+            expect_command = True
+        operands = []
+        for path in paths:
+            real = os.path.realpath(path)
+            if not self._in_workspace(real):
+                if os.path.lexists(path):
+                    return None  # reads outside the workspace
+                continue
+            operands.append(real)
+        if not any(os.path.exists(path) for path in operands):
+            operands.append(cwd)
+        return operands
+
+    def _in_workspace(self, path: str) -> bool:
+        return path == self.workspace or path.startswith(self.workspace + os.sep)
+
+    @staticmethod
+    def _fingerprint(paths: list) -> tuple:
+        stamps = []
+        for top in sorted(set(paths)):
+            try:
+                st = os.stat(top)
+            except OSError:
+                stamps.append((top, None))
+                continue
+            stamps.append((top, st.st_mtime_ns, st.st_size))
+            if not os.path.isdir(top):
+                continue
+            for root, dirs, files in os.walk(top):
+                dirs.sort()
+                for name in dirs + sorted(files):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    stamps.append((path, st.st_mtime_ns, st.st_size))
+                if len(stamps) > MAX_FINGERPRINT_PATHS:
+                    raise _TooManyPaths()
+        return tuple(stamps)
+
+    def key(self, command: str, cwd: str) -> tuple | None:
+        """
+        Cache key and fingerprint for *command* run in *cwd*, or None if its
+        result must not be cached. Compute it before running the command.
+        """
+        cwd = os.path.realpath(cwd)
+        if not self._in_workspace(cwd):
+            return None
+        try:
+            operands = self._operands(command, cwd)
+            if operands is None:
+                return None
+            return (cwd, command), self._fingerprint(operands)
+        except (ValueError, _TooManyPaths):
+            return None
+
+    def get(self, key: tuple | None) -> dict | None:
+        """The cached result for *key*, marked ``"cached": True``, or None on a miss."""
+        if key is None:
+            return None
+        entry_key, fingerprint = key
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            self.hits += 1
+            return {**entry[1], "cached": True}
+
+    def put(self, key: tuple | None, result: dict):
+        # Spill files are pruned over time, and timeouts are not reproducible
+        if key is None or result.get("spill_path") or result.get("stderr_spill_path") or result.get("timed_out"):
+            return
+        entry_key, fingerprint = key
+        with self._lock:
+            self._entries[entry_key] = (fingerprint, result)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop every entry; called after any state-changing command."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
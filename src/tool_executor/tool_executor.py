@@ -1,105 +1,1014 @@
 import subprocess
 import json
 import os
+import queue
 import select
+import signal
+import tempfile
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
 from safety_guardrail.safety_guardrail import SafetyGuardrail
+from .background_jobs import JOB_TOOLS, READ_ONLY_JOB_TOOLS, JobManager, job_tool_arguments
+from .file_tools import FILE_TOOLS, READ_ONLY_FILE_TOOLS, run_file_tool
+from .resource_limits import ResourceLimits, UsageMeter, limit_cpu, process_times
+from .result_cache import ToolResultCache
+
+# Output kept in memory per command: the first and the last bytes
+OUTPUT_HEAD_BYTES = 16 * 1024
+OUTPUT_TAIL_BYTES = 16 * 1024
+# Spill files kept under <workdir>/.tool_output (oldest are removed first)
+MAX_SPILL_FILES = 50
+# Seconds an execute_bash command may take at most (callers may pass less, e.g. a turn's remaining time)
+COMMAND_TIMEOUT = 30.0
+# Every tool a TOOL_CALL may name
+TOOL_NAMES = {"execute_bash", *FILE_TOOLS, *JOB_TOOLS}
+# Tools that may be called without arguments
+NO_ARGUMENT_TOOLS = {"list_dir", "job_status"}
+# Tools that change nothing and may run alongside each other
+READ_ONLY_TOOLS = READ_ONLY_FILE_TOOLS | READ_ONLY_JOB_TOOLS
+# Searches that exit with status 1 when nothing matched
+NO_MATCH_PROGRAMS = {"grep", "egrep", "fgrep", "zgrep", "rg", "ag"}
+
+
+@dataclass
+class CommandResult:
+    output: str                       # head and tail of stdout, with a marker where bytes were dropped
+    output_bytes: int = 0             # size of the complete stdout
+    spill_path: Optional[str] = None  # file holding the complete stdout, if it did not fit in memory
+    returncode: Optional[int] = 0     # exit status ($?); 128 + signal if the command was killed
+    stderr: str = ""
+    stderr_bytes: int = 0
+    stderr_spill_path: Optional[str] = None
+    wall_seconds: float = 0.0
+    cpu_seconds: Optional[float] = None  # user + system time, where /proc is available
+    timed_out: bool = False
+    peak_rss_bytes: Optional[int] = None  # highest resident memory of the command's processes
+    read_bytes: Optional[int] = None      # storage I/O
+    write_bytes: Optional[int] = None
+    limit_exceeded: Optional[str] = None  # "cpu" or "output" if a resource limit killed the command
+
+    @property
+    def text(self) -> str:
+        """stdout followed by stderr, as one string."""
+        return "\n".join(part for part in (self.output, self.stderr) if part)
+
+    def as_tool_result(self) -> dict:
+        result = {"output": self.output, "returncode": self.returncode, "output_bytes": self.output_bytes}
+        if self.spill_path:
+            result["spill_path"] = self.spill_path
+        if self.stderr:
+            result["stderr"] = self.stderr
+            result["stderr_bytes"] = self.stderr_bytes
+        if self.stderr_spill_path:
+            result["stderr_spill_path"] = self.stderr_spill_path
+        result["wall_seconds"] = round(self.wall_seconds, 3)
+        if self.cpu_seconds is not None:
+            result["cpu_seconds"] = round(self.cpu_seconds, 3)
+        if self.timed_out:
+            result["timed_out"] = True
+        if self.peak_rss_bytes is not None:
+            result["peak_rss_bytes"] = self.peak_rss_bytes
+        if self.read_bytes:
+            result["read_bytes"] = self.read_bytes
+        if self.write_bytes:
+            result["write_bytes"] = self.write_bytes
+        if self.limit_exceeded:
+            result["limit_exceeded"] = self.limit_exceeded
+        return result
+
+
+def skipped_result() -> dict:
+    """Tool result for a call that was not run because an earlier one failed."""
+    return {"output": "Skipped: an earlier command in this response failed", "returncode": None, "skipped": True}
+
+
+def is_failure(result: dict) -> bool:
+    """True if a tool result reports a non-zero exit status."""
+    return result.get("returncode") not in (0, None)
+
+
+def is_batch_failure(tool_name: str, args, result: dict) -> bool:
+    """
+    True if the calls after this one should be skipped: is_failure(), except
+    that exit status 1 of a search that found nothing is an answer, not an error.
+    """
+    if result.get("returncode") == 1:
+        words = args.split() if tool_name == "execute_bash" and isinstance(args, str) else [tool_name]
+        if words and words[0] in NO_MATCH_PROGRAMS:
+            return False
+    return is_failure(result)
+
+
+def record_command_stats(stats: dict, command: str, result: dict):
+    """Add one tool result to *stats*, keyed by the command's program name."""
+    words = command.split()
+    entry = stats.setdefault(words[0] if words else "", {
+        "calls": 0, "failures": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "output_bytes": 0,
+        "read_bytes": 0, "write_bytes": 0, "peak_rss_bytes": 0, "limit_kills": 0,
+    })
+    entry["calls"] += 1
+    entry["failures"] += is_failure(result)
+    entry["wall_seconds"] += result.get("wall_seconds", 0.0)
+    entry["cpu_seconds"] += result.get("cpu_seconds", 0.0)
+    entry["output_bytes"] += result.get("output_bytes", 0) + result.get("stderr_bytes", 0)
+    entry["read_bytes"] += result.get("read_bytes", 0)
+    entry["write_bytes"] += result.get("write_bytes", 0)
+    entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"], result.get("peak_rss_bytes", 0))
+    entry["limit_kills"] += bool(result.get("limit_exceeded"))
+
+
+def session_usage(stats: dict) -> dict:
+    """Totals over every program in *stats* (see record_command_stats); peak RSS is the highest seen."""
+    totals = {"calls": 0, "failures": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "output_bytes": 0,
+              "read_bytes": 0, "write_bytes": 0, "peak_rss_bytes": 0, "limit_kills": 0}
+    for entry in stats.values():
+        for name, value in entry.items():
+            if name == "peak_rss_bytes":
+                totals[name] = max(totals[name], value)
+            else:
+                totals[name] += value
+    return totals
+
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """
+    CPU time (user + system) used by *pid* and its reaped children, from
+    /proc/<pid>/stat; None where /proc is unavailable.
+    """
+    times = process_times(pid)
+    return None if times is None else sum(times)
+
+
+class OutputCapture:
+    """
+    Bounded capture of one command's output stream.
+
+    Keeps the first *head_bytes* and a ring of the last *tail_bytes* in memory.
+    Once the output outgrows both, the complete stream (including what was
+    already seen) is written to a spill file under *spill_dir*, so memory per
+    command stays capped whatever the output size.
+    """
+
+    def __init__(self, spill_dir: str, head_bytes: int = OUTPUT_HEAD_BYTES, tail_bytes: int = OUTPUT_TAIL_BYTES):
+        self.spill_dir = spill_dir
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self.spill_path = None
+        self._spill = None
+
+    def write(self, data: bytes):
+        if not data:
+            return
+        self.total += len(data)
+        if self._spill is not None:
+            self._spill.write(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        self.tail += data
+        if len(self.tail) > self.tail_bytes:
+            if self._spill is None:
+                # Nothing has been dropped yet: head + tail is the whole stream so far
+                self._open_spill()
+            del self.tail[:len(self.tail) - self.tail_bytes]
+
+    def _open_spill(self):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._spill = tempfile.NamedTemporaryFile(
+            dir=self.spill_dir, prefix="output-", suffix=".log", delete=False
+        )
+        self.spill_path = os.path.abspath(self._spill.name)
+        self._spill.write(self.head)
+        self._spill.write(self.tail)
+        _prune_spill_files(self.spill_dir)
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+
+    def text(self, suffix: str = "") -> str:
+        """Close the spill file and return what was captured, plus *suffix*."""
+        self.close()
+        if self.spill_path is None:
+            text = (self.head + self.tail).decode(errors="replace").strip()
+        else:
+            omitted = self.total - len(self.head) - len(self.tail)
+            text = (
+                self.head.decode(errors="replace")
+                + f"\n[... {omitted} bytes omitted; full output ({self.total} bytes) in {self.spill_path} ...]\n"
+                + self.tail.decode(errors="replace")
+            ).strip()
+        return text + suffix
+
+    def result(self, suffix: str = "") -> CommandResult:
+        """Close the spill file and return what was captured as a stdout-only result."""
+        return CommandResult(self.text(suffix), self.total, self.spill_path)
+
+
+def build_result(stdout: OutputCapture, stderr: OutputCapture, returncode: Optional[int],
+                 wall_seconds: float, cpu_seconds: Optional[float] = None, note: str = "",
+                 timed_out: bool = False) -> CommandResult:
+    """Combine the two captures of one command into a CommandResult; *note* is appended to stderr."""
+    return CommandResult(
+        output=stdout.text(), output_bytes=stdout.total, spill_path=stdout.spill_path,
+        returncode=returncode,
+        stderr=(stderr.text() + note).strip(), stderr_bytes=stderr.total, stderr_spill_path=stderr.spill_path,
+        wall_seconds=wall_seconds, cpu_seconds=cpu_seconds, timed_out=timed_out,
+    )
+
+
+def _prune_spill_files(spill_dir: str):
+    try:
+        paths = [os.path.join(spill_dir, name) for name in os.listdir(spill_dir)]
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:-MAX_SPILL_FILES]:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _child_pids(pid: int) -> list:
+    """PIDs of the direct children of *pid* (Linux /proc)."""
+    children = f"/proc/{pid}/task/{pid}/children"
+    if os.path.exists(children):
+        with open(children) as f:
+            return [int(child) for child in f.read().split()]
+    pids = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # "pid (comm) state ppid ..." — comm may contain spaces or parentheses
+        if int(stat[stat.rindex(")") + 2:].split()[1]) == pid:
+            pids.append(int(name))
+    return pids
+
+
+def kill_foreground_job(shell_pid: int, background_pgids=()) -> bool:
+    """
+    SIGKILL the process group(s) of the job a job-control (``set -m``) shell
+    is running, sparing the shell itself and its *background_pgids*.
+
+    Returns:
+        False if there was nothing to kill (e.g. a loop of builtins running in
+        the shell process itself) or /proc is unavailable.
+    """
+    try:
+        shell_pgid = os.getpgid(shell_pid)
+        pids = _child_pids(shell_pid)
+    except OSError:
+        return False
+    killed = False
+    for pid in pids:
+        try:
+            pgid = os.getpgid(pid)
+            if pgid != shell_pgid and pgid not in background_pgids:
+                os.killpg(pgid, signal.SIGKILL)
+                killed = True
+        except OSError:
+            continue  # already gone
+    return killed
+
+
+class ShellState:
+    """
+    Snapshot of a shell's cwd, exported variables and background jobs, written
+    by the shell itself to a file after every command so it survives the
+    shell's death and can be replayed into a replacement.
+    """
+
+    JOBS_MARKER = "# jobs"
+
+    def __init__(self):
+        # Prefer tmpfs: rewriting the file then never reaches the disk, nor the shell's write_bytes
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+        fd, self.path = tempfile.mkstemp(prefix="clawlittle-shell-", suffix=".state", dir=directory)
+        os.close(fd)
+
+    def dump_command(self) -> str:
+        """Shell snippet that rewrites the snapshot (builtins only, no fork)."""
+        return (
+            f"{{ export -p; printf 'cd -- %q\\n' \"$PWD\"; echo '{self.JOBS_MARKER}'; jobs -p; }} "
+            f"> '{self.path}' 2>/dev/null"
+        )
+
+    def _read(self) -> tuple:
+        try:
+            with open(self.path) as f:
+                text = f.read()
+        except OSError:
+            return "", ""
+        script, _, jobs = text.partition(f"\n{self.JOBS_MARKER}\n")
+        return script, jobs
+
+    def background_pgids(self) -> set:
+        """Process groups of background jobs as of the last completed command."""
+        return {int(pgid) for pgid in self._read()[1].split() if pgid.isdigit()}
+
+    def replay_script(self) -> str:
+        """Script restoring exported variables and cwd in a fresh shell."""
+        script = self._read()[0]
+        if not script:
+            return ""
+        # Read-only or special variables may refuse to be redeclared; ignore those errors
+        return f"{{\n{script}\n}} 2>/dev/null\n"
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+@dataclass
+class _Stream:
+    """Read state of one output fd of a running command."""
+    capture: OutputCapture
+    held: bytes = b""                # possible partial delimiter, not captured yet
+    trailer: Optional[bytes] = None  # rest of the delimiter line, once it was seen
+    eof: bool = False
+
 
 class PersistentShell:
-    def __init__(self, workdir="./workspace"):
+    READ_SIZE = 65536
+    # Extra time given to a shell to finish a command after its job was killed
+    KILL_GRACE = 2.0
+
+    def __init__(self, workdir="./workspace", head_bytes: int = OUTPUT_HEAD_BYTES,
+                 tail_bytes: int = OUTPUT_TAIL_BYTES, standby: bool = True, limits: ResourceLimits = None):
         self.workdir = workdir
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.limits = limits or ResourceLimits.unlimited()
         os.makedirs(self.workdir, exist_ok=True)
-        self.process = subprocess.Popen(
+        self.delimiter = "---END_OF_COMMAND---"
+        self.state = ShellState()
+        self.restarts = 0
+        # bash is started on first use (see process); with *standby* a warm
+        # standby is started alongside and takes over at once if the main shell dies
+        self.standby = standby
+        self._process = None
+        self._standby = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def process(self) -> subprocess.Popen:
+        """The main bash process, started (with its standby) the first time it is needed."""
+        if self._process is None:
+            with self._start_lock:
+                if self._process is None:
+                    self._standby = self._spawn() if self.standby else None
+                    self._process = self._spawn()
+        return self._process
+
+    @process.setter
+    def process(self, process: subprocess.Popen):
+        self._process = process
+
+    def _spawn(self) -> subprocess.Popen:
+        # Binary, unbuffered pipes: output is read straight from the fds
+        process = subprocess.Popen(
             ["/bin/bash"],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1, # Line buffered
+            bufsize=0,
             cwd=self.workdir
         )
-        self.delimiter = "---END_OF_COMMAND---"
+        for stream in (process.stdout, process.stderr):
+            os.set_blocking(stream.fileno(), False)
+        # Job control puts every command in its own process group, so a
+        # timeout can kill that job without killing the shell
+        process.stdin.write(f"set -m\n{self.limits.ulimit_command()}\n".encode())
+        return process
+
+    @staticmethod
+    def _terminate(process: subprocess.Popen):
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        for stream in (process.stdin, process.stdout, process.stderr):
+            stream.close()
+
+    def _failover(self):
+        """Replace the main shell with the standby and replay cwd and exported variables."""
+        self._terminate(self.process)
+        standby = self._standby
+        if standby is not None:
+            self._standby = self._spawn()
+            if standby.poll() is not None:
+                self._terminate(standby)
+                standby = None
+        if standby is None:
+            standby = self._spawn()
+        self.process = standby
+        self.process.stdin.write(self.state.replay_script().encode())
+        self.restarts += 1
+
+    def _send(self, command: str):
+        # The delimiter goes on its own line so heredocs in *command* still terminate;
+        # on stdout it carries the command's exit status
+        full_command = (f"{command}\n__rc=$?; {self.state.dump_command()}\n"
+                        f"echo '{self.delimiter}'\"$__rc\"; echo '{self.delimiter}' >&2\n")
+        try:
+            self.process.stdin.write(full_command.encode())
+        except BrokenPipeError:
+            self._failover()
+            self.process.stdin.write(full_command.encode())
+
+    def _new_capture(self) -> OutputCapture:
+        return OutputCapture(os.path.join(self.workdir, ".tool_output"), self.head_bytes, self.tail_bytes)
+
+    def _pump(self, streams: dict, deadline: float, marker: bytes = None, meter: UsageMeter = None,
+              max_output: int = None) -> bool:
+        """
+        Copy output from the fds in *streams* (fd -> _Stream) to their captures
+        until each one reaches *marker* (or EOF) and is removed from *streams*.
+
+        Data is read with os.read as soon as select() reports it and the
+        marker is found in the byte stream, so there is no polling interval
+        and no dependence on trailing newlines. With a *meter*, select()
+        also wakes up whenever a peak RSS sample is due.
+
+        Returns:
+            False if *deadline* passed first, or the captures together hold
+            more than *max_output* bytes.
+        """
+        captures = [stream.capture for stream in streams.values()]
+        while streams:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if max_output is not None and sum(capture.total for capture in captures) > max_output:
+                return False
+            ready, _, _ = select.select(list(streams), [], [], meter.timeout(remaining) if meter else remaining)
+            if meter is not None:
+                meter.tick()
+            for fd in ready:
+                stream = streams[fd]
+                try:
+                    data = os.read(fd, self.READ_SIZE)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    stream.capture.write(stream.held)
+                    stream.eof = True
+                    del streams[fd]
+                    continue
+                if marker is None:
+                    stream.capture.write(data)
+                    continue
+                buffer = stream.held + data
+                index = buffer.find(marker)
+                if index != -1:
+                    stream.capture.write(buffer[:index])
+                    end = buffer.find(b"\n", index)
+                    if end == -1:  # the rest of the marker line is still on its way
+                        stream.held = buffer[index:]
+                        continue
+                    stream.trailer = buffer[index + len(marker):end]
+                    del streams[fd]
+                    continue
+                # Hold back a possible partial delimiter for the next read
+                keep = len(marker) - 1
+                stream.capture.write(buffer[:-keep])
+                stream.held = buffer[-keep:]
+        return True
 
     def execute(self, command: str, timeout: float = 30.0) -> str:
-        full_command = f"{command}; echo \'{self.delimiter}\'\n"
-        self.process.stdin.write(full_command)
-        self.process.stdin.flush()
-
-        output = ""
-        start_time = time.time()
-        
-        while True:
-            if time.time() - start_time > timeout:
-                self.process.kill()
-                return output + f"\n[Error: Command timed out after {timeout}s]"
-
-            # Non-blocking read
-            rlist, _, _ = select.select([self.process.stdout, self.process.stderr], [], [], 0.1)
-            if self.process.stdout in rlist:
-                line = self.process.stdout.readline()
-                if self.delimiter in line:
-                    output += line.replace(self.delimiter, "").strip()
+        return self.run(command, timeout).text
+
+    def run(self, command: str, timeout: float = 30.0) -> CommandResult:
+        """
+        Run *command* in the persistent shell and return its exit status,
+        bounded stdout and stderr, and wall and CPU time.
+
+        The shell echoes the delimiter on both stdout and stderr once the
+        command is done, followed by ``$?`` on stdout. CPU time and I/O are
+        the difference in the shell's own plus reaped children's counters;
+        peak RSS is sampled while the command runs.
+
+        On timeout, or once the command prints more than the output limit,
+        only its process group is killed and the shell carries on. If that
+        is not enough (or the shell exits), the standby shell takes over
+        with the last cwd and exported variables replayed.
+        """
+        if self.process.poll() is not None:
+            self._failover()
+        started = time.perf_counter()
+        pid = self.process.pid
+        limit_cpu(pid, self.limits.cpu_seconds)
+        meter = UsageMeter(pid, self.state.background_pgids())
+        self._send(command)
+        stdout, stderr = _Stream(self._new_capture()), _Stream(self._new_capture())
+        streams = {self.process.stdout.fileno(): stdout, self.process.stderr.fileno(): stderr}
+        deadline = time.monotonic() + timeout
+        max_output = self.limits.output_bytes
+        note, killed, timed_out, limit_exceeded = "", False, False, None
+        while not self._pump(streams, deadline, self.delimiter.encode(), meter, max_output):
+            if not killed:
+                if max_output is not None and stdout.capture.total + stderr.capture.total > max_output:
+                    limit_exceeded, message = "output", f"Command printed more than {max_output} bytes and was killed"
+                else:
+                    timed_out, message = True, f"Command timed out after {timeout}s"
+                max_output = None
+                if kill_foreground_job(pid, self.state.background_pgids()):
+                    killed = True
+                    note = f"\n[Error: {message}]"
+                    deadline = time.monotonic() + self.KILL_GRACE
+                    continue
+            result = build_result(
+                stdout.capture, stderr.capture, 128 + signal.SIGKILL, time.perf_counter() - started, None,
+                f"\n[Error: {message}; shell restarted with its working directory and environment restored]",
+                timed_out=timed_out,
+            )
+            meter.apply(result)
+            self._failover()
+            result.limit_exceeded = limit_exceeded
+            return result
+
+        meter.stop()
+        if stdout.trailer is None:  # EOF: the shell exited (e.g. `exit`)
+            returncode = self.process.wait()
+            if returncode < 0:  # killed by a signal
+                returncode = 128 - returncode
+            note += "\n[Shell exited; restarted with its working directory and environment restored]"
+        else:
+            returncode = int(stdout.trailer or 0)
+        if returncode == 128 + signal.SIGXCPU and self.limits.cpu_seconds:
+            limit_exceeded = "cpu"
+            note = f"\n[Error: Command used more than {self.limits.cpu_seconds}s of CPU time and was killed]" + note
+        result = build_result(stdout.capture, stderr.capture, returncode, time.perf_counter() - started, None,
+                              note, timed_out)
+        meter.apply(result)
+        if stdout.trailer is None:
+            self._failover()
+        result.limit_exceeded = limit_exceeded
+        return result
+
+    def get_cwd(self) -> str:
+        """Current directory of the shell (follows `cd`; Linux /proc, else workdir)."""
+        if self._process is None:  # not started yet, so still in workdir
+            return os.path.realpath(self.workdir)
+        try:
+            return os.readlink(f"/proc/{self.process.pid}/cwd")
+        except OSError:
+            return self.workdir
+
+    def run_isolated(self, command: str, timeout: float = 30.0) -> CommandResult:
+        """
+        Run *command* in a one-off bash in the shell's current directory.
+
+        Used for read-only commands that run concurrently with each other;
+        they see the persistent shell's cwd but not its unexported variables.
+        Usage comes from the one-off shell's rusage, which covers all of its
+        children.
+        """
+        started = time.perf_counter()
+        limits = self.limits.ulimit_command(cpu=True)
+        process = subprocess.Popen(
+            ["/bin/bash", "-c", f"{limits}\n{command}" if limits else command],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+            cwd=self.get_cwd(),
+        )
+        stdout, stderr = _Stream(self._new_capture()), _Stream(self._new_capture())
+        streams = {}
+        for pipe, stream in ((process.stdout, stdout), (process.stderr, stderr)):
+            os.set_blocking(pipe.fileno(), False)
+            streams[pipe.fileno()] = stream
+        usage = None
+        max_output = self.limits.output_bytes
+        try:
+            finished = self._pump(streams, time.monotonic() + timeout, max_output=max_output)
+            if not finished:
+                process.kill()
+            if hasattr(os, "wait4"):
+                _, status, usage = os.wait4(process.pid, 0)
+                process.returncode = os.waitstatus_to_exitcode(status)
+            returncode = process.wait()
+        finally:
+            process.stdout.close()
+            process.stderr.close()
+        if returncode < 0:  # killed by a signal
+            returncode = 128 - returncode
+        over_output = max_output is not None and stdout.capture.total + stderr.capture.total > max_output
+        limit_exceeded, note = None, ""
+        if over_output:
+            limit_exceeded, note = "output", f"\n[Error: Command printed more than {max_output} bytes and was killed]"
+        elif not finished:
+            note = f"\n[Error: Command timed out after {timeout}s]"
+        elif returncode == 128 + signal.SIGXCPU and self.limits.cpu_seconds:
+            limit_exceeded = "cpu"
+            note = f"\n[Error: Command used more than {self.limits.cpu_seconds}s of CPU time and was killed]"
+        result = build_result(stdout.capture, stderr.capture, returncode, time.perf_counter() - started, None,
+                              note, timed_out=not finished and not over_output)
+        if usage is not None:
+            result.cpu_seconds = usage.ru_utime + usage.ru_stime
+            result.peak_rss_bytes = usage.ru_maxrss * 1024  # KiB on Linux
+            result.read_bytes = usage.ru_inblock * 512
+            result.write_bytes = usage.ru_oublock * 512
+        result.limit_exceeded = limit_exceeded
+        return result
+
+    def close(self):
+        for process in (self._process, self._standby):
+            if process is not None and process.poll() is None:
+                process.terminate()
+                process.wait()
+        self.state.remove()
+
+
+class ShellPool:
+    """
+    A primary PersistentShell for stateful commands plus up to *size* - 1
+    worker shells for read-only ones, all in the same workspace.
+
+    Stateful commands (cd, export, writes) always run in the primary, one at
+    a time. Read-only commands go to an idle worker, started on first need;
+    before running, a worker replays the primary's cwd and exported
+    variables if the primary ran anything since the worker last synced.
+    When every worker is busy, callers queue for the next idle one.
+    """
+
+    def __init__(self, workdir="./workspace", size: int = 4, limits: ResourceLimits = None):
+        self.workdir = workdir
+        self.size = max(1, size)
+        self.limits = limits
+        self.primary = PersistentShell(workdir, limits=limits)
+        self._primary_lock = threading.Lock()
+        self._workers = []
+        self._idle = queue.LifoQueue()  # most recently used first
+        self._lock = threading.Lock()   # guards _workers and the counters below
+        self._generation = 0            # bumped by every primary command
+        self._synced = {}               # id(worker) -> generation it last replayed
+        self._started = time.monotonic()
+        self.runs = 0
+        self.active = 0
+        self.busy_seconds = 0.0
+        self.queued = 0                 # read-only calls that had to wait for a worker
+        self.queue_wait_seconds = 0.0
+        self.max_queue_wait_seconds = 0.0
+
+    def _timed(self, shell: PersistentShell, command: str, timeout: float) -> CommandResult:
+        started = time.perf_counter()
+        with self._lock:
+            self.active += 1
+        try:
+            return shell.run(command, timeout)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.runs += 1
+                self.busy_seconds += time.perf_counter() - started
+
+    def run(self, command: str, timeout: float = 30.0) -> CommandResult:
+        """Run a (possibly) state-changing command in the primary shell."""
+        with self._primary_lock:
+            try:
+                return self._timed(self.primary, command, timeout)
+            finally:
+                self._generation += 1
+
+    def _acquire(self) -> PersistentShell:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._workers) < self.size - 1:
+                worker = PersistentShell(self.workdir, self.primary.head_bytes, self.primary.tail_bytes,
+                                         standby=False, limits=self.limits)
+                self._workers.append(worker)
+                return worker
+            self.queued += 1
+        return self._idle.get()
+
+    def run_readonly(self, command: str, timeout: float = 30.0) -> CommandResult:
+        """Run a read-only command on an idle worker shell (the primary if the pool has size 1)."""
+        if self.size == 1:
+            return self.run(command, timeout)
+        waiting = time.perf_counter()
+        worker = self._acquire()
+        waited = time.perf_counter() - waiting
+        with self._lock:
+            self.queue_wait_seconds += waited
+            self.max_queue_wait_seconds = max(self.max_queue_wait_seconds, waited)
+        try:
+            with self._primary_lock:  # the state file is rewritten by every primary command
+                generation = self._generation
+                if self._synced.get(id(worker)) != generation:
+                    command = self.primary.state.replay_script() + command
+            result = self._timed(worker, command, timeout)
+            self._synced[id(worker)] = generation
+            return result
+        finally:
+            self._idle.put(worker)
+
+    def get_cwd(self) -> str:
+        return self.primary.get_cwd()
+
+    def replay_script(self) -> str:
+        """Script recreating the primary's exported variables and cwd in another bash."""
+        with self._primary_lock:
+            return self.primary.state.replay_script()
+
+    def stats(self) -> dict:
+        """Utilization since the pool was created, and time spent queueing for a worker."""
+        elapsed = time.monotonic() - self._started
+        with self._lock:
+            return {
+                "size": self.size,
+                "shells": 1 + len(self._workers),
+                "active": self.active,
+                "runs": self.runs,
+                "busy_seconds": self.busy_seconds,
+                "utilization": self.busy_seconds / (elapsed * self.size) if elapsed else 0.0,
+                "queued": self.queued,
+                "queue_wait_seconds": self.queue_wait_seconds,
+                "max_queue_wait_seconds": self.max_queue_wait_seconds,
+            }
+
+    def close(self):
+        self.primary.close()
+        for worker in self._workers:
+            worker.close()
+
+
+def parse_tool_calls(llm_response: str) -> list:
+    """
+    Extract every ``TOOL_CALL: {...}`` in *llm_response*, in order.
+
+    Each JSON object is decoded up to its own closing brace, so prose or
+    further tool calls after it do not corrupt it. Malformed calls are
+    skipped.
+    """
+    tool_calls = []
+    if "TOOL_CALL:" not in llm_response:
+        return tool_calls
+    text = llm_response.replace("\\'", "\"")
+    # strict=False allows unescaped control characters like literal newlines inside string values
+    decoder = json.JSONDecoder(strict=False)
+    marker = text.find("TOOL_CALL:")
+    while marker != -1:
+        body_start = marker + len("TOOL_CALL:")
+        next_marker = text.find("TOOL_CALL:", body_start)
+        start_idx = text.find("{", body_start)
+        if start_idx != -1 and (next_marker == -1 or start_idx < next_marker):
+            try:
+                tool_call, end_idx = decoder.raw_decode(text, start_idx)
+                if isinstance(tool_call, dict):
+                    tool_calls.append(tool_call)
+                next_marker = text.find("TOOL_CALL:", end_idx)
+            except json.JSONDecodeError as e:
+                print(f"JSON Decode Error: {e}")
+        marker = next_marker
+    return tool_calls
+
+
+def parse_tool_call(llm_response: str) -> dict | None:
+    tool_calls = parse_tool_calls(llm_response)
+    return tool_calls[0] if tool_calls else None
+
+
+class StreamingToolCallParser:
+    """
+    Detects complete ``TOOL_CALL: {...}`` objects in text that arrives in chunks.
+
+    feed() scans only the new characters, tracking brace depth outside JSON
+    strings, and returns each call as soon as its closing brace arrives —
+    without waiting for the rest of the response.
+    """
+
+    MARKER = "TOOL_CALL:"
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0          # next character to scan
+        self._start = None     # index of the opening brace of the current object
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        # strict=False allows unescaped control characters like literal newlines inside string values
+        self._decoder = json.JSONDecoder(strict=False)
+
+    def feed(self, chunk: str) -> list:
+        """Add *chunk* and return the tool calls completed by it, in order."""
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            if self._start is None:
+                marker = buffer.find(self.MARKER, self._pos)
+                if marker == -1:
+                    # Keep a possible partial marker at the end for the next chunk
+                    self._pos = max(self._pos, len(buffer) - len(self.MARKER) + 1)
                     break
-                output += line
-            if self.process.stderr in rlist:
-                line = self.process.stderr.readline()
-                if self.delimiter in line:
-                    output += line.replace(self.delimiter, "").strip()
+                brace = buffer.find("{", marker + len(self.MARKER))
+                if brace == -1:
+                    self._pos = marker
                     break
-                output += line
-
-            if self.process.poll() is not None: # Command finished
-                # Read any remaining output
-                stdout_remainder, stderr_remainder = self.process.communicate(timeout=0.1)
-                output += stdout_remainder + stderr_remainder
-                if self.delimiter in output:
-                    output = output.replace(self.delimiter, "").strip()
-                break
+                self._start, self._pos = brace, brace
+                self._depth, self._in_string, self._escaped = 0, False, False
 
-        return output.strip()
+            char = buffer[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    json_str = buffer[self._start:self._pos].replace("\\'", "\"")
+                    self._start = None
+                    try:
+                        tool_call = self._decoder.decode(json_str)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(tool_call, dict):
+                        completed.append(tool_call)
+        return completed
 
-    def close(self):
-        if self.process.poll() is None:
-            self.process.terminate()
-            self.process.wait()
 
 class ToolExecutor:
-    def __init__(self, safety_guardrail: SafetyGuardrail):
-        self.shell = PersistentShell()
+    def __init__(self, safety_guardrail: SafetyGuardrail, max_workers: int = 8, pool_size: int = 4,
+                 workdir="./workspace", limits: ResourceLimits = None):
+        # Applied to every execute_bash command, and to each process of a background job
+        self.limits = limits or ResourceLimits.from_env()
+        self.pool = ShellPool(workdir, size=pool_size, limits=self.limits)
+        self.shell = self.pool.primary  # the shell carrying the session's cwd and environment
         self.safety_guardrail = safety_guardrail
+        self.max_workers = max_workers
+        self._pool = None
+        # Per-program totals of calls, failures, wall/CPU time, output and I/O bytes, peak RSS
+        self.command_stats = {}
+        self.result_cache = ToolResultCache(workdir)
+        self.jobs = JobManager(workdir, max_output_bytes=self.limits.output_bytes)
+
+    def execute_tool(self, tool_name: str, args: str, timeout: float = None) -> dict:
+        """
+        Run one tool call. *timeout* is the time left in the turn: it bounds
+        job_wait and, capped at COMMAND_TIMEOUT, execute_bash commands.
+        """
+        return self._execute_tool(tool_name, args, timeout=timeout)
 
-    def execute_tool(self, tool_name: str, args: str) -> dict:
+    def _execute_tool(self, tool_name: str, args: str, isolated: bool = False, timeout: float = None) -> dict:
         if tool_name == "execute_bash":
+            command_timeout = COMMAND_TIMEOUT if timeout is None else max(0.0, min(timeout, COMMAND_TIMEOUT))
             is_safe, message = self.safety_guardrail.is_safe(args)
             if not is_safe:
                 return {"output": f"Guardrail blocked command: {message}", "returncode": 1}
-            result = self.shell.execute(args)
-            return {"output": result, "returncode": 0} # Assuming 0 for now, can parse later
+            read_only = isolated or self.safety_guardrail.is_read_only(args)
+            # Fingerprint before running, so changes made meanwhile make the entry stale
+            key = self.result_cache.key(args, self.pool.get_cwd()) if read_only else None
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return cached
+            if isolated:
+                result = self.pool.run_readonly(args, command_timeout).as_tool_result()
+            else:
+                result = self.pool.run(args, command_timeout).as_tool_result()
+            record_command_stats(self.command_stats, args, result)
+            if read_only:
+                self.result_cache.put(key, result)
+            else:
+                self.result_cache.invalidate()
+            return result
+        elif tool_name in FILE_TOOLS:
+            result = run_file_tool(tool_name, args, self.pool.get_cwd(), workspace=self.pool.workdir,
+                                   guardrail=self.safety_guardrail)
+            record_command_stats(self.command_stats, tool_name, result)
+            if tool_name not in READ_ONLY_FILE_TOOLS:
+                self.result_cache.invalidate()
+            return result
+        elif tool_name in JOB_TOOLS:
+            return self._execute_job_tool(tool_name, args, timeout)
         else:
             return {"output": f"Unknown tool: {tool_name}", "returncode": 1}
 
+    def _execute_job_tool(self, tool_name: str, args, timeout: float = None) -> dict:
+        kwargs = job_tool_arguments(tool_name, args)
+        if kwargs is None:
+            return {"output": f"Error: {tool_name} expects a JSON object of arguments, got {args!r}", "returncode": 1}
+        if tool_name == "job_start":
+            command = kwargs.get("command")
+            if not command:
+                return {"output": "Error: job_start needs a command", "returncode": 1}
+            is_safe, message = self.safety_guardrail.is_safe(command)
+            if not is_safe:
+                return {"output": f"Guardrail blocked command: {message}", "returncode": 1}
+            # The job runs with the primary shell's cwd and exported variables
+            self.result_cache.invalidate()
+            prelude = self.pool.replay_script() + self.limits.ulimit_command(cpu=True) + "\n"
+            return self.jobs.start(command, self.pool.get_cwd(), prelude)
+        try:
+            if tool_name == "job_wait" and timeout is not None:
+                # BackgroundJobs.wait() caps it at MAX_JOB_WAIT_SECONDS
+                kwargs["timeout"] = max(0.0, min(float(kwargs.get("timeout", COMMAND_TIMEOUT)), timeout))
+            return getattr(self.jobs, JOB_TOOLS[tool_name][0])(**kwargs)
+        except (TypeError, ValueError) as e:
+            return {"output": f"Error: bad arguments for {tool_name}: {e}", "returncode": 1}
+
+    def is_independent(self, tool_name: str, args) -> bool:
+        """True if the call only reads state and may run alongside other such calls."""
+        if tool_name in READ_ONLY_TOOLS:
+            return True
+        return (tool_name == "execute_bash" and isinstance(args, str)
+                and self.safety_guardrail.is_read_only(args))
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+        return self._pool
+
+    def submit_tool(self, tool_name: str, args) -> Future:
+        """
+        Start an independent (read-only) call on the worker pool and return its
+        Future, e.g. while the LLM is still streaming the rest of its response.
+        """
+        if not self.is_independent(tool_name, args):
+            raise ValueError(f"Only read-only calls can be submitted early: {args!r}")
+        return self._get_pool().submit(self._execute_tool, tool_name, args, True)
+
+    def execute_tools(self, tool_calls: list, timeout: float = None) -> list:
+        """
+        Execute several ``(tool_name, args)`` calls and return their results in order.
+        *timeout* applies to each call, as in execute_tool().
+
+        Consecutive read-only calls run concurrently on the shell pool's
+        workers; anything else runs alone, in order, in the primary shell so
+        state changes (cd, export, writes) apply in sequence.
+        Once a call fails, the calls after it are skipped (skipped_result(),
+        see is_batch_failure()).
+        """
+        results = [None] * len(tool_calls)
+        batch = []
+
+        def flush() -> bool:
+            """Run the pending read-only calls; True if any of them failed."""
+            if len(batch) == 1:
+                index = batch[0]
+                results[index] = self._execute_tool(*tool_calls[index], timeout=timeout)
+            elif batch:
+                futures = [(index, self._get_pool().submit(self._execute_tool, *tool_calls[index], True, timeout))
+                           for index in batch]
+                for index, future in futures:
+                    results[index] = future.result()
+            failed = any(is_batch_failure(*tool_calls[index], results[index]) for index in batch)
+            batch.clear()
+            return failed
+
+        for index, (tool_name, args) in enumerate(tool_calls):
+            if self.is_independent(tool_name, args):
+                batch.append(index)
+                continue
+            if flush():
+                break
+            results[index] = self._execute_tool(tool_name, args, timeout=timeout)
+            if is_batch_failure(tool_name, args, results[index]):
+                break
+        else:
+            flush()
+        return [result or skipped_result() for result in results]
+
+    def usage(self) -> dict:
+        """Resource totals of every tool call so far in this session."""
+        return session_usage(self.command_stats)
+
+    def parse_tool_calls(self, llm_response: str) -> list:
+        return parse_tool_calls(llm_response)
+
     def parse_tool_call(self, llm_response: str) -> dict | None:
-        if "TOOL_CALL:" in llm_response:
-            try:
-                # Extract the JSON part using string manipulation
-                tool_call_str = llm_response.split("TOOL_CALL:", 1)[1].strip()
-                # Find the first { and the last } in the remaining string
-                start_idx = tool_call_str.find('{')
-                end_idx = tool_call_str.rfind('}')
-                
-                if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                    json_str = tool_call_str[start_idx:end_idx+1]
-                    # strict=False allows unescaped control characters like literal newlines inside string values
-                    tool_call = json.loads(json_str.replace("\\'", "\""), strict=False)
-                    return tool_call
-            except json.JSONDecodeError as e:
-                print(f"JSON Decode Error: {e}")
-                return None
-            except Exception as e:
-                print(f"Error parsing tool call: {e}")
-                return None
-        return None
+        return parse_tool_call(llm_response)
+
+    def close(self):
+        if hasattr(self, 'jobs'):
+            self.jobs.close()
+        if hasattr(self, 'pool'):
+            self.pool.close()
+        if getattr(self, '_pool', None) is not None:
+            self._pool.shutdown(wait=False)
 
     def __del__(self):
-        if hasattr(self, 'shell'):
-            self.shell.close()
+        self.close()
@@ -1,8 +1,9 @@
 """Tests for AgenticLoopExecutor."""
 import sys
 import os
+import json
 import unittest
-from unittest.mock import MagicMock, call
+from unittest.mock import ANY, MagicMock, call, patch
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
@@ -20,9 +21,11 @@ class TestAgenticLoopExecutor(unittest.TestCase):
         mock_adapter.generate_response.side_effect = llm_responses
 
         mock_tool_executor = MagicMock()
-        # parse_tool_call: delegate to real logic for realism, but we
+        # parse_tool_calls: delegate to real logic for realism, but we
         # control it via side_effect below when needed.
-        mock_tool_executor.parse_tool_call.side_effect = self._default_parse
+        mock_tool_executor.parse_tool_calls.side_effect = self._default_parse_all
+        # Nothing is dispatched early unless a test opts in
+        mock_tool_executor.is_independent.return_value = False
 
         return AgenticLoopExecutor(mock_adapter, mock_tool_executor)
 
@@ -37,6 +40,12 @@ class TestAgenticLoopExecutor(unittest.TestCase):
                 return None
         return None
 
+    @classmethod
+    def _default_parse_all(cls, response: str):
+        """One call per line, parsed like _default_parse."""
+        calls = [cls._default_parse(line) for line in response.splitlines()]
+        return [c for c in calls if c]
+
     # ── Test 1: Plain text response ────────────────────────────────────
     def test_plain_response(self):
         executor = self._make_executor(["Here is your answer."])
@@ -54,7 +63,7 @@ class TestAgenticLoopExecutor(unittest.TestCase):
 
         result = executor.run_agentic_loop([{"role": "user", "content": "list files"}])
         self.assertEqual(result, "Found 3 files.")
-        executor.tool_executor.execute_tool.assert_called_once_with("execute_bash", "ls")
+        executor.tool_executor.execute_tool.assert_called_once_with("execute_bash", "ls", timeout=ANY)
 
     # ── Test 3: System prompt injected ─────────────────────────────────
     def test_system_prompt_injected(self):
@@ -90,12 +99,253 @@ class TestAgenticLoopExecutor(unittest.TestCase):
 
     # ── Test 6: Unknown tool → error string ────────────────────────────
     def test_unknown_tool_error(self):
-        bad_call = 'TOOL_CALL: {"tool_name": "write_file", "args": "data"}'
+        bad_call = 'TOOL_CALL: {"tool_name": "launch_rocket", "args": "data"}'
         executor = self._make_executor([bad_call])
         result = executor.run_agentic_loop([{"role": "user", "content": "go"}])
         self.assertIn("Error", result)
         self.assertIn("Unknown tool", result)
 
+    # ── Test 7: on_message sees every appended message ─────────────────
+    def test_on_message_callback(self):
+        tool_call = 'TOOL_CALL: {"tool_name": "execute_bash", "args": "ls"}'
+        executor = self._make_executor([tool_call, "done"])
+        executor.tool_executor.execute_tool.return_value = {"output": "a", "returncode": 0}
+        recorded = []
+
+        executor.run_agentic_loop(
+            [{"role": "user", "content": "go"}],
+            on_message=lambda role, content: recorded.append(role),
+        )
+        self.assertEqual(recorded, ["assistant", "tool_output"])
+
+
+    # ── Test 8: summarize() folds turns via the adapter ────────────────
+    def test_summarize(self):
+        executor = self._make_executor(["new summary"])
+        result = executor.summarize("old", [{"role": "user", "content": "did X"}], model="m")
+        self.assertEqual(result, "new summary")
+        prompt = executor.llm_adapter.generate_response.call_args.kwargs["messages"][0]["content"]
+        self.assertIn("old", prompt)
+        self.assertIn("did X", prompt)
+
+    # ── Test 9: summarize() reports adapter errors as None ─────────────
+    def test_summarize_error(self):
+        executor = self._make_executor(["Error communicating with OpenAI-compatible API: boom"])
+        self.assertIsNone(executor.summarize(None, [{"role": "user", "content": "x"}]))
+
+
+    # ── Test 10: Step limit stops a tool-call loop ─────────────────────
+    def test_step_limit(self):
+        tool_call = 'TOOL_CALL: {"tool_name": "execute_bash", "args": "ls"}'
+        executor = self._make_executor([tool_call] * 5)
+        executor.tool_executor.execute_tool.return_value = {"output": "", "returncode": 0}
+        result = executor.run_agentic_loop([{"role": "user", "content": "go"}], max_steps=3)
+        self.assertIn("Step limit of 3", result)
+        self.assertEqual(executor.llm_adapter.generate_response.call_count, 3)
+
+    # ── Test 11: Long tool chains do not grow the Python stack ─────────
+    def test_many_steps_iterative(self):
+        tool_call = 'TOOL_CALL: {"tool_name": "execute_bash", "args": "ls"}'
+        steps = sys.getrecursionlimit() + 10
+        executor = self._make_executor([tool_call] * steps + ["done"])
+        executor.tool_executor.execute_tool.return_value = {"output": "", "returncode": 0}
+        with patch("builtins.print"):
+            result = executor.run_agentic_loop([{"role": "user", "content": "go"}], max_steps=steps + 1)
+        self.assertEqual(result, "done")
+
+    # ── Test 12: Turn deadline checked between steps ───────────────────
+    def test_turn_deadline(self):
+        tool_call = 'TOOL_CALL: {"tool_name": "execute_bash", "args": "ls"}'
+        executor = self._make_executor([tool_call, "never"])
+        executor.tool_executor.execute_tool.return_value = {"output": "", "returncode": 0}
+        with patch("agentic_loop.agentic_loop_executor.time.monotonic", side_effect=[0.0, 1.0, 2.0, 100.0]):
+            result = executor.run_agentic_loop([{"role": "user", "content": "go"}], turn_timeout=10)
+        self.assertIn("deadline", result)
+        self.assertEqual(executor.llm_adapter.generate_response.call_count, 1)
+
+    # ── Test 13: Timeline records every step ───────────────────────────
+    def test_timeline_recorded(self):
+        tool_call = 'TOOL_CALL: {"tool_name": "execute_bash", "args": "ls"}'
+        executor = self._make_executor([tool_call, "done"])
+        executor.tool_executor.execute_tool.return_value = {"output": "abc", "returncode": 0}
+        executor.run_agentic_loop([{"role": "user", "content": "go"}])
+
+        timeline = executor.last_timeline
+        self.assertEqual([t.step for t in timeline], [1, 2])
+        self.assertEqual(timeline[0].tool_name, "execute_bash")
+        self.assertEqual(timeline[0].bytes_out, len(tool_call))
+        self.assertGreater(timeline[0].tool_output_bytes, 0)
+        self.assertGreater(timeline[1].bytes_in, timeline[0].bytes_in)
+        self.assertIsNone(timeline[1].tool_name)
+
+
+    # ── Test 14: Several tool calls in one response run as a batch ─────
+    def test_multiple_tool_calls(self):
+        response = ('TOOL_CALL: {"tool_name": "execute_bash", "args": "cat a"}\n'
+                    'TOOL_CALL: {"tool_name": "execute_bash", "args": "cat b"}')
+        executor = self._make_executor([response, "both read"])
+        executor.tool_executor.execute_tools.return_value = [
+            {"output": "A", "returncode": 0}, {"output": "B", "returncode": 0},
+        ]
+        msgs = [{"role": "user", "content": "read a and b"}]
+        with patch("builtins.print"):
+            result = executor.run_agentic_loop(msgs)
+
+        self.assertEqual(result, "both read")
+        executor.tool_executor.execute_tools.assert_called_once_with(
+            [("execute_bash", "cat a"), ("execute_bash", "cat b")], timeout=ANY
+        )
+        outputs = [json.loads(m["content"]) for m in msgs if m["role"] == "tool_output"]
+        self.assertEqual([(o["args"], o["output"]) for o in outputs], [("cat a", "A"), ("cat b", "B")])
+        self.assertEqual(executor.last_timeline[0].tool_calls, 2)
+        self.assertEqual(executor.llm_adapter.generate_response.call_count, 2)
+
+
+    # ── Test 15: on_token streams every step's deltas ──────────────────
+    def test_streaming_on_token(self):
+        executor = self._make_executor([])
+        executor.llm_adapter.stream_response.side_effect = [
+            iter(['TOOL_CALL: {"tool_name": ', '"execute_bash", "args": "ls"}']),
+            iter(["Found ", "it."]),
+        ]
+        executor.tool_executor.execute_tool.return_value = {"output": "a", "returncode": 0}
+        tokens = []
+        with patch("builtins.print"):
+            result = executor.run_agentic_loop([{"role": "user", "content": "go"}], on_token=tokens.append)
+
+        self.assertEqual(result, "Found it.")
+        self.assertEqual(tokens[-2:], ["Found ", "it."])
+        executor.llm_adapter.generate_response.assert_not_called()
+        self.assertIsNotNone(executor.last_timeline[1].first_token_seconds)
+
+
+    # ── Test 16: Read-only call starts before the stream finishes ──────
+    def test_early_dispatch_while_streaming(self):
+        from concurrent.futures import Future
+        executor = self._make_executor([])
+        events = []
+        done = Future()
+        done.set_result({"output": "A", "returncode": 0})
+
+        def submit(name, args):
+            events.append(("submit", args))
+            return done
+
+        def stream(**kwargs):
+            yield 'TOOL_CALL: {"tool_name": "execute_bash", "args": "cat a"}'
+            events.append(("trailing prose",))
+            yield "\nLet me check that file."
+
+        executor.tool_executor.is_independent.return_value = True
+        executor.tool_executor.submit_tool.side_effect = submit
+        executor.llm_adapter.stream_response.side_effect = [stream(), iter(["ok"])]
+        with patch("builtins.print"):
+            result = executor.run_agentic_loop([{"role": "user", "content": "go"}], on_token=lambda t: None)
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(events, [("submit", "cat a"), ("trailing prose",)])
+        executor.tool_executor.execute_tool.assert_not_called()
+        self.assertEqual(executor.last_timeline[0].early_tool_calls, 1)
+
+    # ── Test 17: Nothing after a state-changing call runs early ────────
+    def test_no_early_dispatch_after_mutating_call(self):
+        executor = self._make_executor([])
+        executor.tool_executor.is_independent.side_effect = lambda name, args: args.startswith("cat")
+        executor.llm_adapter.stream_response.side_effect = [
+            iter(['TOOL_CALL: {"tool_name": "execute_bash", "args": "cd sub"}\n',
+                  'TOOL_CALL: {"tool_name": "execute_bash", "args": "cat a"}']),
+            iter(["ok"]),
+        ]
+        executor.tool_executor.execute_tools.return_value = [
+            {"output": "", "returncode": 0}, {"output": "A", "returncode": 0},
+        ]
+        with patch("builtins.print"):
+            executor.run_agentic_loop([{"role": "user", "content": "go"}], on_token=lambda t: None)
+
+        executor.tool_executor.submit_tool.assert_not_called()
+        executor.tool_executor.execute_tools.assert_called_once_with(
+            [("execute_bash", "cd sub"), ("execute_bash", "cat a")], timeout=ANY
+        )
+
+    # ── Test 18: Provider cache usage lands in the timeline ────────────
+    def test_usage_in_timeline(self):
+        executor = self._make_executor(["done"])
+        executor.llm_adapter.last_usage = {"input_tokens": 1200, "output_tokens": 3,
+                                           "cache_read_tokens": 1024, "cache_write_tokens": 0}
+        executor.run_agentic_loop([{"role": "user", "content": "Hi"}])
+        timing = executor.last_timeline[0]
+        self.assertEqual((timing.input_tokens, timing.cache_read_tokens), (1200, 1024))
+
+    # ── Test 19: Calls after a failed one are skipped ──────────────────
+    def test_failure_skips_remaining_calls(self):
+        from concurrent.futures import Future
+        executor = self._make_executor([])
+        failed = Future()
+        failed.set_result({"output": "", "stderr": "No such file", "returncode": 1})
+        executor.tool_executor.is_independent.side_effect = lambda name, args: args.startswith("cat")
+        executor.tool_executor.submit_tool.return_value = failed
+        executor.llm_adapter.stream_response.side_effect = [
+            iter(['TOOL_CALL: {"tool_name": "execute_bash", "args": "cat missing"}\n',
+                  'TOOL_CALL: {"tool_name": "execute_bash", "args": "rm missing"}']),
+            iter(["ok"]),
+        ]
+        messages = [{"role": "user", "content": "go"}]
+        with patch("builtins.print"):
+            executor.run_agentic_loop(messages, on_token=lambda t: None)
+
+        executor.tool_executor.execute_tool.assert_not_called()
+        executor.tool_executor.execute_tools.assert_not_called()
+        outputs = [json.loads(m["content"]) for m in messages if m["role"] == "tool_output"]
+        self.assertEqual([o["returncode"] for o in outputs], [1, None])
+        self.assertTrue(outputs[1]["skipped"])
+        timing = executor.last_timeline[0]
+        self.assertEqual((timing.failed_tool_calls, timing.skipped_tool_calls), (1, 1))
+
+
+    # ── Test 20: Native file tools pass validation ─────────────────────
+    def test_file_tool_call(self):
+        read_call = 'TOOL_CALL: {"tool_name": "read_file", "args": {"path": "a.txt", "start_line": 2}}'
+        executor = self._make_executor([read_call, 'TOOL_CALL: {"tool_name": "list_dir", "args": {}}', "done"])
+        executor.tool_executor.execute_tool.return_value = {"output": "x", "returncode": 0}
+        with patch("builtins.print"):
+            result = executor.run_agentic_loop([{"role": "user", "content": "go"}])
+        self.assertEqual(result, "done")
+        executor.tool_executor.execute_tool.assert_has_calls([
+            call("read_file", {"path": "a.txt", "start_line": 2}, timeout=ANY), call("list_dir", {}, timeout=ANY),
+        ])
+
+    # ── Test 21: A slow stream is abandoned at the turn deadline ───────
+    def test_slow_stream_stops_at_deadline(self):
+        import time
+        closed = []
+
+        class SlowAdapter:
+            def stream_response(self, messages, model=None):
+                try:
+                    while True:
+                        time.sleep(0.02)
+                        yield "thinking "
+                finally:
+                    closed.append(True)
+
+        executor = AgenticLoopExecutor(SlowAdapter(), MagicMock())
+        started = time.monotonic()
+        result = executor.run_agentic_loop([{"role": "user", "content": "go"}], turn_timeout=0.2,
+                                           on_token=lambda t: None)
+        self.assertIn("deadline", result)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(closed, [True])
+
+    # ── Test 22: Tool calls get only the time left in the turn ─────────
+    def test_tool_timeout_capped_by_deadline(self):
+        tool_call = 'TOOL_CALL: {"tool_name": "execute_bash", "args": "sleep 100"}'
+        executor = self._make_executor([tool_call, "done"])
+        executor.tool_executor.execute_tool.return_value = {"output": "", "returncode": 0}
+        with patch("agentic_loop.agentic_loop_executor.time.monotonic", side_effect=[0.0, 1.0, 7.5, 8.0]), \
+                patch("builtins.print"):
+            executor.run_agentic_loop([{"role": "user", "content": "go"}], turn_timeout=10)
+        executor.tool_executor.execute_tool.assert_called_once_with("execute_bash", "sleep 100", timeout=2.5)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -2,11 +2,11 @@
 import sys
 import os
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from llm_adapters.anthropic_compatible_adapter import AnthropicCompatibleAdapter
+from llm_adapters.anthropic_compatible_adapter import AnthropicCompatibleAdapter, AsyncAnthropicCompatibleAdapter
 
 
 class TestNormalizeMessages(unittest.TestCase):
@@ -131,5 +131,128 @@ class TestGenerateResponse(unittest.TestCase):
         self.assertIn("timeout", result)
 
 
+class TestStreamResponse(unittest.TestCase):
+    """Tests for stream_response (API is mocked)."""
+
+    # ── Test 11: Deltas yielded from the text stream ───────────────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.Anthropic")
+    def test_stream_yields_deltas(self, MockAnthropic):
+        mock_client = MockAnthropic.return_value
+        stream = mock_client.messages.stream.return_value.__enter__.return_value
+        stream.text_stream = iter(["Hel", "", "lo"])
+
+        adapter = AnthropicCompatibleAdapter(api_key="fake")
+        deltas = list(adapter.stream_response([
+            {"role": "system", "content": "Be concise"},
+            {"role": "user", "content": "Hi"},
+        ], model="claude-sonnet-4-20250514"))
+        self.assertEqual(deltas, ["Hel", "lo"])
+        self.assertEqual(mock_client.messages.stream.call_args.kwargs["system"], "Be concise")
+
+    # ── Test 12: Streaming rejected → blocking fallback ────────────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.Anthropic")
+    def test_stream_falls_back_to_generate(self, MockAnthropic):
+        mock_client = MockAnthropic.return_value
+        mock_client.messages.stream.side_effect = Exception("no SSE")
+        mock_block = MagicMock()
+        mock_block.text = "whole answer"
+        mock_client.messages.create.return_value.content = [mock_block]
+
+        adapter = AnthropicCompatibleAdapter(api_key="fake")
+        self.assertEqual(list(adapter.stream_response([{"role": "user", "content": "Hi"}])),
+                         ["whole answer"])
+
+    # ── Test 13: No user messages → error chunk ────────────────────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.Anthropic")
+    def test_stream_no_messages(self, MockAnthropic):
+        adapter = AnthropicCompatibleAdapter(api_key="fake")
+        self.assertEqual(list(adapter.stream_response([])), ["Error: No user messages found."])
+
+
+class TestPromptCaching(unittest.TestCase):
+    """cache_control markers and usage reporting (API is mocked)."""
+
+    def _adapter(self, MockAnthropic, prompt_caching=True):
+        mock_client = MockAnthropic.return_value
+        response = mock_client.messages.create.return_value
+        response.content = [MagicMock(text="ok")]
+        response.usage = MagicMock(input_tokens=10, output_tokens=5,
+                                   cache_read_input_tokens=900, cache_creation_input_tokens=90)
+        return AnthropicCompatibleAdapter(api_key="fake", prompt_caching=prompt_caching), mock_client
+
+    # ── Test 14: System prompt and stable prefix marked cacheable ──────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.Anthropic")
+    def test_cache_breakpoints(self, MockAnthropic):
+        adapter, mock_client = self._adapter(MockAnthropic)
+        adapter.generate_response([
+            {"role": "system", "content": "sys"},
+            {"role": "user", "content": "u1"},
+            {"role": "assistant", "content": "a1"},
+            {"role": "user", "content": "u2"},
+            {"role": "assistant", "content": "a2"},
+            {"role": "tool_output", "content": "out"},
+        ])
+        kwargs = mock_client.messages.create.call_args.kwargs
+        self.assertEqual(kwargs["system"], [{"type": "text", "text": "sys", "cache_control": {"type": "ephemeral"}}])
+        marked = [i for i, m in enumerate(kwargs["messages"]) if isinstance(m["content"], list)]
+        self.assertEqual(marked, [2, 4])  # previous user turn and the newest message
+        self.assertEqual(kwargs["messages"][4]["content"][0]["text"], "[Tool Output]:\nout")
+        self.assertEqual(kwargs["messages"][0], {"role": "user", "content": "u1"})
+
+    # ── Test 15: Caching off leaves the request untouched ──────────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.Anthropic")
+    def test_caching_disabled(self, MockAnthropic):
+        adapter, mock_client = self._adapter(MockAnthropic, prompt_caching=False)
+        adapter.generate_response([{"role": "system", "content": "sys"}, {"role": "user", "content": "u1"}])
+        kwargs = mock_client.messages.create.call_args.kwargs
+        self.assertEqual(kwargs["system"], "sys")
+        self.assertEqual(kwargs["messages"], [{"role": "user", "content": "u1"}])
+
+    # ── Test 16: Cache hits and writes reported from usage ─────────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.Anthropic")
+    def test_usage_reported(self, MockAnthropic):
+        adapter, _ = self._adapter(MockAnthropic)
+        adapter.generate_response([{"role": "user", "content": "Hi"}])
+        adapter.generate_response([{"role": "user", "content": "Hi"}])
+        self.assertEqual(adapter.last_usage, {"input_tokens": 1000, "output_tokens": 5,
+                                              "cache_read_tokens": 900, "cache_write_tokens": 90})
+        self.assertEqual(adapter.usage_totals["cache_read_tokens"], 1800)
+
+
+class TestAsyncAdapter(unittest.IsolatedAsyncioTestCase):
+    """Tests for AsyncAnthropicCompatibleAdapter (API is mocked)."""
+
+    # ── Test 17: Awaitable generate_response on AsyncAnthropic ─────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.AsyncAnthropic")
+    async def test_async_generate(self, MockAsyncAnthropic):
+        mock_client = MockAsyncAnthropic.return_value
+        mock_block = MagicMock()
+        mock_block.text = "async hello"
+        mock_client.messages.create = AsyncMock(return_value=MagicMock(content=[mock_block]))
+
+        adapter = AsyncAnthropicCompatibleAdapter(api_key="fake")
+        result = await adapter.generate_response([
+            {"role": "system", "content": "Be concise"},
+            {"role": "user", "content": "Hi"},
+        ], model="claude-sonnet-4-20250514")
+        self.assertEqual(result, "async hello")
+        self.assertEqual(mock_client.messages.create.call_args.kwargs["system"], "Be concise")
+
+    # ── Test 18: Async stream yields deltas ────────────────────────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.AsyncAnthropic")
+    async def test_async_stream(self, MockAsyncAnthropic):
+        async def text_stream():
+            for text in ("Hel", "", "lo"):
+                yield text
+
+        mock_client = MockAsyncAnthropic.return_value
+        stream = mock_client.messages.stream.return_value.__aenter__.return_value
+        stream.text_stream = text_stream()
+
+        adapter = AsyncAnthropicCompatibleAdapter(api_key="fake")
+        deltas = [d async for d in adapter.stream_response([{"role": "user", "content": "Hi"}])]
+        self.assertEqual(deltas, ["Hel", "lo"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,155 @@
+"""Tests for AsyncAgenticLoopExecutor (adapter and tool executor are mocked)."""
+import sys
+import os
+import asyncio
+import json
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from agentic_loop.async_agentic_loop_executor import AsyncAgenticLoopExecutor
+from tool_executor.tool_executor import parse_tool_calls
+
+TOOL_CALL = 'TOOL_CALL: {{"tool_name": "execute_bash", "args": "{}"}}'
+
+
+class TestAsyncAgenticLoopExecutor(unittest.IsolatedAsyncioTestCase):
+
+    def _make_executor(self, llm_responses, **kwargs):
+        mock_adapter = MagicMock(spec=["generate_response"])
+        mock_adapter.generate_response = AsyncMock(side_effect=llm_responses)
+
+        mock_tool_executor = MagicMock()
+        mock_tool_executor.parse_tool_calls.side_effect = parse_tool_calls
+        mock_tool_executor.is_independent.return_value = False
+        mock_tool_executor.execute_tool = AsyncMock(return_value={"output": "ok", "returncode": 0})
+        mock_tool_executor.execute_tools = AsyncMock()
+        return AsyncAgenticLoopExecutor(mock_adapter, mock_tool_executor, **kwargs)
+
+    # ── Test 1: Plain text response ────────────────────────────────────
+    async def test_plain_response(self):
+        executor = self._make_executor(["Here is your answer."])
+        result = await executor.run_agentic_loop([{"role": "user", "content": "Hi"}])
+        self.assertEqual(result, "Here is your answer.")
+        executor.tool_executor.execute_tool.assert_not_called()
+
+    # ── Test 2: Tool call → then plain response ────────────────────────
+    async def test_tool_call_then_response(self):
+        executor = self._make_executor([TOOL_CALL.format("ls"), "Found 3 files."])
+        messages = [{"role": "user", "content": "List files"}]
+        persisted = []
+        result = await executor.run_agentic_loop(messages, model="m", on_message=lambda r, c: persisted.append(r))
+
+        self.assertEqual(result, "Found 3 files.")
+        executor.tool_executor.execute_tool.assert_awaited_once_with("execute_bash", "ls")
+        self.assertEqual(persisted, ["assistant", "tool_output"])
+        self.assertEqual(json.loads(messages[-1]["content"])["output"], "ok")
+        self.assertEqual(executor.llm_adapter.generate_response.call_args.kwargs["model"], "m")
+
+    # ── Test 3: System prompt inserted once ────────────────────────────
+    async def test_system_prompt_inserted(self):
+        executor = self._make_executor(["done"])
+        messages = [{"role": "user", "content": "Hi"}]
+        await executor.run_agentic_loop(messages)
+        self.assertEqual(messages[0]["role"], "system")
+        self.assertIn("AI assistant", messages[0]["content"])
+
+    # ── Test 4: Several calls go through execute_tools, labelled ───────
+    async def test_multiple_calls(self):
+        executor = self._make_executor([TOOL_CALL.format("cat a") + "\n" + TOOL_CALL.format("cat b"), "done"])
+        executor.tool_executor.execute_tools.return_value = [
+            {"output": "A", "returncode": 0}, {"output": "B", "returncode": 0},
+        ]
+        messages = [{"role": "user", "content": "Read"}]
+        await executor.run_agentic_loop(messages)
+        outputs = [json.loads(m["content"]) for m in messages if m["role"] == "tool_output"]
+        self.assertEqual([(o["args"], o["output"]) for o in outputs], [("cat a", "A"), ("cat b", "B")])
+
+    # ── Test 5: Unknown tool ───────────────────────────────────────────
+    async def test_unknown_tool(self):
+        executor = self._make_executor(['TOOL_CALL: {"tool_name": "fly", "args": "x"}'])
+        result = await executor.run_agentic_loop([{"role": "user", "content": "Hi"}])
+        self.assertIn("Unknown tool", result)
+
+    # ── Test 6: Step limit ─────────────────────────────────────────────
+    async def test_step_limit(self):
+        executor = self._make_executor([TOOL_CALL.format("ls")] * 3, max_steps=3)
+        result = await executor.run_agentic_loop([{"role": "user", "content": "Loop"}])
+        self.assertEqual(result, "Error: Step limit of 3 reached without a final answer.")
+        self.assertEqual(len(executor.last_timeline), 3)
+
+    # ── Test 7: Deadline cancels a slow LLM call ───────────────────────
+    async def test_turn_deadline(self):
+        executor = self._make_executor([])
+
+        async def slow(**kwargs):
+            await asyncio.sleep(5)
+
+        executor.llm_adapter.generate_response = AsyncMock(side_effect=slow)
+        result = await executor.run_agentic_loop([{"role": "user", "content": "Hi"}], turn_timeout=0.1)
+        self.assertEqual(result, "Error: Turn deadline of 0.1s exceeded after 0 steps.")
+
+    # ── Test 8: Streaming with early dispatch of read-only calls ───────
+    async def test_streaming_early_dispatch(self):
+        executor = self._make_executor([])
+
+        async def stream(**kwargs):
+            for chunk in ['TOOL_CALL: {"tool_name": "execute_bash", ', '"args": "ls"}', "\n"]:
+                yield chunk
+
+        responses = iter([stream, None])
+
+        def stream_response(**kwargs):
+            current = next(responses)
+            if current is None:
+                async def final():
+                    yield "All done."
+                return final()
+            return current(**kwargs)
+
+        executor.llm_adapter.stream_response = stream_response
+        executor.tool_executor.is_independent.return_value = True
+
+        async def early():
+            return {"output": "early", "returncode": 0}
+
+        executor.tool_executor.submit_tool.side_effect = lambda *call: asyncio.ensure_future(early())
+        tokens = []
+        messages = [{"role": "user", "content": "List"}]
+        result = await executor.run_agentic_loop(messages, on_token=tokens.append)
+
+        self.assertEqual(result, "All done.")
+        executor.tool_executor.execute_tool.assert_not_called()
+        self.assertEqual(json.loads(messages[-1]["content"])["output"], "early")
+        self.assertEqual(executor.last_timeline[0].early_tool_calls, 1)
+        self.assertIsNotNone(executor.last_timeline[0].first_token_seconds)
+
+    # ── Test 9: Independent sessions run concurrently on one loop ──────
+    async def test_concurrent_sessions(self):
+        async def slow_answer(**kwargs):
+            await asyncio.sleep(0.3)
+            return "answer"
+
+        executors = [self._make_executor([]) for _ in range(5)]
+        for executor in executors:
+            executor.llm_adapter.generate_response = AsyncMock(side_effect=slow_answer)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await asyncio.gather(*(
+            executor.run_agentic_loop([{"role": "user", "content": "Hi"}]) for executor in executors
+        ))
+        self.assertEqual(results, ["answer"] * 5)
+        self.assertLess(loop.time() - started, 1.0)
+
+    # ── Test 10: summarize() awaits the adapter ────────────────────────
+    async def test_summarize(self):
+        executor = self._make_executor(["short summary", "Error: nope"])
+        msgs = [{"role": "user", "content": "hello"}]
+        self.assertEqual(await executor.summarize(None, msgs), "short summary")
+        self.assertIsNone(await executor.summarize("old", msgs))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+"""Tests for AsyncPersistentShell and AsyncToolExecutor."""
+import sys
+import os
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch, AsyncMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from safety_guardrail.safety_guardrail import SafetyGuardrail
+from tool_executor.async_tool_executor import AsyncPersistentShell, AsyncToolExecutor
+from tool_executor.resource_limits import ResourceLimits
+from tool_executor.tool_executor import CommandResult
+
+
+@unittest.skipUnless(os.path.exists("/bin/bash"), "needs /bin/bash")
+class TestAsyncPersistentShell(unittest.IsolatedAsyncioTestCase):
+    """Runs a real bash through asyncio pipes."""
+
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.shell = AsyncPersistentShell(self.tmp.name)
+
+    async def asyncTearDown(self):
+        await self.shell.close()
+        self.tmp.cleanup()
+
+    # ── Test 1: stdout and stderr are captured ─────────────────────────
+    async def test_execute_captures_output(self):
+        output = await self.shell.execute("echo out; echo err >&2")
+        self.assertIn("out", output)
+        self.assertIn("err", output)
+        self.assertNotIn(self.shell.delimiter, output)
+
+    # ── Test 2: State persists between commands ────────────────────────
+    async def test_state_persists(self):
+        await self.shell.execute("mkdir sub && cd sub && export GREETING=hi")
+        self.assertEqual(await self.shell.execute("basename $PWD; echo $GREETING"), "sub\nhi")
+        self.assertEqual(os.path.basename(self.shell.get_cwd()), "sub")
+
+    # ── Test 3: Heredocs terminate before the delimiter ────────────────
+    async def test_heredoc(self):
+        await self.shell.execute("cat > note.txt << 'EOF'\nline one\nEOF")
+        self.assertEqual(await self.shell.execute("cat note.txt"), "line one")
+
+    # ── Test 4: Timeout kills the job, a stuck shell is restarted ──────
+    async def test_timeout_restarts(self):
+        await self.shell.execute("mkdir sub && cd sub && export GREETING=hi")
+        output = await self.shell.execute("sleep 5", timeout=0.2)
+        self.assertIn("timed out", output)
+        self.assertEqual(await self.shell.execute("echo again"), "again")
+        self.assertEqual(self.shell.restarts, 0)
+        await self.shell.execute("while :; do :; done", timeout=0.2)
+        self.assertEqual(await self.shell.execute("basename $PWD; echo $GREETING"), "sub\nhi")
+        self.assertEqual(self.shell.restarts, 1)
+
+    # ── Test 5: Exit status and stderr are reported separately ─────────
+    async def test_structured_result(self):
+        result = await self.shell.run("echo out; echo err >&2; false")
+        self.assertEqual((result.output, result.stderr, result.returncode), ("out", "err", 1))
+        self.assertEqual((await self.shell.run("exit 7")).returncode, 7)
+        self.assertEqual(await self.shell.execute("echo again"), "again")
+        isolated = await self.shell.run_isolated("echo err >&2; exit 4")
+        self.assertEqual((isolated.output, isolated.stderr, isolated.returncode), ("", "err", 4))
+
+    # ── Test 6: Large output is bounded and spilled ───────────────────
+    async def test_large_output_spilled(self):
+        shell = AsyncPersistentShell(self.tmp.name, head_bytes=100, tail_bytes=100)
+        try:
+            result = await shell.run("seq 1 100000")
+            self.assertEqual(result.output_bytes, len("".join(f"{i}\n" for i in range(1, 100001))))
+            self.assertTrue(result.output.startswith("1\n2\n"))
+            self.assertTrue(result.output.endswith("100000"))
+            self.assertLess(len(result.output), 400)
+            self.assertEqual(os.path.basename(os.path.dirname(result.spill_path)), ".tool_output")
+            self.assertEqual(os.path.getsize(result.spill_path), result.output_bytes)
+            isolated = await shell.run_isolated("seq 1 100000")
+            self.assertEqual(isolated.output_bytes, result.output_bytes)
+        finally:
+            await shell.close()
+
+    # ── Test 7: Separate shells run concurrently on one loop ───────────
+    async def test_concurrent_shells(self):
+        other = AsyncPersistentShell(self.tmp.name)
+        try:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            outputs = await asyncio.gather(
+                self.shell.execute("sleep 0.5; echo a"),
+                other.execute("sleep 0.5; echo b"),
+            )
+            self.assertEqual(outputs, ["a", "b"])
+            self.assertLess(loop.time() - started, 0.9)
+        finally:
+            await other.close()
+
+    # ── Test 8: Output limit and usage accounting match the sync shell ─
+    async def test_output_limit_and_usage(self):
+        shell = AsyncPersistentShell(self.tmp.name, limits=ResourceLimits(
+            cpu_seconds=None, address_space_bytes=None, output_bytes=100_000, open_files=None))
+        try:
+            for run in (shell.run, shell.run_isolated):
+                result = await run("yes | head -c 10000000", timeout=10)
+                self.assertEqual(result.limit_exceeded, "output", run.__name__)
+                self.assertIn("printed more than 100000 bytes", result.stderr)
+                self.assertLess(result.output_bytes, 10_000_000)
+
+                usage = await run("python3 -c 'import time; b = bytearray(64 << 20); time.sleep(0.2)'")
+                self.assertEqual(usage.returncode, 0)
+                self.assertIsNotNone(usage.cpu_seconds, run.__name__)
+                self.assertGreater(usage.peak_rss_bytes, 64 << 20)
+            self.assertEqual(await shell.execute("echo again"), "again")
+        finally:
+            await shell.close()
+
+    # ── Test 9: A cancelled command is killed, not left to the next one ─
+    async def test_cancelled(self):
+        await self.shell.execute("export GREETING=hi")
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.shell.run("sleep 0.5; echo stale; (exit 7)"), 0.1)
+        result = await self.shell.run("echo $GREETING")
+        self.assertEqual((result.output, result.returncode), ("hi", 0))
+        self.assertEqual(self.shell.restarts, 1)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.shell.run_isolated("echo $$ > bash.pid; sleep 30 & echo $! > sleep.pid; wait"),
+                                   0.3)
+        for name in ("bash.pid", "sleep.pid"):
+            with open(os.path.join(self.tmp.name, name)) as f:
+                pid = f.read().strip()
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    state = f.read().rsplit(")", 1)[1].split()[0]
+            except OSError:
+                state = None  # reaped
+            self.assertIn(state, (None, "Z"), name)
+
+
+class TestAsyncToolExecutor(unittest.IsolatedAsyncioTestCase):
+    """AsyncToolExecutor with the shell mocked."""
+
+    def setUp(self):
+        self.te = AsyncToolExecutor(SafetyGuardrail(), workdir=tempfile.gettempdir())
+        self.te.shell.run = AsyncMock(side_effect=lambda cmd: CommandResult(f"ran {cmd}"))
+        self.te.shell.run_isolated = AsyncMock(side_effect=lambda cmd: CommandResult(f"isolated {cmd}"))
+
+    # ── Test 10: Guardrail blocks before the shell is touched ──────────
+    async def test_blocked_command(self):
+        result = await self.te.execute_tool("execute_bash", "rm -rf /")
+        self.assertIn("Guardrail blocked", result["output"])
+        self.te.shell.run.assert_not_called()
+
+    # ── Test 11: Unknown tool ──────────────────────────────────────────
+    async def test_unknown_tool(self):
+        result = await self.te.execute_tool("fly", "x")
+        self.assertEqual(result["returncode"], 1)
+
+    # ── Test 12: Read-only calls run isolated, others in order ─────────
+    async def test_execute_tools_order(self):
+        results = await self.te.execute_tools([
+            ("execute_bash", "cat a"),
+            ("execute_bash", "cat b"),
+            ("execute_bash", "cd sub"),
+            ("execute_bash", "cat c"),
+        ])
+        self.assertEqual([r["output"] for r in results],
+                         ["isolated cat a", "isolated cat b", "ran cd sub", "ran cat c"])
+
+    # ── Test 13: A failed call skips the rest ──────────────────────────
+    async def test_execute_tools_stops_after_failure(self):
+        self.te.shell.run.side_effect = lambda cmd: CommandResult(cmd, returncode=1 if cmd == "false" else 0)
+        results = await self.te.execute_tools([("execute_bash", "false"), ("execute_bash", "cat a")])
+        self.assertEqual([r["returncode"] for r in results], [1, None])
+        self.te.shell.run_isolated.assert_not_called()
+
+    # ── Test 14: submit_tool returns a task for read-only calls only ───
+    async def test_submit_tool(self):
+        task = self.te.submit_tool("execute_bash", "ls")
+        self.assertEqual((await task)["output"], "isolated ls")
+        with self.assertRaises(ValueError):
+            self.te.submit_tool("execute_bash", "touch x")
+
+    # ── Test 15: Parsing is shared with ToolExecutor ───────────────────
+    def test_parse_tool_calls(self):
+        calls = self.te.parse_tool_calls(
+            'TOOL_CALL: {"tool_name": "execute_bash", "args": "ls"}\n'
+            'TOOL_CALL: {"tool_name": "execute_bash", "args": "pwd"}'
+        )
+        self.assertEqual([c["args"] for c in calls], ["ls", "pwd"])
+
+
+if __name__ == "__main__":
+    unittest.main()
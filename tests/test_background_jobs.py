@@ -0,0 +1,175 @@
+"""Tests for background jobs (real bash)."""
+import sys
+import os
+import signal
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tool_executor.background_jobs import JobManager
+
+
+def live_group_members(pgid: int) -> list:
+    """Pids in process group *pgid* that are not zombies."""
+    members = []
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == pgid and fields[0] != "Z":
+            members.append(int(pid))
+    return members
+
+
+@unittest.skipUnless(os.path.exists("/bin/bash"), "needs /bin/bash")
+class TestJobManager(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.jobs = JobManager(self.tmp.name)
+        self.addCleanup(self.jobs.close)
+
+    # ── Test 1: start returns at once, wait collects the result ────────
+    def test_start_and_wait(self):
+        started = time.perf_counter()
+        result = self.jobs.start("sleep 0.3; echo done; echo oops >&2; exit 3", self.tmp.name)
+        self.assertLess(time.perf_counter() - started, 0.2)
+        self.assertEqual(result["job_id"], 1)
+        self.assertEqual(self.jobs.status(1)["state"], "running")
+
+        waited = self.jobs.wait(1, timeout=5)
+        self.assertEqual((waited["state"], waited["job_returncode"]), ("exited", 3))
+        self.assertEqual(waited["output"], "done\noops\n")
+        self.assertEqual(waited["returncode"], 0)
+
+    # ── Test 2: Output is read incrementally, or tailed ────────────────
+    def test_incremental_output(self):
+        self.jobs.start("echo one; sleep 0.3; echo two", self.tmp.name)
+        time.sleep(0.15)
+        self.assertEqual(self.jobs.output(1)["output"], "one\n")
+        self.assertEqual(self.jobs.wait(1, timeout=5)["output"], "two\n")
+        self.assertEqual(self.jobs.output(1)["output"], "")
+        self.assertEqual(self.jobs.output(1, offset=0)["output"], "one\ntwo\n")
+        self.assertEqual(self.jobs.output(1, tail=True, max_bytes=4)["output"], "two\n")
+        limited = self.jobs.output(1, offset=0, max_bytes=4)
+        self.assertEqual(limited["next_offset"], 4)
+        self.assertIn("4 more bytes", limited["output"])
+
+    # ── Test 3: wait gives up at its deadline; stop kills the group ────
+    def test_wait_deadline_and_stop(self):
+        self.jobs.start("sleep 30 & sleep 30", self.tmp.name)
+        started = time.perf_counter()
+        self.assertEqual(self.jobs.wait(1, timeout=0.2)["state"], "running")
+        self.assertLess(time.perf_counter() - started, 1)
+        pid = self.jobs.jobs[1].process.pid
+        stopped = self.jobs.stop(1)
+        self.assertEqual((stopped["state"], stopped["job_returncode"]), ("exited", 137))
+        deadline = time.monotonic() + 2
+        while live_group_members(pid) and time.monotonic() < deadline:
+            time.sleep(0.01)  # SIGKILL reaches the rest of the group asynchronously
+        self.assertEqual(live_group_members(pid), [])  # background child included
+
+    # ── Test 4: status lists jobs; unknown ids are errors ──────────────
+    def test_status(self):
+        self.assertEqual(self.jobs.status()["output"], "No background jobs.")
+        self.jobs.start("true", self.tmp.name)
+        self.jobs.wait(1)
+        self.assertEqual([j["state"] for j in self.jobs.status()["jobs"]], ["exited"])
+        for call in (self.jobs.status, self.jobs.output, self.jobs.wait, self.jobs.stop):
+            self.assertEqual(call(7)["returncode"], 1)
+        self.assertEqual(self.jobs.status("x")["returncode"], 1)
+
+    # ── Test 5: Concurrent job_output calls read consecutive ranges ────
+    def test_concurrent_output(self):
+        import threading
+        self.jobs.start("printf 'x%.0s' $(seq 100)", self.tmp.name)
+        self.jobs.jobs[1].process.wait(timeout=5)  # not wait(): that reads the output
+        barrier = threading.Barrier(2, timeout=5)
+        results = []
+
+        def read():
+            barrier.wait()
+            results.append(self.jobs.output(1, max_bytes=60))
+
+        threads = [threading.Thread(target=read) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(result["offset"] for result in results), [0, 60])
+        self.assertEqual(sum(len(result["output"].split("\n")[0]) for result in results), 100)
+
+
+@unittest.skipUnless(os.path.exists("/bin/bash"), "needs /bin/bash")
+class TestToolExecutorJobs(unittest.TestCase):
+
+    # ── Test 6: Jobs inherit the shell's cwd and exports ───────────────
+    def test_executor_job_tools(self):
+        from safety_guardrail.safety_guardrail import SafetyGuardrail
+        from tool_executor.tool_executor import ToolExecutor
+        with tempfile.TemporaryDirectory() as workdir:
+            te = ToolExecutor(SafetyGuardrail(), pool_size=1, workdir=workdir)
+            try:
+                te.execute_tool("execute_bash", "mkdir sub && cd sub && export GREETING=hi")
+                started = te.execute_tool("job_start", "basename $PWD; echo $GREETING")
+                waited = te.execute_tool("job_wait", {"job_id": started["job_id"], "timeout": 5})
+                self.assertEqual(waited["output"], "sub\nhi\n")
+                self.assertIn("Guardrail blocked", te.execute_tool("job_start", "rm -rf /")["output"])
+                self.assertEqual(te.execute_tool("job_status", None)["jobs"][0]["job_returncode"], 0)
+                self.assertIn("bad arguments", te.execute_tool("job_wait", {"id": 1})["output"])
+                self.assertTrue(te.is_independent("job_status", 1))
+                for name in ("job_output", "job_wait", "job_start"):
+                    self.assertFalse(te.is_independent(name, 1), name)
+
+                # Two job_output calls in one response run in order and share the offset
+                te.execute_tool("job_start", "printf 'x%.0s' $(seq 100)")
+                te.execute_tool("job_wait", {"job_id": 2, "timeout": 5})
+                first, second = te.execute_tools([("job_output", {"job_id": 2, "offset": 0, "max_bytes": 60}),
+                                                  ("job_output", {"job_id": 2, "offset": 60})])
+                self.assertEqual((first["next_offset"], second["offset"], second["next_offset"]), (60, 60, 100))
+            finally:
+                te.close()
+
+    # ── Test 7: Job processes get the per-command CPU limit ────────────
+    def test_job_cpu_limit(self):
+        from safety_guardrail.safety_guardrail import SafetyGuardrail
+        from tool_executor.resource_limits import ResourceLimits
+        from tool_executor.tool_executor import ToolExecutor
+        with tempfile.TemporaryDirectory() as workdir:
+            te = ToolExecutor(SafetyGuardrail(), pool_size=1, workdir=workdir, limits=ResourceLimits(cpu_seconds=1))
+            try:
+                te.execute_tool("job_start", "while :; do :; done")
+                waited = te.execute_tool("job_wait", {"job_id": 1, "timeout": 10})
+                self.assertEqual(waited["job_returncode"], 128 + signal.SIGXCPU)
+            finally:
+                te.close()
+
+    # ── Test 8: A job whose log passes the output limit is killed ──────
+    def test_job_output_limit(self):
+        from safety_guardrail.safety_guardrail import SafetyGuardrail
+        from tool_executor.resource_limits import ResourceLimits
+        from tool_executor.tool_executor import ToolExecutor
+        with tempfile.TemporaryDirectory() as workdir:
+            te = ToolExecutor(SafetyGuardrail(), pool_size=1, workdir=workdir,
+                              limits=ResourceLimits(output_bytes=100_000))
+            try:
+                te.execute_tool("job_start", "while :; do head -c 10000 /dev/zero; sleep 0.01; done")
+                te.execute_tool("job_start", "echo quiet")
+                waited = te.execute_tool("job_wait", {"job_id": 1, "timeout": 10})
+                self.assertEqual((waited["state"], waited["job_returncode"], waited["limit_exceeded"]),
+                                 ("exited", 128 + signal.SIGKILL, "output"))
+                self.assertLess(waited["output_bytes"], 1_000_000)
+                tail = te.execute_tool("job_output", {"job_id": 1, "tail": True})["output"]
+                self.assertIn("printed more than 100000 bytes", tail)
+                self.assertNotIn("limit_exceeded", te.execute_tool("job_wait", {"job_id": 2, "timeout": 5}))
+            finally:
+                te.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
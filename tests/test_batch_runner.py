@@ -0,0 +1,123 @@
+"""Tests for the headless batch runner (LLM is mocked, no shell is started)."""
+import sys
+import os
+import asyncio
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_runner.batch_runner import BatchRunner, run_batch
+
+
+class FakeAsyncAdapter:
+    """Answers "echo: <last user message>" after a short delay."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def generate_response(self, messages, model=None):
+        self.calls.append((messages, model))
+        await asyncio.sleep(self.delay)
+        user_turns = [m["content"] for m in messages if m["role"] == "user"]
+        return f"echo: {user_turns[-1]}"
+
+
+class TestBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.adapter = FakeAsyncAdapter()
+        patcher = patch("batch_runner.batch_runner.get_async_llm_adapter", return_value=self.adapter)
+        self.mock_factory = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _paths(self, lines):
+        input_path = os.path.join(self.tmp.name, "requests.jsonl")
+        with open(input_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return input_path, os.path.join(self.tmp.name, "results.jsonl")
+
+    def _runner(self, **kwargs):
+        return BatchRunner(
+            provider="openai", session_dir=os.path.join(self.tmp.name, "sessions"),
+            session_backend="file", workdir=os.path.join(self.tmp.name, "workspace"), **kwargs,
+        )
+
+    @staticmethod
+    def _read(path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    # ── Test 1: One result line per job with latency and steps ─────────
+    def test_results_written(self):
+        input_path, output_path = self._paths([
+            json.dumps({"id": "a", "prompt": "first"}),
+            "",
+            json.dumps({"prompt": "second", "model": "gpt-x"}),
+        ])
+        totals = asyncio.run(self._runner().run(input_path, output_path))
+        self.assertEqual(totals["jobs"], 2)
+        self.assertEqual(totals["failed"], 0)
+
+        results = {r["id"]: r for r in self._read(output_path)}
+        self.assertEqual(results["a"]["response"], "echo: first")
+        self.assertEqual(results["a"]["steps"], 1)
+        self.assertEqual(results["a"]["model"], "gpt-4o-mini")  # provider default
+        self.assertIsNone(results["a"]["error"])
+        self.assertGreaterEqual(results["a"]["latency_seconds"], 0)
+        self.assertEqual(results["3"]["model"], "gpt-x")  # id defaults to the line number
+
+    # ── Test 2: Bad lines become error records, not crashes ────────────
+    def test_invalid_lines(self):
+        input_path, output_path = self._paths(["not json", json.dumps({"id": "x"}),
+                                               json.dumps({"prompt": "ok", "provider": "nope"})])
+        self.mock_factory.side_effect = ValueError("Unsupported provider: 'nope'")
+        totals = asyncio.run(self._runner().run(input_path, output_path))
+        self.assertEqual(totals, {"jobs": 3, "failed": 3, "seconds": totals["seconds"]})
+        errors = [r["error"] for r in self._read(output_path)]
+        self.assertTrue(all(errors))
+        self.assertTrue(any("Unsupported provider" in e for e in errors))
+
+    # ── Test 3: Jobs run concurrently up to the limit ──────────────────
+    def test_concurrency(self):
+        self.adapter.delay = 0.2
+        input_path, output_path = self._paths([json.dumps({"prompt": str(i)}) for i in range(8)])
+        totals = asyncio.run(self._runner(concurrency=8).run(input_path, output_path))
+        self.assertEqual(totals["jobs"], 8)
+        self.assertLess(totals["seconds"], 1.0)
+
+    # ── Test 4: Session jobs continue a persisted session ──────────────
+    def test_session_jobs(self):
+        input_path, output_path = self._paths([
+            json.dumps({"prompt": "remember 42", "session": "s1"}),
+            json.dumps({"prompt": "what number?", "session": "s1"}),
+        ])
+        asyncio.run(self._runner(concurrency=2).run(input_path, output_path))
+
+        # The second job saw the first exchange (jobs on one session are serialized)
+        second_messages = self.adapter.calls[-1][0]
+        contents = [m["content"] for m in second_messages]
+        self.assertIn("remember 42", contents)
+        self.assertIn("echo: remember 42", contents)
+
+        from session_manager.session_manager import SessionManager
+        manager = SessionManager(os.path.join(self.tmp.name, "sessions"))
+        manager.load_session("s1")
+        self.assertEqual([m["role"] for m in manager.get_history()],
+                         ["user", "assistant", "user", "assistant"])
+
+    # ── Test 5: run_batch defaults the output path ─────────────────────
+    def test_run_batch_default_output(self):
+        input_path, _ = self._paths([json.dumps({"prompt": "hi"})])
+        with patch("sys.stderr"):
+            run_batch(input_path, provider="openai", workdir=os.path.join(self.tmp.name, "workspace"))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "requests.results.jsonl")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""Tests for ContextManager."""
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from context_manager.context_manager import ContextManager, OMITTED_MARKER, SUMMARY_PREFIX, DEFAULT_TOKEN_BUDGET
+from session_manager.lazy_history import LazyHistory
+
+
+def _turns(count, size=40):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"{i:03d}" + "x" * size}
+            for i in range(count)]
+
+
+class TestTokenBudget(unittest.TestCase):
+    # ── Test 1: Per-model budgets by longest prefix ────────────────────
+    def test_model_budgets(self):
+        cm = ContextManager()
+        self.assertEqual(cm.get_token_budget("claude-sonnet-4-20250514"), 150_000)
+        self.assertEqual(cm.get_token_budget("anthropic/claude-sonnet-4"), 150_000)
+        self.assertEqual(cm.get_token_budget("deepseek-chat"), 48_000)
+        self.assertEqual(cm.get_token_budget("unknown-model"), DEFAULT_TOKEN_BUDGET)
+
+    # ── Test 2: Explicit budget overrides the table ────────────────────
+    def test_explicit_budget(self):
+        self.assertEqual(ContextManager(token_budget=1234).get_token_budget("gpt-4o"), 1234)
+
+
+class TestBuildContext(unittest.TestCase):
+    def setUp(self):
+        self.summaries = []
+
+        def summarize(previous, messages):
+            self.summaries.append((previous, [m["content"][:3] for m in messages]))
+            return f"summary#{len(self.summaries)}"
+
+        self.summarize = summarize
+
+    # ── Test 3: Small history passes through verbatim ──────────────────
+    def test_under_budget_verbatim(self):
+        cm = ContextManager(token_budget=10_000)
+        history = _turns(5)
+        result = cm.build_context(history, system_prompt="SYS", summarize=self.summarize)
+        self.assertEqual(result[0], {"role": "system", "content": "SYS"})
+        self.assertEqual(result[1:], history)
+        self.assertEqual(self.summaries, [])
+
+    # ── Test 4: Over budget → older turns summarized, tail verbatim ────
+    def test_over_budget_rolls_summary(self):
+        cm = ContextManager(token_budget=200, min_recent_messages=2)
+        history = _turns(30)
+        result = cm.build_context(history, summarize=self.summarize)
+
+        self.assertTrue(result[0]["content"].startswith(SUMMARY_PREFIX))
+        self.assertEqual(result[-1], history[-1])
+        self.assertLessEqual(cm.estimate_tokens(result), 200)
+        # Evicted turns are folded in order, chunk by chunk, each chunk
+        # building on the previous summary
+        folded = [tag for _, chunk in self.summaries for tag in chunk]
+        kept = len(result) - 1
+        self.assertEqual(folded, [f"{i:03d}" for i in range(30 - kept)])
+        self.assertIsNone(self.summaries[0][0])
+        for i in range(1, len(self.summaries)):
+            self.assertEqual(self.summaries[i][0], f"summary#{i}")
+        self.assertEqual(result[0]["content"], SUMMARY_PREFIX + f"summary#{len(self.summaries)}")
+
+    # ── Test 5: Cached summary reused until the tail outgrows budget ───
+    def test_summary_cached_between_turns(self):
+        cm = ContextManager(token_budget=200, min_recent_messages=2)
+        history = _turns(30)
+        cm.build_context(history, summarize=self.summarize)
+        calls = len(self.summaries)
+        history.append({"role": "user", "content": "next"})
+        result = cm.build_context(history, summarize=self.summarize)
+        self.assertEqual(len(self.summaries), calls)
+        self.assertEqual(result[0]["content"], SUMMARY_PREFIX + f"summary#{calls}")
+
+        history.extend(_turns(20))
+        cm.build_context(history, summarize=self.summarize)
+        self.assertGreater(len(self.summaries), calls)
+        self.assertEqual(self.summaries[calls][0], f"summary#{calls}")
+
+    # ── Test 6: Summaries persisted through the session manager ────────
+    def test_summary_stored_in_session(self):
+        sm = MagicMock()
+        sm.get_context_summary.return_value = None
+        cm = ContextManager(sm, token_budget=200, min_recent_messages=2)
+        result = cm.build_context(_turns(30), summarize=self.summarize)
+        sm.save_context_summary.assert_called_once()
+        stored = sm.save_context_summary.call_args[0][0]
+        self.assertEqual(stored["content"], f"summary#{len(self.summaries)}")
+        self.assertEqual(stored["upto"], 30 - (len(result) - 1))
+
+    # ── Test 7: Failed summarization does not cache anything ───────────
+    def test_failed_summary_not_stored(self):
+        sm = MagicMock()
+        sm.get_context_summary.return_value = None
+        cm = ContextManager(sm, token_budget=200, min_recent_messages=2)
+        result = cm.build_context(_turns(30), summarize=lambda previous, messages: None)
+        sm.save_context_summary.assert_not_called()
+        self.assertFalse(result[0]["content"].startswith(SUMMARY_PREFIX))
+
+    # ── Test 8: Recent turns kept even if they exceed the budget ───────
+    def test_min_recent_messages_kept(self):
+        cm = ContextManager(token_budget=50, min_recent_messages=2)
+        history = _turns(4, size=400)
+        result = cm.build_context(history, summarize=self.summarize)
+        self.assertEqual(result[-2:], history[-2:])
+
+    # ── Test 9: Long lazy history is read from the end, roll is capped ─
+    def test_lazy_history_roll_capped(self):
+        turns = _turns(1000)
+        fetched = []
+
+        def fetch(start, stop):
+            fetched.append((start, stop))
+            return turns[start:stop]
+
+        folded = []
+
+        def summarize(previous, messages):
+            folded.extend(messages)
+            return "summary"
+
+        history = LazyHistory(fetch, len(turns), tail_messages=10, page_size=20)
+        cm = ContextManager(token_budget=200, min_recent_messages=2)
+        result = cm.build_context(history, summarize=summarize)
+
+        self.assertLess(history.resident_count, 100)
+        self.assertGreater(min(start for start, _ in fetched), 900)
+        self.assertLessEqual(len(folded), 40)
+        upto = cm._load_summary()["upto"]
+        dropped = upto - (len(folded) - 1)
+        self.assertEqual(folded[0], {"role": "user", "content": OMITTED_MARKER.format(count=dropped)})
+        self.assertEqual(folded[-1], turns[upto - 1])
+        self.assertEqual(result[1:], turns[upto:])
+
+    # ── Test 10: Failed summaries still open with a user turn ──────────
+    def test_failed_summary_starts_with_user(self):
+        for failure in (None, "Error communicating with API: timeout"):
+            cm = ContextManager(token_budget=200, min_recent_messages=3)
+            result = cm.build_context(_turns(30), summarize=lambda previous, messages: failure,
+                                      system_prompt="SYS")
+            self.assertEqual(result[1]["role"], "user")
+            self.assertEqual(result[1]["content"], OMITTED_MARKER.format(count=32 - len(result)))
+            self.assertEqual(result[2]["role"], "assistant")
+            self.assertIsNone(cm._load_summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
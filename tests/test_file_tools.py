@@ -0,0 +1,146 @@
+"""Tests for the native file tools (no shell needed)."""
+import sys
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tool_executor import file_tools
+from tool_executor.file_tools import read_file, write_file, list_dir, grep, run_file_tool
+
+
+class TestFileTools(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        with open(os.path.join(self.root, "lines.txt"), "w") as f:
+            f.write("".join(f"line {i}\n" for i in range(1, 101)))
+        os.makedirs(os.path.join(self.root, "pkg", ".git"))
+        with open(os.path.join(self.root, "pkg", "mod.py"), "w") as f:
+            f.write("import os\n\ndef Target():\n    return 'target target'\n")
+        with open(os.path.join(self.root, "pkg", ".git", "HEAD"), "w") as f:
+            f.write("target\n")
+
+    # ── Test 1: read_file returns a line range ─────────────────────────
+    def test_read_file_range(self):
+        self.assertEqual(read_file(self.root, "lines.txt", 3, 5)["output"], "line 3\nline 4\nline 5\n")
+        self.assertEqual(read_file(self.root, "lines.txt", 99)["output"], "line 99\nline 100\n")
+        self.assertEqual(read_file(self.root, "lines.txt", 200)["output"], "")
+        self.assertEqual(len(read_file(self.root, "lines.txt")["output"].splitlines()), 100)
+        missing = read_file(self.root, "nope.txt")
+        self.assertEqual(missing["returncode"], 1)
+        self.assertIn("Error", missing["output"])
+
+    # ── Test 2: Large files are mmapped and output is capped ───────────
+    def test_read_file_mmap_and_truncation(self):
+        with patch.object(file_tools, "MMAP_THRESHOLD", 0), patch.object(file_tools, "MAX_OUTPUT_BYTES", 50):
+            self.assertEqual(read_file(self.root, "lines.txt", 10, 10)["output"], "line 10\n")
+            output = read_file(self.root, "lines.txt")["output"]
+        self.assertIn("output truncated at 50 bytes", output)
+
+    # ── Test 3: Only the output cap is copied out of a large file ──────
+    def test_read_file_copies_capped_slice(self):
+        with open(os.path.join(self.root, "big.log"), "wb") as f:
+            f.write(b"x" * 100 + b"\n" + b"y" * (4 * file_tools.MMAP_THRESHOLD))
+        with patch.object(file_tools, "_truncate", wraps=file_tools._truncate) as truncate:
+            output = read_file(self.root, "big.log", 2)["output"]
+            read_file(self.root, "big.log", 1, 2)
+        self.assertEqual([len(c.args[0]) for c in truncate.call_args_list], [file_tools.MAX_OUTPUT_BYTES + 1] * 2)
+        self.assertTrue(output.startswith("yyy"))
+        self.assertIn(f"output truncated at {file_tools.MAX_OUTPUT_BYTES} bytes", output)
+
+    # ── Test 4: write_file creates, appends, and stays in the workspace ─
+    def test_write_file(self):
+        result = write_file(self.root, "new/dir/a.txt", "hello\n", workspace=self.root)
+        self.assertEqual(result["returncode"], 0)
+        write_file(self.root, "new/dir/a.txt", "again\n", append=True, workspace=self.root)
+        self.assertEqual(read_file(self.root, "new/dir/a.txt")["output"], "hello\nagain\n")
+        outside = write_file(self.root, "../escape.txt", "x", workspace=self.root)
+        self.assertEqual(outside["returncode"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "..", "escape.txt")))
+
+    # ── Test 5: list_dir marks directories and sizes ───────────────────
+    def test_list_dir(self):
+        self.assertEqual(list_dir(self.root)["output"].splitlines(), ["lines.txt\t" + str(
+            os.path.getsize(os.path.join(self.root, "lines.txt"))), "pkg/"])
+        self.assertEqual(list_dir(self.root, "missing")["returncode"], 1)
+
+    # ── Test 6: grep reports file:line:text and skips .git ─────────────
+    def test_grep(self):
+        result = grep(self.root, "target", include="*.py")
+        self.assertEqual(result["output"], "pkg/mod.py:4:    return 'target target'")
+        self.assertEqual(grep(self.root, "^def target", ignore_case=True)["output"], "pkg/mod.py:3:def Target():")
+        self.assertEqual(grep(self.root, "line 5\\d", "lines.txt")["output"].splitlines()[0], "lines.txt:50:line 50")
+        self.assertEqual(grep(self.root, "no such text")["returncode"], 1)
+        self.assertEqual(grep(self.root, "(")["returncode"], 1)
+        with patch.object(file_tools, "MMAP_THRESHOLD", 0):
+            limited = grep(self.root, "line", "lines.txt", max_matches=3)["output"].splitlines()
+        self.assertEqual(limited[:3], ["lines.txt:1:line 1", "lines.txt:2:line 2", "lines.txt:3:line 3"])
+        self.assertIn("stopped after 3 matches", limited[3])
+
+    # ── Test 7: run_file_tool accepts plain-string args ────────────────
+    def test_run_file_tool(self):
+        self.assertEqual(run_file_tool("read_file", "lines.txt", self.root)["returncode"], 0)
+        self.assertIn("pkg/", run_file_tool("list_dir", None, self.root)["output"])
+        self.assertIn("bad arguments", run_file_tool("read_file", {"file": "x"}, self.root)["output"])
+        self.assertIn("JSON object", run_file_tool("write_file", "x", self.root)["output"])
+
+
+class TestToolExecutorFileTools(unittest.TestCase):
+
+    # ── Test 8: ToolExecutor runs file tools in the shell's cwd ────────
+    def test_executor_dispatch(self):
+        from safety_guardrail.safety_guardrail import SafetyGuardrail
+        from tool_executor.tool_executor import ToolExecutor
+        with tempfile.TemporaryDirectory() as workdir, patch("tool_executor.tool_executor.ShellPool") as pool:
+            pool.return_value.get_cwd.return_value = workdir
+            pool.return_value.workdir = workdir
+            te = ToolExecutor(SafetyGuardrail(), workdir=workdir)
+            te.result_cache.invalidate = invalidate = MagicMock()
+            write = te.execute_tool("write_file", {"path": "a.txt", "content": "x\n"})
+            self.assertEqual(write["returncode"], 0)
+            invalidate.assert_called_once()
+            self.assertEqual(te.execute_tool("read_file", {"path": "a.txt"})["output"], "x\n")
+            self.assertTrue(te.is_independent("grep", {"pattern": "x"}))
+            self.assertFalse(te.is_independent("write_file", {"path": "a.txt", "content": ""}))
+            self.assertEqual(te.command_stats["read_file"]["calls"], 1)
+            pool.return_value.run.assert_not_called()
+
+    # ── Test 9: A path denied by policy is denied for bash and tools ───
+    def test_policy_denies_file_access(self):
+        from safety_guardrail.policy import DEFAULT_RULES, Policy, Rule
+        from safety_guardrail.safety_guardrail import SafetyGuardrail
+        from tool_executor.tool_executor import ToolExecutor
+        rules = DEFAULT_RULES + (Rule("deny", "*", r"\.ssh(/|\s|$)", "SSH keys are off limits."),)
+        with tempfile.TemporaryDirectory() as home, patch("tool_executor.tool_executor.ShellPool") as pool:
+            os.makedirs(os.path.join(home, ".ssh"))
+            with open(os.path.join(home, ".ssh", "id_rsa"), "w") as f:
+                f.write("secret\n")
+            pool.return_value.get_cwd.return_value = home
+            pool.return_value.workdir = home
+            te = ToolExecutor(SafetyGuardrail(policy=Policy(rules=rules)), workdir=home)
+
+            for tool_name, args in [("execute_bash", "cat ~/.ssh/id_rsa"),
+                                    ("read_file", {"path": os.path.join(home, ".ssh", "id_rsa")}),
+                                    ("read_file", ".ssh/id_rsa"),
+                                    ("list_dir", {"path": ".ssh"}),
+                                    ("grep", {"pattern": "secret", "path": ".ssh"})]:
+                result = te.execute_tool(tool_name, args)
+                self.assertEqual(result["returncode"], 1, tool_name)
+                self.assertIn("SSH keys are off limits.", result["output"])
+            pool.return_value.run.assert_not_called()
+
+            # A relative path is checked resolved too
+            pool.return_value.get_cwd.return_value = os.path.join(home, ".ssh")
+            self.assertIn("Guardrail blocked", te.execute_tool("read_file", "id_rsa")["output"])
+            # Other paths are unaffected
+            pool.return_value.get_cwd.return_value = home
+            self.assertEqual(te.execute_tool("list_dir", None)["output"], ".ssh/")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""Tests for LazyHistory."""
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from session_manager.lazy_history import LazyHistory
+
+
+class TestLazyHistory(unittest.TestCase):
+    def setUp(self):
+        self.messages = [{"role": "user", "content": f"m{i}"} for i in range(100)]
+        self.fetches = []
+
+    def _fetch(self, start, stop):
+        self.fetches.append((start, stop))
+        return [dict(m) for m in self.messages[start:stop]]
+
+    # ── Test 1: Only the tail is loaded eagerly ────────────────────────
+    def test_tail_loaded_eagerly(self):
+        history = LazyHistory(self._fetch, 100, tail_messages=10, page_size=20)
+        self.assertEqual(self.fetches, [(90, 100)])
+        self.assertEqual(history.resident_count, 10)
+        self.assertEqual(len(history), 100)
+        self.assertEqual(history[-1]["content"], "m99")
+
+    # ── Test 2: Older messages fetched one page at a time ──────────────
+    def test_older_messages_paged_in(self):
+        history = LazyHistory(self._fetch, 100, tail_messages=10, page_size=20)
+        self.assertEqual(history[85]["content"], "m85")
+        self.assertEqual(self.fetches[-1], (70, 90))
+        self.assertEqual(history[75]["content"], "m75")
+        self.assertEqual(len(self.fetches), 2)
+
+    # ── Test 3: Token budget decides the eager tail ────────────────────
+    def test_tail_tokens(self):
+        history = LazyHistory(self._fetch, 100, tail_tokens=20, page_size=5, chars_per_token=1)
+        # The last pages hold 3-char messages, so 20 "tokens" need two pages of five
+        self.assertEqual(history.resident_count, 10)
+
+    # ── Test 4: Iteration streams without keeping the prefix ───────────
+    def test_iteration_does_not_retain_prefix(self):
+        history = LazyHistory(self._fetch, 100, tail_messages=10, page_size=30)
+        self.assertEqual([m["content"] for m in history], [m["content"] for m in self.messages])
+        self.assertEqual(history.resident_count, 10)
+
+    # ── Test 5: Slices, append and equality ────────────────────────────
+    def test_slice_append_and_equality(self):
+        history = LazyHistory(self._fetch, 100, tail_messages=10)
+        self.assertEqual([m["content"] for m in history[-3:]], ["m97", "m98", "m99"])
+        self.assertEqual(history.tail(2), self.messages[-2:])
+        history.append({"role": "assistant", "content": "new"})
+        self.assertEqual(len(history), 101)
+        self.assertEqual(history, self.messages + [{"role": "assistant", "content": "new"}])
+
+    # ── Test 6: Out-of-range index ─────────────────────────────────────
+    def test_index_error(self):
+        history = LazyHistory(self._fetch, 3)
+        with self.assertRaises(IndexError):
+            history[3]
+
+
+if __name__ == "__main__":
+    unittest.main()
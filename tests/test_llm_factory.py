@@ -1,11 +1,16 @@
 """Tests for LLM Factory — provider registry + factory function."""
 import sys
 import os
+import subprocess
+import threading
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+import openai
+
+from llm_adapters import llm_factory
 from llm_adapters.llm_factory import (
     PROVIDERS,
     get_provider_config,
@@ -13,9 +18,11 @@ from llm_adapters.llm_factory import (
     get_api_format,
     list_providers,
     get_llm_adapter,
+    get_async_llm_adapter,
+    close_adapters,
 )
-from llm_adapters.openai_compatible_adapter import OpenAICompatibleAdapter
-from llm_adapters.anthropic_compatible_adapter import AnthropicCompatibleAdapter
+from llm_adapters.openai_compatible_adapter import OpenAICompatibleAdapter, AsyncOpenAICompatibleAdapter
+from llm_adapters.anthropic_compatible_adapter import AnthropicCompatibleAdapter, AsyncAnthropicCompatibleAdapter
 
 
 class TestGetProviderConfig(unittest.TestCase):
@@ -70,6 +77,10 @@ class TestListProviders(unittest.TestCase):
 
 
 class TestGetLlmAdapter(unittest.TestCase):
+    def setUp(self):
+        close_adapters()
+        self.addCleanup(close_adapters)
+
     # ── Test 7: OpenAI returns correct type ────────────────────────────
     @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
     def test_get_llm_adapter_openai_type(self, mock_openai):
@@ -86,7 +97,7 @@ class TestGetLlmAdapter(unittest.TestCase):
     @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
     def test_get_llm_adapter_with_api_key(self, mock_openai):
         get_llm_adapter("openai", api_key="my-explicit-key")
-        mock_openai.assert_called_once_with(api_key="my-explicit-key")
+        mock_openai.assert_called_once_with(api_key="my-explicit-key", http_client=ANY)
 
     # ── Test 10: All OpenAI-format providers ───────────────────────────
     @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
@@ -104,6 +115,89 @@ class TestGetLlmAdapter(unittest.TestCase):
             adapter = get_llm_adapter(name, api_key="k")
             self.assertIsInstance(adapter, AnthropicCompatibleAdapter, f"{name} should be AnthropicCompatible")
 
+    # ── Test 12: Every provider's adapter can stream ───────────────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.Anthropic")
+    @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
+    def test_all_providers_stream(self, mock_openai, mock_anthropic):
+        for name in PROVIDERS:
+            adapter = get_llm_adapter(name, api_key="k")
+            self.assertTrue(callable(getattr(adapter, "stream_response", None)), name)
+
+
+    # ── Test 13: Async factory mirrors the sync one ────────────────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.AsyncAnthropic")
+    @patch("llm_adapters.openai_compatible_adapter.openai.AsyncOpenAI")
+    def test_get_async_llm_adapter(self, mock_async_openai, mock_async_anthropic):
+        self.assertIsInstance(get_async_llm_adapter("deepseek", api_key="k"), AsyncOpenAICompatibleAdapter)
+        mock_async_openai.assert_called_once_with(api_key="k", base_url="https://api.deepseek.com")
+        self.assertIsInstance(get_async_llm_adapter("anthropic", api_key="k"), AsyncAnthropicCompatibleAdapter)
+        with self.assertRaises(ValueError):
+            get_async_llm_adapter("nope")
+
+
+    # ── Test 14: Prompt caching per provider config ────────────────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.Anthropic")
+    def test_prompt_caching_flag(self, mock_anthropic):
+        self.assertTrue(get_llm_adapter("anthropic", api_key="k").prompt_caching)
+        self.assertFalse(get_llm_adapter("minimax", api_key="k").prompt_caching)
+        with patch.dict(PROVIDERS["minimax"], {"prompt_caching": True}):
+            close_adapters()
+            self.assertTrue(get_llm_adapter("minimax", api_key="k").prompt_caching)
+
+
+    # ── Test 15: Adapters are reused and share one pool per SDK ────────
+    @patch("llm_adapters.anthropic_compatible_adapter.anthropic.Anthropic")
+    @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
+    def test_adapter_cache(self, mock_openai, mock_anthropic):
+        with patch("openai.DefaultHttpxClient", wraps=openai.DefaultHttpxClient) as make_pool:
+            first = get_llm_adapter("openai", api_key="k")
+            get_llm_adapter("anthropic", api_key="k")
+            self.assertIs(get_llm_adapter("OpenAI", api_key="k"), first)
+            self.assertIsNot(get_llm_adapter("openai", api_key="other"), first)
+            self.assertIsNot(get_llm_adapter("deepseek", api_key="k"), first)
+        self.assertEqual(mock_openai.call_count, 3)
+        make_pool.assert_called_once()
+        self.assertEqual(make_pool.call_args.kwargs["limits"].keepalive_expiry, llm_factory.HTTP_KEEPALIVE_EXPIRY)
+
+        pools = {call.kwargs["http_client"] for call in mock_openai.call_args_list}
+        self.assertEqual(len(pools), 1)
+        pool = pools.pop()
+        self.assertIsNot(mock_anthropic.call_args.kwargs["http_client"], pool)
+
+        close_adapters()
+        self.assertTrue(pool.is_closed)
+        self.assertIsNot(get_llm_adapter("openai", api_key="k"), first)
+
+
+    # ── Test 16: Only the SDK of the provider used is imported ─────────
+    def test_lazy_sdk_imports(self):
+        script = ("import sys; from llm_adapters.llm_factory import get_llm_adapter; "
+                  "loaded = lambda: [m for m in ('openai', 'anthropic') if m in sys.modules]; "
+                  "print(loaded()); get_llm_adapter('deepseek', api_key='k'); print(loaded())")
+        src = os.path.join(os.path.dirname(__file__), '..', 'src')
+        output = subprocess.run([sys.executable, "-c", script], cwd=src, capture_output=True, text=True,
+                                timeout=60).stdout
+        self.assertEqual(output.split("\n")[:2], ["[]", "['openai']"])
+
+
+    # ── Test 17: Lazy adapters are created on first use ────────────────
+    @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
+    def test_lazy_adapter(self, mock_openai):
+        with self.assertRaises(ValueError):
+            get_llm_adapter("nope", lazy=True)
+        lazy = get_llm_adapter("openai", api_key="k", lazy=True)
+        mock_openai.assert_not_called()
+        self.assertEqual(lazy.usage_totals["input_tokens"], 0)
+        mock_openai.assert_called_once()
+        self.assertIs(lazy.resolve(), get_llm_adapter("openai", api_key="k"))
+
+        prefetched = get_llm_adapter("groq", api_key="k", lazy=True)
+        prefetched.prefetch()
+        for thread in threading.enumerate():
+            if thread.name == "adapter-prefetch":
+                thread.join(5)
+        self.assertIsInstance(prefetched._adapter, OpenAICompatibleAdapter)
+
 
 if __name__ == "__main__":
     unittest.main()
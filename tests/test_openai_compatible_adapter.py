@@ -2,11 +2,12 @@
 import sys
 import os
 import unittest
-from unittest.mock import patch, MagicMock
+import openai
+from unittest.mock import patch, MagicMock, AsyncMock
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from llm_adapters.openai_compatible_adapter import OpenAICompatibleAdapter
+from llm_adapters.openai_compatible_adapter import OpenAICompatibleAdapter, AsyncOpenAICompatibleAdapter
 
 
 class TestNormalizeMessages(unittest.TestCase):
@@ -109,5 +110,136 @@ class TestGenerateResponse(unittest.TestCase):
         self.assertIn("connection refused", result)
 
 
+class TestStreamResponse(unittest.TestCase):
+    """Tests for stream_response (API is mocked)."""
+
+    @staticmethod
+    def _chunk(text):
+        chunk = MagicMock()
+        chunk.choices = [MagicMock()]
+        chunk.choices[0].delta.content = text
+        return chunk
+
+    # ── Test 9: Deltas yielded as they arrive ──────────────────────────
+    @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
+    def test_stream_yields_deltas(self, MockOpenAI):
+        mock_client = MockOpenAI.return_value
+        empty = MagicMock()
+        empty.choices = []
+        mock_client.chat.completions.create.return_value = iter(
+            [self._chunk("Hel"), empty, self._chunk(None), self._chunk("lo")]
+        )
+
+        adapter = OpenAICompatibleAdapter(api_key="fake")
+        deltas = list(adapter.stream_response([{"role": "user", "content": "Hi"}], model="m"))
+        self.assertEqual(deltas, ["Hel", "lo"])
+        self.assertTrue(mock_client.chat.completions.create.call_args.kwargs["stream"])
+
+    # ── Test 10: Streaming rejected → blocking fallback ────────────────
+    @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
+    def test_stream_falls_back_to_generate(self, MockOpenAI):
+        mock_client = MockOpenAI.return_value
+        mock_choice = MagicMock()
+        mock_choice.message.content = "whole answer"
+
+        def create(**kwargs):
+            if kwargs.get("stream"):
+                raise Exception("stream unsupported")
+            response = MagicMock()
+            response.choices = [mock_choice]
+            return response
+
+        mock_client.chat.completions.create.side_effect = create
+        adapter = OpenAICompatibleAdapter(api_key="fake")
+        self.assertEqual(list(adapter.stream_response([{"role": "user", "content": "Hi"}])),
+                         ["whole answer"])
+
+
+class TestUsage(unittest.TestCase):
+    """Prompt-cache usage reporting (API is mocked)."""
+
+    # ── Test 11: cached_tokens reported as cache reads ─────────────────
+    @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
+    def test_usage_reported(self, MockOpenAI):
+        response = MockOpenAI.return_value.chat.completions.create.return_value
+        response.choices = [MagicMock()]
+        response.usage = MagicMock(prompt_tokens=2000, completion_tokens=20)
+        response.usage.prompt_tokens_details.cached_tokens = 1536
+
+        adapter = OpenAICompatibleAdapter(api_key="fake")
+        adapter.generate_response([{"role": "user", "content": "Hi"}])
+        self.assertEqual(adapter.last_usage, {"input_tokens": 2000, "output_tokens": 20,
+                                              "cache_read_tokens": 1536, "cache_write_tokens": 0})
+
+    # ── Test 12: Streams ask for a usage chunk, retry without it ───────
+    @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
+    def test_stream_usage_option(self, MockOpenAI):
+        usage_chunk = MagicMock(choices=[])
+        usage_chunk.usage = MagicMock(prompt_tokens=100, completion_tokens=2, prompt_tokens_details=None,
+                                      prompt_cache_hit_tokens=64)
+        text_chunk = TestStreamResponse._chunk("hi")
+        text_chunk.usage = None
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            if "stream_options" in kwargs and len(calls) > 1:
+                raise openai.BadRequestError("unknown field", response=MagicMock(), body=None)
+            return iter([text_chunk, usage_chunk])
+
+        MockOpenAI.return_value.chat.completions.create.side_effect = create
+        adapter = OpenAICompatibleAdapter(api_key="fake")
+        self.assertEqual(list(adapter.stream_response([{"role": "user", "content": "Hi"}])), ["hi"])
+        self.assertEqual(calls[0]["stream_options"], {"include_usage": True})
+        self.assertEqual(adapter.last_usage["cache_read_tokens"], 64)
+
+        # A provider rejecting stream_options is retried without it, once
+        self.assertEqual(list(adapter.stream_response([{"role": "user", "content": "Hi"}])), ["hi"])
+        self.assertNotIn("stream_options", calls[-1])
+        self.assertFalse(adapter.stream_usage)
+
+
+class TestAsyncAdapter(unittest.IsolatedAsyncioTestCase):
+    """Tests for AsyncOpenAICompatibleAdapter (API is mocked)."""
+
+    # ── Test 13: Awaitable generate_response on AsyncOpenAI ────────────
+    @patch("llm_adapters.openai_compatible_adapter.openai.AsyncOpenAI")
+    async def test_async_generate(self, MockAsyncOpenAI):
+        mock_client = MockAsyncOpenAI.return_value
+        mock_choice = MagicMock()
+        mock_choice.message.content = "async hello"
+        mock_client.chat.completions.create = AsyncMock(return_value=MagicMock(choices=[mock_choice]))
+
+        adapter = AsyncOpenAICompatibleAdapter(api_key="fake", base_url="https://x")
+        result = await adapter.generate_response([{"role": "user", "content": "Hi"}], model="m")
+        self.assertEqual(result, "async hello")
+        MockAsyncOpenAI.assert_called_once_with(api_key="fake", base_url="https://x")
+
+    # ── Test 14: Async errors come back as strings ─────────────────────
+    @patch("llm_adapters.openai_compatible_adapter.openai.AsyncOpenAI")
+    async def test_async_generate_error(self, MockAsyncOpenAI):
+        mock_client = MockAsyncOpenAI.return_value
+        mock_client.chat.completions.create = AsyncMock(side_effect=Exception("boom"))
+
+        adapter = AsyncOpenAICompatibleAdapter(api_key="fake")
+        result = await adapter.generate_response([{"role": "user", "content": "Hi"}])
+        self.assertIn("Error communicating", result)
+        self.assertIn("boom", result)
+
+    # ── Test 15: Async stream yields deltas ────────────────────────────
+    @patch("llm_adapters.openai_compatible_adapter.openai.AsyncOpenAI")
+    async def test_async_stream(self, MockAsyncOpenAI):
+        async def chunks():
+            for text in ("Hel", None, "lo"):
+                yield TestStreamResponse._chunk(text)
+
+        mock_client = MockAsyncOpenAI.return_value
+        mock_client.chat.completions.create = AsyncMock(return_value=chunks())
+
+        adapter = AsyncOpenAICompatibleAdapter(api_key="fake")
+        deltas = [d async for d in adapter.stream_response([{"role": "user", "content": "Hi"}])]
+        self.assertEqual(deltas, ["Hel", "lo"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -32,6 +32,7 @@ class TestOrchestrator(unittest.TestCase):
         mock_sm.session_dir = "/fake/sessions"
         mock_sm.get_current_session_id.return_value = "test_session"
         mock_sm.list_sessions.return_value = []
+        mock_sm.get_most_recent_session.return_value = None
 
         from orchestrator.orchestrator import Orchestrator
         orch = Orchestrator()
@@ -62,6 +63,7 @@ class TestOrchestrator(unittest.TestCase):
         mock_sm = MockSM.return_value
         mock_sm.session_dir = "/fake/sessions"
         mock_sm.list_sessions.return_value = ["s1", "s2", "s3"]
+        mock_sm.get_most_recent_session.return_value = "s3"
         mock_sm.get_current_session_id.return_value = "s3"
 
         from orchestrator.orchestrator import Orchestrator
@@ -79,6 +81,7 @@ class TestOrchestrator(unittest.TestCase):
         self.assertIn("/exit", output)
         self.assertIn("/help", output)
         self.assertIn("/providers", output)
+        self.assertIn("/timeline", output)
 
     # ── Test 4: Print providers output ─────────────────────────────────
     def test_print_providers_output(self):
@@ -90,5 +93,17 @@ class TestOrchestrator(unittest.TestCase):
             self.assertIn(provider, output)
 
 
+    # ── Test 5: Ctrl-C saves the session and closes the adapters ───────
+    def test_keyboard_interrupt_closes_adapters(self):
+        orch, mocks = self._create_orchestrator()
+        with patch("builtins.input", side_effect=KeyboardInterrupt), \
+             patch("orchestrator.orchestrator.close_adapters") as mock_close, \
+             patch("sys.stdout", new_callable=StringIO):
+            orch.run()
+        orch.session_manager.save_session.assert_called_once()
+        mocks[2].return_value.close.assert_called_once()
+        mock_close.assert_called_once()
+
+
 if __name__ == "__main__":
     unittest.main()
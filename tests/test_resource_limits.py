@@ -0,0 +1,101 @@
+"""Tests for per-command resource limits and usage accounting (real bash for the shell tests)."""
+import sys
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tool_executor.resource_limits import ResourceLimits
+from tool_executor.tool_executor import PersistentShell, record_command_stats, session_usage
+
+HAS_PROC = os.path.exists("/proc/self/io")
+
+
+class TestResourceLimits(unittest.TestCase):
+
+    # ── Test 1: Limits come from the environment; 0 turns one off ──────
+    def test_from_env(self):
+        env = {"TOOL_CPU_SECONDS": "5", "TOOL_MEMORY_MB": "256", "TOOL_OUTPUT_MB": "0"}
+        with patch.dict(os.environ, env):
+            limits = ResourceLimits.from_env()
+        self.assertEqual(limits.cpu_seconds, 5)
+        self.assertEqual(limits.address_space_bytes, 256 * 1024 ** 2)
+        self.assertIsNone(limits.output_bytes)
+        self.assertEqual(limits.open_files, ResourceLimits().open_files)
+
+    # ── Test 2: ulimit line; CPU only for one-off shells ───────────────
+    def test_ulimit_command(self):
+        limits = ResourceLimits(cpu_seconds=7, address_space_bytes=64 * 1024 ** 2, open_files=32)
+        self.assertEqual(limits.ulimit_command(), "ulimit -S -v 65536 -n 32 2>/dev/null")
+        self.assertIn("-t 7", limits.ulimit_command(cpu=True))
+        self.assertEqual(ResourceLimits.unlimited().ulimit_command(cpu=True), "")
+
+    # ── Test 3: Session totals add up per-program stats ────────────────
+    def test_session_usage(self):
+        stats = {}
+        record_command_stats(stats, "python3 a.py", {"returncode": 0, "cpu_seconds": 1.5, "peak_rss_bytes": 300,
+                                                     "write_bytes": 10})
+        record_command_stats(stats, "yes", {"returncode": 137, "output_bytes": 99, "limit_exceeded": "output"})
+        record_command_stats(stats, "python3 b.py", {"returncode": 0, "cpu_seconds": 0.5, "peak_rss_bytes": 200})
+        self.assertEqual(stats["python3"]["peak_rss_bytes"], 300)
+        usage = session_usage(stats)
+        self.assertEqual((usage["calls"], usage["failures"], usage["limit_kills"]), (3, 1, 1))
+        self.assertEqual((usage["cpu_seconds"], usage["peak_rss_bytes"]), (2.0, 300))
+        self.assertEqual((usage["output_bytes"], usage["write_bytes"]), (99, 10))
+
+
+@unittest.skipUnless(os.path.exists("/bin/bash") and HAS_PROC, "needs /bin/bash and /proc")
+class TestLimitedShell(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.limits = ResourceLimits(cpu_seconds=1, address_space_bytes=512 * 1024 ** 2,
+                                     output_bytes=256 * 1024, open_files=64)
+        self.shell = PersistentShell(self.tmp.name, limits=self.limits)
+        self.addCleanup(self.shell.close)
+
+    # ── Test 4: Too much output kills the job, not the shell ───────────
+    def test_output_limit(self):
+        self.shell.execute("cd / && export KEPT=1")
+        pid = self.shell.process.pid
+        result = self.shell.run("yes", timeout=10)
+        self.assertEqual((result.returncode, result.limit_exceeded, result.timed_out), (137, "output", False))
+        self.assertIn("printed more than 262144 bytes", result.stderr)
+        self.assertEqual(self.shell.process.pid, pid)
+        self.assertEqual(self.shell.execute("echo $PWD $KEPT"), "/ 1")
+        self.assertEqual(result.as_tool_result()["limit_exceeded"], "output")
+
+    # ── Test 5: CPU seconds are granted per command ────────────────────
+    def test_cpu_limit(self):
+        spin = "python3 -c 'while True: pass'"
+        for _ in range(2):  # the second command gets a fresh allowance
+            result = self.shell.run(spin, timeout=10)
+            self.assertEqual((result.returncode, result.limit_exceeded), (152, "cpu"))
+            self.assertGreaterEqual(result.cpu_seconds, 0.9)
+        self.assertEqual(self.shell.run("true").limit_exceeded, None)
+
+    # ── Test 6: Memory and open files are capped ───────────────────────
+    def test_memory_and_open_files(self):
+        self.assertEqual(self.shell.execute("ulimit -v; ulimit -n"), "524288\n64")
+        result = self.shell.run("python3 -c 'bytearray(900 * 1024 * 1024)'")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("MemoryError", result.stderr)
+
+    # ── Test 7: Peak RSS and I/O are measured ──────────────────────────
+    def test_usage(self):
+        result = self.shell.run("python3 -c 'import time; x = bytearray(100 * 1024 * 1024); time.sleep(0.3)'")
+        self.assertGreater(result.peak_rss_bytes, 100 * 1024 ** 2)
+        self.assertIn("peak_rss_bytes", result.as_tool_result())
+        self.assertIsNotNone(self.shell.run("true").write_bytes)
+
+        isolated = self.shell.run_isolated("python3 -c 'x = bytearray(50 * 1024 * 1024)'")
+        self.assertGreater(isolated.peak_rss_bytes, 50 * 1024 ** 2)
+        self.assertIsNotNone(isolated.cpu_seconds)
+        self.assertEqual(self.shell.run_isolated("yes", timeout=10).limit_exceeded, "output")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,239 @@
+"""Tests for the LLM response cache and the cached adapter wrappers (no network needed)."""
+import sys
+import os
+import asyncio
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from llm_adapters.llm_factory import close_adapters, get_async_llm_adapter, get_llm_adapter
+from llm_adapters.response_cache import AsyncCachedAdapter, CachedAdapter, ResponseCache
+
+
+class FakeAdapter:
+    """Counts requests; merges consecutive user messages like the real adapters."""
+
+    def __init__(self, response="answer"):
+        self.response = response
+        self.calls = 0
+        self.last_usage = None
+
+    def _normalize_messages(self, messages):
+        normalized = []
+        for msg in messages:
+            if normalized and normalized[-1]["role"] == msg["role"]:
+                normalized[-1] = {"role": msg["role"], "content": normalized[-1]["content"] + "\n" + msg["content"]}
+            else:
+                normalized.append(dict(msg))
+        return normalized
+
+    def generate_response(self, messages, model=None):
+        self.calls += 1
+        self.last_usage = {"input_tokens": 10}
+        return self.response
+
+    def stream_response(self, messages, model=None):
+        self.calls += 1
+        yield from self.response.partition(" ")
+
+
+class AsyncFakeAdapter(FakeAdapter):
+    async def generate_response(self, messages, model=None):
+        return FakeAdapter.generate_response(self, messages, model)
+
+    async def stream_response(self, messages, model=None):
+        self.calls += 1
+        for chunk in self.response.partition(" "):
+            yield chunk
+
+
+MESSAGES = [{"role": "system", "content": "be brief"}, {"role": "user", "content": "hi"}]
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = ResponseCache(self.tmp.name)
+
+    # ── Test 1: Keys cover provider, model, messages and parameters ────
+    def test_key(self):
+        key = ResponseCache.key("openai", "gpt-4o-mini", MESSAGES, {"temperature": 0, "seed": 1})
+        self.assertEqual(key, ResponseCache.key("openai", "gpt-4o-mini", MESSAGES, {"seed": 1, "temperature": 0}))
+        for other in (ResponseCache.key("groq", "gpt-4o-mini", MESSAGES, {"temperature": 0, "seed": 1}),
+                      ResponseCache.key("openai", "gpt-4o", MESSAGES, {"temperature": 0, "seed": 1}),
+                      ResponseCache.key("openai", "gpt-4o-mini", MESSAGES[1:], {"temperature": 0, "seed": 1}),
+                      ResponseCache.key("openai", "gpt-4o-mini", MESSAGES, {"temperature": 1, "seed": 1})):
+            self.assertNotEqual(key, other)
+
+    # ── Test 2: Memory LRU in front of the disk store ──────────────────
+    def test_memory_and_disk(self):
+        self.assertIsNone(self.cache.get("k1"))
+        self.cache.put("k1", "one", provider="openai")
+        self.assertEqual(self.cache.get("k1"), "one")
+
+        reopened = ResponseCache(self.tmp.name, max_memory_entries=1)
+        self.assertEqual(reopened.get("k1"), "one")  # from disk
+        self.assertEqual(reopened.get("k1"), "one")  # now from memory
+        reopened.put("k2", "two")
+        self.assertEqual(list(reopened._memory), ["k2"])
+        stats = reopened.stats()
+        self.assertEqual((stats["memory_hits"], stats["disk_hits"], stats["misses"]), (1, 1, 0))
+        self.assertEqual(self.cache.stats()["hit_rate"], 0.5)
+
+    # ── Test 3: Expired entries are misses and are deleted ─────────────
+    def test_ttl(self):
+        cache = ResponseCache(self.tmp.name, ttl_seconds=60)
+        cache.put("k", "old")
+        later = time.time() + 120
+        with patch("llm_adapters.response_cache.time.time", return_value=later):
+            self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache._scan(), [])
+        forever = ResponseCache(self.tmp.name, ttl_seconds=0)
+        forever.put("k", "kept")
+        with patch("llm_adapters.response_cache.time.time", return_value=later + 10 ** 6):
+            self.assertEqual(ResponseCache(self.tmp.name, ttl_seconds=0).get("k"), "kept")
+
+    # ── Test 4: The disk store stays under its size limit ──────────────
+    def test_size_eviction(self):
+        cache = ResponseCache(self.tmp.name, max_disk_bytes=1000, max_memory_entries=1)
+        for i in range(4):
+            cache.put(f"k{i}", "x" * 200)
+            os.utime(cache._path(f"k{i}"), (1000 + i, 1000 + i))
+        cache.get("k0")  # a hit makes k0 the most recently used
+        for i in range(4, 6):
+            cache.put(f"k{i}", "x" * 200)
+        on_disk = {os.path.basename(path) for _, _, path in cache._scan()}
+        self.assertEqual(on_disk, {"k0.json", "k3.json", "k4.json", "k5.json"})
+        self.assertLessEqual(cache.stats()["disk_bytes"], 1000)
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    # ── Test 5: Error responses are not cached ─────────────────────────
+    def test_errors_not_cached(self):
+        for response in ("Error communicating with OpenAI-compatible API: timeout", "Error: No user messages found.",
+                         "partial\n[Error: stream interrupted: reset]", None):
+            self.cache.put("k", response)
+            self.assertIsNone(self.cache.get("k"))
+
+
+class TestCachedAdapter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = ResponseCache(self.tmp.name)
+
+    # ── Test 6: Identical requests are answered once ───────────────────
+    def test_generate(self):
+        adapter = CachedAdapter(FakeAdapter(), "openai", self.cache)
+        self.assertEqual(adapter.generate_response(MESSAGES, model="m"), "answer")
+        self.assertEqual(adapter.last_usage, {"input_tokens": 10})
+        split = MESSAGES[:1] + [{"role": "user", "content": "h"}, {"role": "user", "content": "i"}]
+        adapter.generate_response(MESSAGES, model="m")
+        self.assertIsNone(adapter.last_usage)
+        self.assertEqual(adapter.adapter.calls, 1)
+        adapter.generate_response(split, model="m")          # normalizes differently: a miss
+        adapter.generate_response(MESSAGES, model="other")  # other model: a miss
+        self.assertEqual(adapter.adapter.calls, 3)
+        self.assertEqual(adapter.response, "answer")  # other attributes come from the adapter
+
+    # ── Test 7: Streams are cached once complete ───────────────────────
+    def test_stream(self):
+        adapter = CachedAdapter(FakeAdapter("hello world"), "openai", self.cache)
+        self.assertEqual(list(adapter.stream_response(MESSAGES, model="m")), ["hello", " ", "world"])
+        self.assertEqual(list(adapter.stream_response(MESSAGES, model="m")), ["hello world"])
+        self.assertEqual(adapter.generate_response(MESSAGES, model="m"), "hello world")
+        self.assertEqual(adapter.adapter.calls, 1)
+
+    # ── Test 8: Async adapters share the cache ─────────────────────────
+    def test_async(self):
+        async def run():
+            adapter = AsyncCachedAdapter(AsyncFakeAdapter("hello world"), "openai", self.cache)
+            first = [chunk async for chunk in adapter.stream_response(MESSAGES, model="m")]
+            second = await adapter.generate_response(MESSAGES, model="m")
+            return first, second, adapter.adapter.calls
+
+        self.assertEqual(asyncio.run(run()), (["hello", " ", "world"], "hello world", 1))
+        sync = CachedAdapter(FakeAdapter(), "openai", self.cache)
+        self.assertEqual(sync.generate_response(MESSAGES, model="m"), "hello world")
+
+    # ── Test 9: Hit status is per asyncio task ─────────────────────────
+    def test_hit_per_task(self):
+        async def run():
+            adapter = AsyncCachedAdapter(AsyncFakeAdapter(), "openai", self.cache)
+            await adapter.generate_response(MESSAGES, model="m")
+            missed = asyncio.Event()
+
+            async def hit():
+                await adapter.generate_response(MESSAGES, model="m")
+                await missed.wait()
+                return adapter.last_usage
+
+            async def miss():
+                await adapter.generate_response(MESSAGES, model="other")
+                missed.set()
+                return adapter.last_usage
+
+            return await asyncio.gather(hit(), miss())
+
+        self.assertEqual(asyncio.run(run()), [None, {"input_tokens": 10}])
+
+    # ── Test 10: Adapter settings and parameters are part of the key ───
+    def test_settings_in_key(self):
+        first, second = FakeAdapter("first"), FakeAdapter("second")
+        first.base_url, second.base_url = "https://a.example/v1", "https://b.example/v1"
+        self.assertEqual(CachedAdapter(first, "litellm", self.cache).generate_response(MESSAGES, model="m"), "first")
+        self.assertEqual(CachedAdapter(second, "litellm", self.cache).generate_response(MESSAGES, model="m"), "second")
+
+        second.base_url = first.base_url
+        second.prompt_caching = True
+        adapter = CachedAdapter(second, "litellm", self.cache)
+        self.assertEqual(adapter.generate_response(MESSAGES, model="m"), "second")
+        second.prompt_caching, second.max_tokens = None, 1024
+        self.assertEqual(adapter.generate_response(MESSAGES, model="m"), "second")
+        del second.max_tokens
+        self.assertEqual(adapter.generate_response(MESSAGES, model="m"), "first")
+        self.assertEqual(second.calls, 3)
+
+    # ── Test 11: The factories wrap adapters when the cache is enabled ─
+    @patch("llm_adapters.openai_compatible_adapter.openai.AsyncOpenAI")
+    @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
+    def test_factory(self, mock_openai, mock_async_openai):
+        close_adapters()
+        self.addCleanup(close_adapters)
+        with patch.dict(os.environ, {"LLM_RESPONSE_CACHE": self.tmp.name, "LLM_RESPONSE_CACHE_TTL": "0"}):
+            adapter = get_llm_adapter("openai", api_key="k")
+            async_adapter = get_async_llm_adapter("openai", api_key="k")
+        self.assertIsInstance(adapter, CachedAdapter)
+        self.assertIsInstance(async_adapter, AsyncCachedAdapter)
+        self.assertIs(adapter.cache, async_adapter.cache)
+        self.assertIsNone(adapter.cache.ttl_seconds)
+        close_adapters()
+        self.assertNotIsInstance(get_llm_adapter("openai", api_key="k"), CachedAdapter)
+
+    # ── Test 12: Wrappers answer with the real adapter's attributes ────
+    @patch("llm_adapters.openai_compatible_adapter.openai.OpenAI")
+    def test_layers_delegate(self, mock_openai):
+        close_adapters()
+        self.addCleanup(close_adapters)
+        with patch.dict(os.environ, {"LLM_RESPONSE_CACHE": self.tmp.name}):
+            lazy = get_llm_adapter("DeepSeek", api_key="k", lazy=True)
+            cached = lazy.resolve()
+        self.assertEqual((lazy.base_url, cached.base_url), ("https://api.deepseek.com",) * 2)
+        for layer in (lazy, cached):
+            self.assertFalse(hasattr(layer, "provider"))
+            self.assertFalse(hasattr(layer, "api_key"))
+        cached.adapter.generate_response = lambda messages, model=None: "answer"
+        cached.adapter.last_usage = {"input_tokens": 10}
+        lazy.generate_response(MESSAGES, model="m")
+        self.assertEqual((lazy.last_usage, cached.last_usage), ({"input_tokens": 10},) * 2)
+        lazy.generate_response(MESSAGES, model="m")
+        self.assertEqual((lazy.last_usage, cached.last_usage), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""Tests for ToolResultCache (no shell needed, except the ToolExecutor test)."""
+import sys
+import os
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tool_executor.result_cache import ToolResultCache
+
+
+class TestToolResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = os.path.realpath(self.tmp.name)
+        self.cache = ToolResultCache(self.root)
+        self._write("a.txt", "one\n")
+
+    def _write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def _lookup(self, command, cwd=None):
+        key = self.cache.key(command, cwd or self.root)
+        return key, self.cache.get(key)
+
+    # ── Test 1: Second identical call is a hit ─────────────────────────
+    def test_hit(self):
+        key, cached = self._lookup("cat a.txt")
+        self.assertIsNone(cached)
+        self.cache.put(key, {"output": "one", "returncode": 0})
+        _, cached = self._lookup("cat a.txt")
+        self.assertEqual(cached, {"output": "one", "returncode": 0, "cached": True})
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    # ── Test 2: A changed file makes the entry stale ───────────────────
+    def test_file_change_misses(self):
+        key, _ = self._lookup("cat a.txt")
+        self.cache.put(key, {"output": "one", "returncode": 0})
+        self._write("a.txt", "one\ntwo\n")
+        self.assertIsNone(self._lookup("cat a.txt")[1])
+
+    # ── Test 3: Directory listings notice new files, also nested ───────
+    def test_directory_change_misses(self):
+        self._write("sub/b.txt", "b")
+        for command in ("ls", "grep -r one"):
+            key, _ = self._lookup(command)
+            self.cache.put(key, {"output": "x", "returncode": 0})
+            self.assertIsNotNone(self._lookup(command)[1])
+        self._write("sub/b.txt", "changed")
+        self.assertIsNone(self._lookup("grep -r one")[1])
+        self._write("c.txt", "c")
+        self.assertIsNone(self._lookup("ls")[1])
+
+    # ── Test 4: Globs are expanded like the shell would ────────────────
+    def test_glob(self):
+        key, _ = self._lookup("cat *.txt")
+        self.cache.put(key, {"output": "one", "returncode": 0})
+        self._write("d.txt", "d")
+        self.assertIsNone(self._lookup("cat *.txt")[1])
+
+    # ── Test 5: Volatile and out-of-workspace commands are not cached ──
+    def test_uncacheable(self):
+        self.assertIsNone(self.cache.key("date", self.root))
+        self.assertIsNone(self.cache.key("cat /etc/hostname", self.root))
+        self.assertIsNone(self.cache.key("cat ../x", os.path.join(self.root, "..")))
+        key = self.cache.key("cat a.txt", self.root)
+        self.cache.put(key, {"output": "", "returncode": 0, "timed_out": True})
+        self.assertIsNone(self.cache.get(key))
+
+    # ── Test 6: Invalidation drops everything; cwd is part of the key ──
+    def test_invalidate_and_cwd(self):
+        os.makedirs(os.path.join(self.root, "sub"), exist_ok=True)
+        key, _ = self._lookup("ls")
+        self.cache.put(key, {"output": "a.txt", "returncode": 0})
+        self.assertIsNone(self._lookup("ls", os.path.join(self.root, "sub"))[1])
+        self.cache.invalidate()
+        self.assertIsNone(self._lookup("ls")[1])
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+
+@unittest.skipUnless(os.path.exists("/bin/bash"), "needs /bin/bash")
+class TestToolExecutorCache(unittest.TestCase):
+
+    # ── Test 7: ToolExecutor reuses results until a mutating command ───
+    def test_executor_cache(self):
+        from safety_guardrail.safety_guardrail import SafetyGuardrail
+        from tool_executor.tool_executor import ToolExecutor
+        with tempfile.TemporaryDirectory() as workdir:
+            te = ToolExecutor(SafetyGuardrail(), pool_size=2, workdir=workdir)
+            try:
+                te.execute_tool("execute_bash", "echo hi > note.txt")
+                first = te.execute_tool("execute_bash", "cat note.txt")
+                second = te.execute_tool("execute_bash", "cat note.txt")
+                self.assertNotIn("cached", first)
+                self.assertEqual((second["output"], second["cached"]), ("hi", True))
+                te.execute_tool("execute_bash", "echo bye > note.txt")
+                self.assertEqual(te.execute_tool("execute_bash", "cat note.txt")["output"], "bye")
+                self.assertEqual(te.result_cache.stats()["hits"], 1)
+                self.assertEqual(te.command_stats["cat"]["calls"], 2)
+            finally:
+                te.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,18 @@
 """Tests for SafetyGuardrail."""
 import sys
 import os
+import json
+import tempfile
 import unittest
+from contextlib import redirect_stderr
+from io import StringIO
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+from safety_guardrail.policy import DEFAULT_BLOCKLIST, Policy, Rule, load_policy
 from safety_guardrail.safety_guardrail import SafetyGuardrail
+from safety_guardrail.shell_parser import parse_command
 
 
 class TestSafetyGuardrail(unittest.TestCase):
@@ -48,5 +55,154 @@ class TestSafetyGuardrail(unittest.TestCase):
         self.assertIn("Error parsing command", message)
 
 
+    # ── Test 7: Read-only classification ────────────────────────────────
+    def test_is_read_only(self):
+        for cmd in ["cat a.txt", "ls -l | grep x", "head -n 5 f && wc -l f", 'grep "a|b" .']:
+            self.assertTrue(self.guardrail.is_read_only(cmd), cmd)
+        for cmd in ["", "cat a > b", "touch x", "cat a; rm b", "cat a\ntouch b",
+                    "cat $(ls)", "sleep 1 &", "(ls)", "echo 'unterminated"]:
+            self.assertFalse(self.guardrail.is_read_only(cmd), cmd)
+
+    # ── Test 8: Blocked commands anywhere in the line are found ─────────
+    def test_blocked_anywhere(self):
+        for cmd in ["echo hi && rm x", "ls | xargs rm", "cat $(rm x)", "echo `sudo ls`",
+                    "bash -c 'rm -r /'", "find . -name '*.pyc' -exec rm {} ';'", "env FOO=1 nice -n 5 kill 1",
+                    "/bin/rm x", "echo ok; (sudo ls)", "if true; then\n  killall x\nfi",
+                    "diff <(curl a) b", "timeout 10s wget x", "f() { chmod 777 x; }; f"]:
+            is_safe, message = self.guardrail.is_safe(cmd)
+            self.assertFalse(is_safe, cmd)
+            self.assertIn("is in the blocklist", message)
+
+    # ── Test 9: Heredoc bodies, quotes and comments are not commands ────
+    def test_not_commands(self):
+        for cmd in ["cat > f << 'EOF'\nrm -rf /\nEOF\necho done", "cat <<-EOF\n\tsudo x\n\tEOF",
+                    'echo "rm -rf /"', "grep 'sudo' log", "ls # rm x", "git rm --cached x", "command -v rm"]:
+            self.assertEqual(self.guardrail.is_safe(cmd), (True, "Command is safe."), cmd)
+        self.assertFalse(self.guardrail.is_safe("cat << EOF\nx\nEOF\nrm y")[0])
+        self.assertFalse(self.guardrail.is_safe("echo $(ls")[0])
+
+    # ── Test 10: Parsing into simple commands ───────────────────────────
+    def test_parse_command(self):
+        parsed = parse_command("cd src && X=1 make -j4 2>&1 >build.log | tail -n 5 &")
+        self.assertEqual([c.words for c in parsed.commands],
+                         [("cd", "src"), ("make", "-j4"), ("tail", "-n", "5")])
+        self.assertEqual(parsed.commands[1].assignments, ("X=1",))
+        self.assertEqual(parsed.commands[1].redirects, (("2>&", "1"), (">", "build.log")))
+        self.assertTrue(parsed.background)
+        self.assertFalse(parsed.substitutions or parsed.subshells)
+
+    # ── Test 11: Rules are checked in order before the blocklist ────────
+    def test_policy_rules(self):
+        guardrail = SafetyGuardrail(Policy(blocklist={"kill"}, rules=[
+            Rule("allow", "kill", r"^%\d+$"),
+            Rule("deny", "git", r"push\s.*--force", "Force pushes are not allowed."),
+            Rule("deny", "*", r"/etc/shadow"),
+        ]))
+        self.assertTrue(guardrail.is_safe("kill %1")[0])
+        self.assertFalse(guardrail.is_safe("kill 1234")[0])
+        self.assertEqual(guardrail.is_safe("git push origin main --force"), (False, "Force pushes are not allowed."))
+        self.assertTrue(guardrail.is_safe("git push origin main")[0])
+        self.assertFalse(guardrail.is_safe("cat /etc/shadow")[0])
+        self.assertTrue(guardrail.is_safe("rm x")[0])  # not on this blocklist
+        with self.assertRaises(ValueError):
+            Rule("block", "rm")
+
+    # ── Test 12: Verdicts are cached per command string ─────────────────
+    def test_verdict_cache(self):
+        command = "cat > f << 'EOF'\n" + "line\n" * 1000 + "EOF\nwc -l f"
+        for _ in range(3):
+            self.assertTrue(self.guardrail.is_safe(command)[0])
+        info = self.guardrail.policy.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 1))
+
+    # ── Test 13: Read-only classification follows the parse ─────────────
+    def test_is_read_only_parsed(self):
+        for cmd in ['grep ">" f', "cat a 2>/dev/null", "ls 2>&1 | head", "cat << EOF\nx\nEOF"]:
+            self.assertTrue(self.guardrail.is_read_only(cmd), cmd)
+        for cmd in ["A=1", "cat a &> log", "cat a >> b", "bash -c 'cat a'", "ls\n\ntouch x"]:
+            self.assertFalse(self.guardrail.is_read_only(cmd), cmd)
+
+    # ── Test 14: Options that write, set the clock or block forever ─────
+    def test_is_read_only_options(self):
+        for cmd in ["tree -L 2", "date +%s", "date -u", "tail -n 5 log", "tail -n5 log", "tail -- -f"]:
+            self.assertTrue(self.guardrail.is_read_only(cmd), cmd)
+        for cmd in ["tree -o listing.txt", "tree -ao out .", "date -s '2020-01-01'", "date --set=now",
+                    "tail -f log", "tail -F log", "tail --follow=name log", "tail -fn 20 log",
+                    "cat a | tail -f"]:
+            self.assertFalse(self.guardrail.is_read_only(cmd), cmd)
+
+
+class TestPolicyFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "policy.toml")
+        self.version = 0
+
+    def write(self, content: str, path: str = None):
+        path = path or self.path
+        with open(path, "w") as f:
+            f.write(content)
+        # Distinct mtimes even where the file system's clock is coarse
+        self.version += 1
+        os.utime(path, ns=(self.version * 10 ** 9, self.version * 10 ** 9))
+
+    # ── Test 15: TOML and JSON policy files ─────────────────────────────
+    def test_load_policy(self):
+        self.write('blocklist = ["docker"]\n[[rules]]\naction = "allow"\ncommand = "docker"\nargs = "^ps"\n')
+        policy = load_policy(self.path)
+        self.assertEqual((policy.check("docker ps")[0], policy.check("docker run x")[0]), (True, False))
+        self.assertTrue(policy.check("rm -rf /")[0])
+
+        json_path = os.path.join(self.tmp.name, "policy.json")
+        self.write(json.dumps({"rules": [{"action": "deny", "command": "*", "args": "secret"}]}), json_path)
+        policy = load_policy(json_path)
+        self.assertEqual(policy.blocklist, DEFAULT_BLOCKLIST)
+        self.assertFalse(policy.check("cat secret.txt")[0])
+
+        for content in ['blocklist = "rm"', 'rules = [{action = "block", command = "rm"}]',
+                        'rules = [{action = "deny", command = "rm", args = "("}]', 'deny = ["rm"]', "rules = ["]:
+            self.write(content)
+            with self.assertRaises(ValueError, msg=content):
+                load_policy(self.path)
+
+    # ── Test 16: Edits are picked up by a running guardrail ─────────────
+    def test_reload(self):
+        self.write('blocklist = ["sudo"]\n')
+        guardrail = SafetyGuardrail(policy_file=self.path)
+        self.assertTrue(guardrail.is_safe("rm x")[0])
+        first = guardrail.policy
+
+        self.write('blocklist = ["sudo", "rm"]\n')
+        self.assertFalse(guardrail.is_safe("rm x")[0])
+
+        # A broken edit or a deleted file leaves the last good policy in force
+        self.write('blocklist = ["sudo"')
+        with redirect_stderr(StringIO()) as stderr:
+            self.assertFalse(guardrail.is_safe("rm x")[0])
+        self.assertIn("not reloaded", stderr.getvalue())
+        self.assertIsNotNone(guardrail.policy_file.error)
+        os.remove(self.path)
+        with redirect_stderr(StringIO()):
+            self.assertFalse(guardrail.is_safe("rm x")[0])
+
+        # Reverting reuses the compiled policy and its cached verdicts
+        self.write('blocklist = ["sudo"]\n')
+        self.assertIs(guardrail.policy, first)
+        self.assertIsNone(guardrail.policy_file.error)
+
+    # ── Test 17: Policy file from the environment; bad files fail at startup
+    def test_startup(self):
+        self.write('blocklist = ["make"]\n')
+        with patch.dict(os.environ, {"GUARDRAIL_POLICY": self.path}):
+            self.assertFalse(SafetyGuardrail().is_safe("make all")[0])
+            self.assertTrue(SafetyGuardrail(Policy()).is_safe("make all")[0])
+        with self.assertRaises(OSError):
+            SafetyGuardrail(policy_file=os.path.join(self.tmp.name, "missing.toml"))
+        self.write("rules = 1")
+        with self.assertRaises(ValueError):
+            SafetyGuardrail(policy_file=self.path)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -8,6 +8,7 @@ import tempfile
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from session_manager.session_manager import SessionManager
+from session_manager.sqlite_session_store import SQLiteSessionStore
 
 
 class TestSessionManager(unittest.TestCase):
@@ -89,6 +90,229 @@ class TestSessionManager(unittest.TestCase):
         # Should not raise, just print warning
         sm_fresh.save_session()
 
+    # ── Test 11: add_message appends to the journal, not the snapshot ──
+    def test_add_message_appends_journal(self):
+        self.sm.create_new_session("journaled")
+        snapshot = self.sm._get_session_file_path("journaled")
+        size_before = os.path.getsize(snapshot)
+        self.sm.add_message("user", "one")
+        self.sm.add_message("assistant", "two")
+        self.assertEqual(os.path.getsize(snapshot), size_before)
+        with open(self.sm.store._get_journal_file_path("journaled")) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["seq"] for r in records], [0, 1])
+        self.assertEqual(records[1]["content"], "two")
+
+    # ── Test 12: save_session compacts the journal into the snapshot ───
+    def test_save_session_compacts_journal(self):
+        self.sm.create_new_session("compact")
+        self.sm.add_message("user", "hello")
+        self.sm.save_session()
+        self.assertFalse(os.path.exists(self.sm.store._get_journal_file_path("compact")))
+        with open(self.sm._get_session_file_path("compact")) as f:
+            self.assertEqual(len(json.load(f)["history"]), 1)
+
+    # ── Test 13: Journal growth triggers automatic compaction ──────────
+    def test_automatic_compaction(self):
+        self.sm.store.COMPACT_MIN_BYTES = 200
+        self.sm.create_new_session("auto_compact")
+        for i in range(20):
+            self.sm.add_message("user", f"message {i}")
+        journal = self.sm.store._get_journal_file_path("auto_compact")
+        self.assertLessEqual(os.path.getsize(journal) if os.path.exists(journal) else 0, 400)
+
+        sm2 = SessionManager(session_dir=self.tmp_dir.name)
+        sm2.load_session("auto_compact")
+        self.assertEqual([m["content"] for m in sm2.get_history()],
+                         [f"message {i}" for i in range(20)])
+
+    # ── Test 14: Records already in the snapshot are not replayed ──────
+    def test_replay_skips_compacted_records(self):
+        self.sm.create_new_session("crash")
+        self.sm.add_message("user", "a")
+        journal = self.sm.store._get_journal_file_path("crash")
+        with open(journal) as f:
+            stale = f.read()
+        self.sm.save_session()
+        # Simulate a crash between the snapshot rename and the journal reset
+        with open(journal, "w") as f:
+            f.write(stale + '{"seq": 1, "role": "assistant", "content": "b"}\n{"seq": 2, "ro')
+
+        sm2 = SessionManager(session_dir=self.tmp_dir.name)
+        sm2.load_session("crash")
+        self.assertEqual([m["content"] for m in sm2.get_history()], ["a", "b"])
+
+    # ── Test 15: Most recent session follows update time ───────────────
+    def test_get_most_recent_session(self):
+        self.sm.create_new_session("b_first")
+        self.sm.create_new_session("a_second")
+        os.utime(self.sm._get_session_file_path("b_first"), (1000, 1000))
+        os.utime(self.sm._get_session_file_path("a_second"), (2000, 2000))
+        self.assertEqual(self.sm.get_most_recent_session(), "a_second")
+
+    # ── Test 16: Legacy indented snapshot without journal loads ────────
+    def test_load_legacy_session(self):
+        with open(self.sm._get_session_file_path("legacy"), "w") as f:
+            json.dump({"session_id": "legacy",
+                       "history": [{"role": "user", "content": "old"}],
+                       "last_saved": "2024-01-01T00:00:00"}, f, indent=4)
+        self.assertTrue(self.sm.load_session("legacy"))
+        self.assertEqual(self.sm.get_history(), [{"role": "user", "content": "old"}])
+        self.sm.add_message("assistant", "new")
+
+        sm2 = SessionManager(session_dir=self.tmp_dir.name)
+        sm2.load_session("legacy")
+        self.assertEqual(len(sm2.get_history()), 2)
+
+    # ── Test 17: Loading reads only the tail of a large session ────────
+    def test_load_session_is_lazy(self):
+        self.sm.create_new_session("big")
+        for i in range(120):
+            self.sm.add_message("user", f"message {i}")
+        self.sm.save_session()
+        self.assertTrue(os.path.exists(self.sm.store._get_index_file_path("big")))
+        self.sm.add_message("assistant", "journaled")
+
+        sm2 = SessionManager(session_dir=self.tmp_dir.name, tail_messages=5)
+        sm2.load_session("big")
+        history = sm2.get_history()
+        self.assertEqual(len(history), 121)
+        self.assertEqual(history.resident_count, 5)
+        self.assertEqual(history[-1]["content"], "journaled")
+        self.assertEqual(history[3]["content"], "message 3")
+
+    # ── Test 18: Compaction streams an unloaded prefix correctly ───────
+    def test_save_after_lazy_load(self):
+        self.sm.create_new_session("stream")
+        for i in range(30):
+            self.sm.add_message("user", f"m{i}")
+        self.sm.save_session()
+
+        sm2 = SessionManager(session_dir=self.tmp_dir.name, tail_messages=2)
+        sm2.load_session("stream")
+        sm2.add_message("assistant", "tail")
+        sm2.save_session()
+
+        sm3 = SessionManager(session_dir=self.tmp_dir.name)
+        sm3.load_session("stream")
+        self.assertEqual([m["content"] for m in sm3.get_history()],
+                         [f"m{i}" for i in range(30)] + ["tail"])
+
+    # ── Test 19: Stale sidecar index is rebuilt from the snapshot ──────
+    def test_stale_index_rebuilt(self):
+        self.sm.create_new_session("stale")
+        self.sm.add_message("user", "x")
+        self.sm.save_session()
+        os.remove(self.sm.store._get_index_file_path("stale"))
+
+        sm2 = SessionManager(session_dir=self.tmp_dir.name)
+        sm2.load_session("stale")
+        self.assertEqual(sm2.get_history(), [{"role": "user", "content": "x"}])
+
+    # ── Test 20: Context summary stored alongside the session ──────────
+    def test_context_summary_round_trip(self):
+        self.sm.create_new_session("summed")
+        self.assertIsNone(self.sm.get_context_summary())
+        self.sm.save_context_summary({"upto": 3, "content": "earlier stuff"})
+        self.assertEqual(self.sm.list_sessions(), ["summed"])
+
+        sm2 = SessionManager(session_dir=self.tmp_dir.name)
+        sm2.load_session("summed")
+        self.assertEqual(sm2.get_context_summary(), {"upto": 3, "content": "earlier stuff"})
+
+
+class TestSQLiteSessionManager(unittest.TestCase):
+    """SessionManager behaviour on the SQLite backend."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.sm = SessionManager(session_dir=self.tmp_dir.name, backend="sqlite")
+
+    def tearDown(self):
+        self.sm.store.close()
+        self.tmp_dir.cleanup()
+
+    # ── Test 1: Round trip through a fresh manager ─────────────────────
+    def test_save_and_load_session(self):
+        self.sm.create_new_session("persist")
+        self.sm.add_message("user", "hello")
+        self.sm.add_message("assistant", "hi")
+
+        sm2 = SessionManager(session_dir=self.tmp_dir.name, backend="sqlite")
+        self.assertTrue(sm2.load_session("persist"))
+        self.assertEqual(sm2.get_history(), [
+            {"role": "user", "content": "hello"},
+            {"role": "assistant", "content": "hi"},
+        ])
+        sm2.store.close()
+
+    # ── Test 2: Duplicate raises ───────────────────────────────────────
+    def test_create_duplicate_session_raises(self):
+        self.sm.create_new_session("dup")
+        with self.assertRaises(ValueError):
+            self.sm.create_new_session("dup")
+
+    # ── Test 3: Load nonexistent ───────────────────────────────────────
+    def test_load_nonexistent_session(self):
+        self.assertFalse(self.sm.load_session("nope"))
+
+    # ── Test 4: Listing and most-recent resolution ─────────────────────
+    def test_list_and_most_recent(self):
+        for sid in ("gamma", "alpha", "beta"):
+            self.sm.create_new_session(sid)
+        self.sm.load_session("gamma")
+        self.sm.add_message("user", "bump")
+        self.assertEqual(self.sm.list_sessions(), ["alpha", "beta", "gamma"])
+        self.assertEqual(self.sm.get_most_recent_session(), "gamma")
+
+    # ── Test 5: Catalog metadata ───────────────────────────────────────
+    def test_session_info(self):
+        self.sm.create_new_session("info")
+        self.sm.add_message("user", "abc")
+        self.sm.add_message("assistant", "héllo")
+        info = self.sm.get_session_info()
+        self.assertEqual(info["message_count"], 2)
+        self.assertEqual(info["byte_size"], 3 + len("héllo".encode("utf-8")))
+        self.assertGreaterEqual(info["updated_at"], info["created_at"])
+
+    # ── Test 6: save_session writes only unseen rows ───────────────────
+    def test_save_session_syncs_history(self):
+        self.sm.create_new_session("sync")
+        self.sm.add_message("user", "one")
+        self.sm.history.append({"role": "assistant", "content": "two"})
+        self.sm.save_session()
+        self.assertEqual(len(self.sm.store.load("sync")), 2)
+        self.assertEqual(self.sm.get_session_info()["byte_size"], 6)
+
+    # ── Test 7: Lazy load pages through the catalog ────────────────────
+    def test_load_session_is_lazy(self):
+        self.sm.create_new_session("big")
+        for i in range(40):
+            self.sm.add_message("user", f"m{i}")
+
+        sm2 = SessionManager(session_dir=self.tmp_dir.name, backend="sqlite", tail_messages=4)
+        sm2.load_session("big")
+        self.assertEqual(sm2.get_history().resident_count, 4)
+        self.assertEqual(sm2.get_history()[0]["content"], "m0")
+        sm2.store.close()
+
+    # ── Test 8: Context summary stored alongside the session ───────────
+    def test_context_summary_round_trip(self):
+        self.sm.create_new_session("summed")
+        self.sm.save_context_summary({"upto": 2, "content": "first"})
+        self.sm.save_context_summary({"upto": 5, "content": "second"})
+        self.assertEqual(self.sm.get_context_summary(), {"upto": 5, "content": "second"})
+
+    # ── Test 9: Replacing a row does not double-count its size ─────────
+    def test_append_replaces_row(self):
+        self.sm.create_new_session("replaced")
+        self.sm.add_message("user", "first")
+        self.sm.add_message("assistant", "reply")
+        self.sm.store.append("replaced", 0, {"role": "user", "content": "édit"})
+        info = self.sm.get_session_info()
+        self.assertEqual(info["message_count"], 2)
+        self.assertEqual(info["byte_size"], len("édit".encode("utf-8")) + 5)
+
 
 if __name__ == "__main__":
     unittest.main()
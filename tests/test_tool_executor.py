@@ -1,12 +1,13 @@
-"""Tests for ToolExecutor (PersistentShell is mocked — no /bin/bash needed)."""
+"""Tests for ToolExecutor (PersistentShell is mocked — no /bin/bash needed) and PersistentShell."""
 import sys
 import os
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, call
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from safety_guardrail.safety_guardrail import SafetyGuardrail
+from tool_executor.tool_executor import CommandResult, OutputCapture, ShellPool, PersistentShell
 
 
 class TestParseToolCall(unittest.TestCase):
@@ -44,39 +45,360 @@ class TestParseToolCall(unittest.TestCase):
         result = self.te.parse_tool_call("TOOL_CALL:")
         self.assertIsNone(result)
 
+    # ── Test 5: Several tool calls are all returned, in order ──────────
+    def test_parse_multiple_tool_calls(self):
+        response = (
+            'Reading both.\n'
+            'TOOL_CALL: {"tool_name": "execute_bash", "args": "cat a.txt"}\n'
+            'TOOL_CALL: {"tool_name": "execute_bash", "args": "cat b.txt"}\n'
+            'Done.'
+        )
+        calls = self.te.parse_tool_calls(response)
+        self.assertEqual([c["args"] for c in calls], ["cat a.txt", "cat b.txt"])
+        self.assertEqual(self.te.parse_tool_call(response)["args"], "cat a.txt")
+
+    # ── Test 6: Braces in trailing prose don't corrupt the call ────────
+    def test_parse_ignores_trailing_braces(self):
+        response = 'TOOL_CALL: {"tool_name": "execute_bash", "args": "echo {x}"} then {"not": "a call"}'
+        self.assertEqual(self.te.parse_tool_calls(response),
+                         [{"tool_name": "execute_bash", "args": "echo {x}"}])
+
+    # ── Test 7: Malformed call skipped, valid ones kept ────────────────
+    def test_parse_skips_malformed_call(self):
+        response = ('TOOL_CALL: {broken\n'
+                    'TOOL_CALL: {"tool_name": "execute_bash", "args": "ls"}')
+        self.assertEqual([c["args"] for c in self.te.parse_tool_calls(response)], ["ls"])
+
+    # ── Test 8: Heredoc with literal newlines (see test_parser.py) ─────
+    def test_parse_heredoc_call(self):
+        response = ('I\'ll write it.\nTOOL_CALL: {"tool_name": "execute_bash", '
+                    '"args": "cat > foo.html << \'EOF\'\n<html>\nhello\n</html>\nEOF\necho done!"}\n\nMore words.')
+        call = self.te.parse_tool_call(response)
+        self.assertTrue(call["args"].startswith("cat > foo.html"))
+        self.assertTrue(call["args"].endswith("echo done!"))
+
+
+class TestStreamingToolCallParser(unittest.TestCase):
+    """Tests for StreamingToolCallParser (pure logic)."""
+
+    def setUp(self):
+        from tool_executor.tool_executor import StreamingToolCallParser
+        self.Parser = StreamingToolCallParser
+
+    # ── Test 9: Call returned as soon as its JSON closes ───────────────
+    def test_call_completed_mid_stream(self):
+        parser = self.Parser()
+        self.assertEqual(parser.feed('Sure. TOOL_CA'), [])
+        self.assertEqual(parser.feed('LL: {"tool_name": "execute_bash", '), [])
+        self.assertEqual(parser.feed('"args": "ls"}'), [{"tool_name": "execute_bash", "args": "ls"}])
+        self.assertEqual(parser.feed(" and some trailing prose"), [])
+
+    # ── Test 10: Braces inside strings don't end the object ────────────
+    def test_braces_in_strings(self):
+        text = 'TOOL_CALL: {"tool_name": "execute_bash", "args": "echo \\"}{\\" x"} TOOL_CALL: {"tool_name": "execute_bash", "args": "ls"}'
+        for size in (1, 5, len(text)):
+            parser = self.Parser()
+            calls = []
+            for i in range(0, len(text), size):
+                calls.extend(parser.feed(text[i:i + size]))
+            self.assertEqual([c["args"] for c in calls], ['echo "}{" x', "ls"], size)
+
+    # ── Test 11: Malformed object is skipped ───────────────────────────
+    def test_malformed_object_skipped(self):
+        parser = self.Parser()
+        self.assertEqual(parser.feed('TOOL_CALL: {bad} TOOL_CALL: {"tool_name": "x", "args": "y"}'),
+                         [{"tool_name": "x", "args": "y"}])
+
 
 class TestExecuteTool(unittest.TestCase):
-    """Tests for ToolExecutor.execute_tool (shell is mocked)."""
+    """Tests for ToolExecutor.execute_tool (shell pool is mocked)."""
 
     def setUp(self):
-        patcher = patch("tool_executor.tool_executor.PersistentShell")
-        self.MockShell = patcher.start()
+        patcher = patch("tool_executor.tool_executor.ShellPool")
+        self.MockPool = patcher.start()
         self.addCleanup(patcher.stop)
 
         from tool_executor.tool_executor import ToolExecutor
         self.te = ToolExecutor(SafetyGuardrail())
 
-    # ── Test 5: Safe command executes ──────────────────────────────────
+    # ── Test 12: Safe command executes ─────────────────────────────────
     def test_execute_tool_safe_command(self):
-        self.te.shell.execute.return_value = "file1.txt\nfile2.txt"
+        self.te.pool.run.return_value = CommandResult("file1.txt\nfile2.txt", 19)
         result = self.te.execute_tool("execute_bash", "ls")
         self.assertEqual(result["returncode"], 0)
         self.assertIn("file1.txt", result["output"])
-        self.te.shell.execute.assert_called_once_with("ls")
+        self.assertEqual(result["output_bytes"], 19)
+        self.assertNotIn("spill_path", result)
+        self.te.pool.run.assert_called_once_with("ls", 30.0)
 
-    # ── Test 6: Blocked command ────────────────────────────────────────
+    # ── Test 13: Blocked command ───────────────────────────────────────
     def test_execute_tool_blocked_command(self):
         result = self.te.execute_tool("execute_bash", "rm -rf /")
         self.assertEqual(result["returncode"], 1)
         self.assertIn("Guardrail blocked command", result["output"])
-        self.te.shell.execute.assert_not_called()
+        self.te.pool.run.assert_not_called()
 
-    # ── Test 7: Unknown tool ──────────────────────────────────────────
+    # ── Test 14: Unknown tool ─────────────────────────────────────────
     def test_execute_tool_unknown_tool(self):
-        result = self.te.execute_tool("write_file", "data")
+        result = self.te.execute_tool("launch_rocket", "data")
         self.assertEqual(result["returncode"], 1)
         self.assertIn("Unknown tool", result["output"])
 
 
+    # ── Test 15: Batch keeps order; read-only calls run isolated ───────
+    def test_execute_tools_batches_read_only(self):
+        self.te.pool.run_readonly.side_effect = lambda cmd, timeout: CommandResult(f"iso:{cmd}")
+        self.te.pool.run.side_effect = lambda cmd, timeout: CommandResult(f"main:{cmd}")
+        results = self.te.execute_tools([
+            ("execute_bash", "cat a"),
+            ("execute_bash", "cat b"),
+            ("execute_bash", "cd sub"),
+            ("execute_bash", "ls"),
+            ("execute_bash", "rm -rf /"),
+        ])
+        self.assertEqual([r["output"] for r in results[:4]],
+                         ["iso:cat a", "iso:cat b", "main:cd sub", "main:ls"])
+        self.assertIn("Guardrail blocked command", results[4]["output"])
+        self.assertEqual(self.te.pool.run_readonly.call_count, 2)
+
+    # ── Test 16: Calls after a failed one are skipped ──────────────────
+    def test_execute_tools_stops_after_failure(self):
+        self.te.pool.run_readonly.side_effect = lambda cmd, timeout: CommandResult(cmd, returncode=1)
+        self.te.pool.run.side_effect = lambda cmd, timeout: CommandResult(cmd, returncode=2 if "fail" in cmd else 0)
+        results = self.te.execute_tools([
+            ("execute_bash", "mkdir a"),
+            ("execute_bash", "make fail"),
+            ("execute_bash", "cat a/x"),
+            ("execute_bash", "touch b"),
+        ])
+        self.assertEqual([r["returncode"] for r in results], [0, 2, None, None])
+        self.assertTrue(results[3]["skipped"])
+        self.te.pool.run_readonly.assert_not_called()
+        self.assertEqual(self.te.command_stats["make"]["failures"], 1)
+        self.assertEqual(self.te.command_stats["mkdir"]["calls"], 1)
+
+    # ── Test 17: A search that finds nothing does not skip the rest ────
+    def test_execute_tools_no_match_is_not_failure(self):
+        self.te.pool.run_readonly.side_effect = lambda cmd, timeout: CommandResult(cmd, returncode=1)
+        self.te.pool.run.side_effect = lambda cmd, timeout: CommandResult(cmd, returncode=1 if "missing" in cmd else 0)
+        results = self.te.execute_tools([
+            ("execute_bash", "grep -r TODO src"),
+            ("execute_bash", "rg FIXME"),
+            ("execute_bash", "touch done"),
+            ("execute_bash", "cat missing"),
+            ("execute_bash", "touch later"),
+        ])
+        self.assertEqual([r["returncode"] for r in results], [1, 1, 0, 1, None])
+        self.assertTrue(results[4]["skipped"])
+
+    # ── Test 18: Read-only calls overlap instead of running serially ───
+    def test_execute_tools_concurrent(self):
+        import threading
+        barrier = threading.Barrier(3, timeout=5)
+
+        def slow_read(cmd, timeout):
+            barrier.wait()  # only passes if all three run at the same time
+            return CommandResult(cmd)
+
+        self.te.pool.run_readonly.side_effect = slow_read
+        results = self.te.execute_tools([("execute_bash", f"cat f{i}") for i in range(3)])
+        self.assertEqual([r["output"] for r in results], ["cat f0", "cat f1", "cat f2"])
+
+
+    # ── Test 19: submit_tool only accepts read-only calls ──────────────
+    def test_submit_tool(self):
+        self.te.pool.run_readonly.return_value = CommandResult("A")
+        future = self.te.submit_tool("execute_bash", "cat a")
+        self.assertEqual(future.result(timeout=5)["output"], "A")
+        with self.assertRaises(ValueError):
+            self.te.submit_tool("execute_bash", "touch a")
+
+    # ── Test 20: Callers may shorten the timeout, not extend it ────────
+    def test_execute_tool_timeout(self):
+        self.te.pool.run.return_value = CommandResult("")
+        self.te.execute_tool("execute_bash", "make", timeout=2.5)
+        self.te.execute_tool("execute_bash", "make", timeout=600)
+        self.assertEqual([c.args for c in self.te.pool.run.call_args_list], [("make", 2.5), ("make", 30.0)])
+        with patch.object(self.te.jobs, "wait", return_value={"output": "", "returncode": 0}) as wait:
+            self.te.execute_tool("job_wait", {"job_id": 1, "timeout": 300}, timeout=4)
+        wait.assert_called_once_with(job_id=1, timeout=4)
+
+    # ── Test 21: job_wait may outlast COMMAND_TIMEOUT within the turn ──
+    def test_job_wait_long_timeout(self):
+        with patch.object(self.te.jobs, "wait", return_value={"output": "", "returncode": 0}) as wait:
+            self.te.execute_tool("job_wait", {"job_id": 1, "timeout": 120}, timeout=500)
+            self.te.execute_tool("job_wait", {"job_id": 1, "timeout": 120})
+        self.assertEqual(wait.call_args_list, [call(job_id=1, timeout=120), call(job_id=1, timeout=120)])
+
+
+class TestOutputCapture(unittest.TestCase):
+    """Bounded head/tail capture with spill-to-disk (no shell needed)."""
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    # ── Test 22: Small output kept whole, nothing spilled ──────────────
+    def test_small_output(self):
+        capture = OutputCapture(self.tmp.name, head_bytes=8, tail_bytes=8)
+        capture.write(b"hello ")
+        capture.write(b"world\n")
+        result = capture.result()
+        self.assertEqual((result.output, result.output_bytes, result.spill_path), ("hello world", 12, None))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    # ── Test 23: Large output keeps head + tail, spills everything ─────
+    def test_large_output_spills(self):
+        capture = OutputCapture(self.tmp.name, head_bytes=10, tail_bytes=10)
+        data = b"".join(b"line %04d\n" % i for i in range(1000))
+        for start in range(0, len(data), 7):
+            capture.write(data[start:start + 7])
+        self.assertLessEqual(len(capture.head) + len(capture.tail), 20)
+
+        result = capture.result()
+        self.assertEqual(result.output_bytes, len(data))
+        self.assertTrue(result.output.startswith("line 0000\n"))
+        self.assertTrue(result.output.endswith("line 0999"))
+        self.assertIn(f"{len(data) - 20} bytes omitted", result.output)
+        with open(result.spill_path, "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(result.as_tool_result()["spill_path"], result.spill_path)
+
+    # ── Test 24: Old spill files are pruned ────────────────────────────
+    def test_spill_files_pruned(self):
+        with patch("tool_executor.tool_executor.MAX_SPILL_FILES", 2):
+            for _ in range(4):
+                capture = OutputCapture(self.tmp.name, head_bytes=1, tail_bytes=1)
+                capture.write(b"abc")
+                capture.result()
+        self.assertEqual(len(os.listdir(self.tmp.name)), 2)
+
+
+@unittest.skipUnless(os.path.exists("/bin/bash"), "needs /bin/bash")
+class TestPersistentShell(unittest.TestCase):
+    """Runs a real bash: the reader works on raw fds and finds the delimiter in the byte stream."""
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.shell = PersistentShell(self.tmp.name)
+        self.addCleanup(self.shell.close)
+
+    # ── Test 25: Multi-line output and stderr come back whole ──────────
+    def test_multiline_and_stderr(self):
+        for _ in range(3):  # repeated, so data left in a buffer would show up
+            self.assertEqual(self.shell.execute("seq 1 500").splitlines()[-1], "500")
+        self.assertEqual(sorted(self.shell.execute("echo out; echo err >&2").splitlines()), ["err", "out"])
+
+    # ── Test 26: Output without a trailing newline ─────────────────────
+    def test_no_trailing_newline(self):
+        self.assertEqual(self.shell.execute("printf abc", timeout=5), "abc")
+
+    # ── Test 27: Heredocs and shell state ──────────────────────────────
+    def test_heredoc_and_state(self):
+        self.shell.execute("mkdir sub && cd sub && cat > note.txt << 'EOF'\nline one\nEOF")
+        self.assertEqual(self.shell.execute("basename $PWD; cat note.txt"), "sub\nline one")
+
+    # ── Test 28: Timeout is reported ───────────────────────────────────
+    def test_timeout(self):
+        self.assertIn("timed out after 0.2s", self.shell.execute("sleep 5", timeout=0.2))
+
+    # ── Test 29: Exit status, stderr and timings are reported ──────────
+    def test_structured_result(self):
+        result = self.shell.run("echo out; echo err >&2; exit_code() { return 3; }; exit_code")
+        self.assertEqual((result.output, result.stderr, result.returncode), ("out", "err", 3))
+        self.assertEqual((result.output_bytes, result.stderr_bytes), (4, 4))
+        self.assertGreater(result.wall_seconds, 0)
+        self.assertEqual(self.shell.run("true").returncode, 0)
+        self.assertEqual(self.shell.run("exit 5").returncode, 5)
+        timed_out = self.shell.run("sleep 5", timeout=0.2)
+        self.assertTrue(timed_out.timed_out)
+        self.assertEqual(timed_out.returncode, 137)
+
+        isolated = self.shell.run_isolated("echo out; echo err >&2; exit 4")
+        self.assertEqual((isolated.output, isolated.stderr, isolated.returncode), ("out", "err", 4))
+        if os.path.exists("/proc/self/stat"):
+            busy = self.shell.run("i=0; while [ $i -lt 200000 ]; do i=$((i+1)); done")
+            self.assertGreater(busy.cpu_seconds, 0)
+            self.assertIsNotNone(isolated.cpu_seconds)
+
+    # ── Test 30: Timeout kills only the job, the shell keeps its state ───
+    def test_timeout_keeps_shell(self):
+        self.shell.execute("mkdir sub && cd sub && export GREETING=hi && LOCAL=1")
+        pid = self.shell.process.pid
+        self.shell.execute("sleep 5", timeout=0.2)
+        self.assertEqual(self.shell.process.pid, pid)
+        self.assertEqual(self.shell.execute("basename $PWD; echo $GREETING $LOCAL"), "sub\nhi 1")
+        self.assertEqual(self.shell.restarts, 0)
+
+    # ── Test 31: A stuck shell fails over with cwd and exports restored ───
+    def test_failover_restores_state(self):
+        self.shell.execute("mkdir sub && cd sub && export GREETING=hi")
+        output = self.shell.execute("while :; do :; done", timeout=0.2)
+        self.assertIn("shell restarted", output)
+        self.assertEqual(self.shell.restarts, 1)
+        self.assertEqual(self.shell.execute("basename $PWD; echo $GREETING"), "sub\nhi")
+        self.assertIn("Shell exited", self.shell.execute("exit 3"))
+        self.assertEqual(self.shell.execute("basename $PWD; echo $GREETING"), "sub\nhi")
+        self.assertEqual(self.shell.restarts, 2)
+
+    # ── Test 32: Background jobs survive a later timeout ───────────────
+    def test_background_job_survives_timeout(self):
+        self.shell.execute("sleep 5 & echo $! > job.pid")
+        self.shell.execute("sleep 5", timeout=0.2)
+        self.assertIn("alive", self.shell.execute("kill -0 $(cat job.pid) && echo alive; kill %1"))
+
+
+@unittest.skipUnless(os.path.exists("/bin/bash"), "needs /bin/bash")
+class TestShellPool(unittest.TestCase):
+    """Primary shell plus worker shells, all real bash."""
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.pool = ShellPool(self.tmp.name, size=3)
+        self.addCleanup(self.pool.close)
+
+    # ── Test 33: Workers follow the primary's cwd and exports ──────────
+    def test_workers_sync_state(self):
+        self.pool.run("mkdir sub && cd sub && export GREETING=hi")
+        self.assertEqual(self.pool.run_readonly("basename $PWD; echo $GREETING").output, "sub\nhi")
+        self.pool.run("cd .. && export GREETING=bye")
+        self.assertEqual(self.pool.run_readonly("basename $PWD; echo $GREETING").output,
+                         f"{os.path.basename(self.tmp.name)}\nbye")
+
+    # ── Test 34: Read-only calls run side by side, extra ones queue ────
+    def test_concurrency_and_stats(self):
+        from concurrent.futures import ThreadPoolExecutor
+        import time
+        started = time.perf_counter()
+        with ThreadPoolExecutor(4) as threads:
+            outputs = list(threads.map(lambda i: self.pool.run_readonly(f"sleep 0.3; echo {i}").output, range(4)))
+        elapsed = time.perf_counter() - started
+        self.assertEqual(outputs, ["0", "1", "2", "3"])
+        self.assertGreater(elapsed, 0.55)  # two workers: the 3rd and 4th call had to wait
+        self.assertLess(elapsed, 1.1)
+        stats = self.pool.stats()
+        self.assertEqual((stats["shells"], stats["runs"], stats["active"]), (3, 4, 0))
+        self.assertEqual(stats["queued"], 2)
+        self.assertGreater(stats["max_queue_wait_seconds"], 0.2)
+        self.assertGreater(stats["utilization"], 0)
+
+
+    # ── Test 35: bash starts with the first command, not before ────────
+    def test_lazy_start(self):
+        shell = PersistentShell(self.tmp.name)
+        self.addCleanup(shell.close)
+        self.assertIsNone(shell._process)
+        self.assertEqual(shell.get_cwd(), os.path.realpath(self.tmp.name))
+        self.assertIsNone(shell._process)
+        self.assertEqual(shell.execute("echo started"), "started")
+        self.assertIsNotNone(shell._standby)
+        PersistentShell(self.tmp.name, standby=False).close()  # never started: nothing to stop
+
+
 if __name__ == "__main__":
     unittest.main()